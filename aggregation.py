@@ -0,0 +1,142 @@
+import sys
+import threading
+import time
+from array import array
+
+SUMMARY = "summary"
+PACKED = "packed"
+
+# Codecs that carry bytes values natively (with or without compression);
+# JSON has no bytes type, so binary=True needs one of these
+BYTES_CODECS = ("msgpack", "cbor")
+
+
+class SampleAggregator:
+    """Collects sensor samples into columnar arrays and publishes one message per window.
+
+    A window is flushed when it is window seconds old, holds max_samples
+    samples or max_bytes of sample data. In "summary" mode the message holds
+    count/min/max/mean/last per field; in "packed" mode it holds the sample
+    arrays themselves (timestamps as millisecond offsets from the window
+    start). Missing samples (NaN) are sent as null. With binary=True packed
+    arrays are sent as raw little-endian float64 bytes; codec must then name
+    the msgpack or cbor codec the message will be encoded with.
+    """
+
+    def __init__(self, publish, topic, fields, mode=SUMMARY, window=1.0,
+                 max_samples=1000, max_bytes=64 * 1024, binary=False, extra=None, codec=None):
+        if mode not in (SUMMARY, PACKED):
+            raise ValueError(f"Unknown aggregation mode: {mode}")
+        if binary and (codec or "json").split("+")[0] not in BYTES_CODECS:
+            raise ValueError(f"binary=True needs a msgpack or cbor codec for {topic}, not {codec or 'json'}")
+        self.publish = publish
+        self.topic = topic
+        self.fields = list(fields)
+        self.mode = mode
+        self.window = window
+        self.max_samples = max_samples
+        self.max_bytes = max_bytes
+        self.binary = binary
+        self.codec = codec
+        self.extra = extra or {}
+        self.flushed_count = 0
+        self.sample_count = 0
+
+        self._lock = threading.Lock()
+        self._timestamps = array("d")
+        self._columns = {field: array("d") for field in self.fields}
+        self._window_start = None
+        self._sample_size = 8 * (len(self.fields) + 1)
+        self._timer = None
+        self._running = False
+
+    def add(self, sample, timestamp=None):
+        """Record one sample (a dict of field -> number); missing fields are NaN"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            expired = self._window_start is not None and timestamp - self._window_start >= self.window
+        if expired:
+            self.flush()
+
+        with self._lock:
+            if self._window_start is None:
+                self._window_start = timestamp
+            self._timestamps.append(timestamp)
+            for field, column in self._columns.items():
+                column.append(sample.get(field, float("nan")))
+            self.sample_count += 1
+            count = len(self._timestamps)
+            full = count >= self.max_samples or count * self._sample_size >= self.max_bytes
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Publish the current window, if it holds any samples"""
+        with self._lock:
+            if not self._timestamps:
+                return None
+            timestamps, self._timestamps = self._timestamps, array("d")
+            columns = self._columns
+            self._columns = {field: array("d") for field in self.fields}
+            self._window_start = None
+
+        message = self._build_message(timestamps, columns)
+        self.flushed_count += 1
+        return self.publish(self.topic, message)
+
+    def _build_message(self, timestamps, columns):
+        start = timestamps[0]
+        message = dict(self.extra)
+        message.update({"start": start, "end": timestamps[-1], "count": len(timestamps)})
+
+        if self.mode == SUMMARY:
+            summary = {}
+            for field, column in columns.items():
+                values = [value for value in column if value == value]  # drop NaN
+                if values:
+                    summary[field] = {
+                        "min": min(values),
+                        "max": max(values),
+                        "mean": sum(values) / len(values),
+                        "last": values[-1],
+                    }
+            message["fields"] = summary
+            return message
+
+        offsets = array("d", ((stamp - start) * 1000.0 for stamp in timestamps))
+        if self.binary:
+            message["offsets_ms"] = _little_endian_bytes(offsets)
+            message["fields"] = {field: _little_endian_bytes(column) for field, column in columns.items()}
+        else:
+            message["offsets_ms"] = [round(offset, 3) for offset in offsets]
+            message["fields"] = {field: [value if value == value else None for value in column]
+                                 for field, column in columns.items()}
+        return message
+
+    def start(self):
+        """Flush partially filled windows from a background thread every window seconds"""
+        self._running = True
+        self._timer = threading.Thread(target=self._timer_worker, daemon=True)
+        self._timer.start()
+
+    def stop(self):
+        """Stop the background flusher and publish what is buffered"""
+        self._running = False
+        if self._timer:
+            self._timer.join(self.window + 1)
+        return self.flush()
+
+    def _timer_worker(self):
+        while self._running:
+            time.sleep(self.window / 4)
+            with self._lock:
+                due = self._window_start is not None and time.time() - self._window_start >= self.window
+            if due:
+                self.flush()
+
+
+def _little_endian_bytes(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import time
+from collections import namedtuple
+from awscrt import mqtt
+import tls_context
+
+Message = namedtuple("Message", ["topic", "payload", "dup", "qos", "retain"])
+
+
+class Subscription:
+    """Async iterator over messages received for one topic filter.
+
+    The SUBSCRIBE is sent on first iteration (or by awaiting start()).
+    Messages are buffered in a bounded queue; when a consumer falls behind,
+    the oldest buffered message is dropped and counted in dropped_count.
+    """
+
+    def __init__(self, client, topic, qos, max_queued):
+        self.client = client
+        self.topic = topic
+        self.qos = qos
+        self.dropped_count = 0
+        self._queue = asyncio.Queue(max_queued)
+        self._started = False
+        self._closed = False
+
+    def _on_message(self, topic, payload, dup, qos, retain, **kwargs):
+        # Called on the awscrt event-loop thread
+        self.client.loop.call_soon_threadsafe(self._enqueue, Message(topic, payload, dup, qos, retain))
+
+    def _enqueue(self, message):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped_count += 1
+        self._queue.put_nowait(message)
+
+    async def start(self):
+        """Send the SUBSCRIBE and wait for the SUBACK"""
+        if not self._started:
+            self._started = True
+            subscribe_future, packet_id = self.client.mqtt_connection.subscribe(
+                topic=self.topic,
+                qos=self.qos,
+                callback=self._on_message)
+            await asyncio.wrap_future(subscribe_future)
+        return self
+
+    async def close(self):
+        """Unsubscribe and end iteration"""
+        if self._started and not self._closed:
+            self._closed = True
+            unsubscribe_future, packet_id = self.client.mqtt_connection.unsubscribe(topic=self.topic)
+            await asyncio.wrap_future(unsubscribe_future)
+            # The end marker takes the oldest message's place if the consumer is behind
+            self._enqueue(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await self.start()
+        if self._closed and self._queue.empty():
+            raise StopAsyncIteration
+        message = await self._queue.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+class AsyncAWSIoTClient:
+    """asyncio front end for AWS IoT MQTT.
+
+    Every operation awaits the awscrt concurrent future instead of blocking a
+    thread on future.result(), so a single event loop can keep thousands of
+    publishes and subscriptions in flight. With a rate_limiter
+    (rate_limiter.AdaptiveRateLimiter), publish awaits its budget and
+    reports every PUBACK back to it.
+    """
+
+    def __init__(self, endpoint, client_id, cert_path, key_path, root_ca_path, rate_limiter=None):
+        self.endpoint = endpoint
+        self.client_id = client_id
+        self.cert_path = cert_path
+        self.key_path = key_path
+        self.root_ca_path = root_ca_path
+        self.rate_limiter = rate_limiter
+        self.mqtt_connection = None
+        self.loop = None
+        self.is_connected = False
+
+    def on_connection_interrupted(self, connection, error, **kwargs):
+        self.is_connected = False
+
+    def on_connection_resumed(self, connection, return_code, session_present, **kwargs):
+        self.is_connected = True
+
+    async def connect(self):
+        self.loop = asyncio.get_running_loop()
+        if self.mqtt_connection is None:
+            self.mqtt_connection = tls_context.mtls_from_path(
+                endpoint=self.endpoint,
+                cert_filepath=self.cert_path,
+                pri_key_filepath=self.key_path,
+                ca_filepath=self.root_ca_path,
+                client_id=self.client_id,
+                clean_session=True,
+                keep_alive_secs=30,
+                on_connection_interrupted=self.on_connection_interrupted,
+                on_connection_resumed=self.on_connection_resumed)
+
+        await asyncio.wrap_future(self.mqtt_connection.connect())
+        self.is_connected = True
+
+    async def publish(self, topic, message, qos=mqtt.QoS.AT_LEAST_ONCE, retain=False):
+        """Publish one message and return the PUBACK result ({'packet_id': ...})"""
+        if not self.is_connected:
+            raise ConnectionError("Not connected to AWS IoT")
+
+        if isinstance(message, dict):
+            message = json.dumps(message)
+
+        limiter = self.rate_limiter
+        if limiter is not None:
+            await limiter.acquire_async(topic, len(message))
+            submitted_at = time.monotonic()
+
+        publish_future, packet_id = self.mqtt_connection.publish(
+            topic=topic,
+            payload=message,
+            qos=qos,
+            retain=retain)
+        if limiter is not None:
+            publish_future.add_done_callback(
+                lambda done: limiter.record_result(time.monotonic() - submitted_at, done.exception()))
+        return await asyncio.wrap_future(publish_future)
+
+    async def publish_many(self, messages, qos=mqtt.QoS.AT_LEAST_ONCE, return_exceptions=True):
+        """Publish (topic, message) pairs concurrently with asyncio.gather.
+
+        Results come back in input order; failures are returned as exception
+        objects unless return_exceptions is False.
+        """
+        return await asyncio.gather(
+            *(self.publish(topic, message, qos) for topic, message in messages),
+            return_exceptions=return_exceptions)
+
+    def subscribe(self, topic, qos=mqtt.QoS.AT_LEAST_ONCE, max_queued=1000):
+        """Return a Subscription to iterate with `async for`"""
+        if not self.is_connected:
+            raise ConnectionError("Not connected to AWS IoT")
+        return Subscription(self, topic, qos, max_queued)
+
+    async def disconnect(self):
+        if self.mqtt_connection and self.is_connected:
+            await asyncio.wrap_future(self.mqtt_connection.disconnect())
+            self.is_connected = False
@@ -0,0 +1,298 @@
+"""Load generator and benchmark harness against a local MQTT broker stand-in.
+
+Starts MQTTTestBroker (an in-process asyncio MQTT 3.1.1 broker, optionally
+with TLS and freshly generated certificates) and drives it with awscrt
+connections through the same PublishQueue the client uses. Reports
+throughput, PUBACK and end-to-end latency percentiles, CPU time and RSS.
+Runs are seeded and parameterised on the command line, and results can be
+saved as JSON and compared against an earlier run to catch regressions.
+
+    python bench.py --publishers 4 --subscribers 2 --messages 5000 --payload-size 256
+    python bench.py --tls --rate 500 --json baseline.json
+    python bench.py --compare baseline.json --tolerance 0.1
+
+Note that the broker runs in the same process, so CPU and RSS include it.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import ssl
+import statistics
+import struct
+import sys
+import tempfile
+import threading
+import time
+
+from awscrt import io, mqtt
+from awsiot import mqtt_connection_builder
+
+from local_broker import LocalBroker, MQTTTestBroker, generate_test_certs
+from metrics import LatencyHistogram, PublishMetrics
+from publish_queue import PublishQueue
+
+# Every payload starts with the sequence number and the send time
+PAYLOAD_HEADER = struct.Struct("<Qd")
+
+# Metrics where a larger value is better; everything else compared is lower-is-better
+HIGHER_IS_BETTER = {"publish_rate", "delivery_rate"}
+COMPARED_METRICS = ["publish_rate", "delivery_rate", "puback_p50_ms", "puback_p99_ms",
+                    "e2e_p50_ms", "e2e_p99_ms", "e2e_p999_ms", "cpu_us_per_message", "max_rss_mb"]
+
+
+class BenchEnvironment:
+    """Starts the broker stand-in and hands out connections to it"""
+
+    def __init__(self, args):
+        self.args = args
+        self.cert_dir = None
+        self.certs = None
+        self.broker = None
+        self.local_broker = None
+        self.port = None
+
+    def start(self):
+        if self.args.backend == "local":
+            self.local_broker = LocalBroker(puback_latency=0.0)
+            return
+        ssl_context = None
+        if self.args.tls:
+            self.cert_dir = tempfile.TemporaryDirectory(prefix="mqtt-bench-")
+            self.certs = generate_test_certs(self.cert_dir.name)
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain(self.certs["server_cert"], self.certs["server_key"])
+            ssl_context.load_verify_locations(self.certs["ca"])
+            ssl_context.verify_mode = ssl.CERT_REQUIRED
+        self.broker = MQTTTestBroker(ssl_context=ssl_context)
+        self.port = self.broker.start()
+
+    def connect(self, client_id):
+        if self.local_broker is not None:
+            connection = self.local_broker.create_connection(client_id)
+        elif self.certs:
+            connection = mqtt_connection_builder.mtls_from_path(
+                endpoint="localhost",
+                port=self.port,
+                cert_filepath=self.certs["client_cert"],
+                pri_key_filepath=self.certs["client_key"],
+                ca_filepath=self.certs["ca"],
+                client_id=client_id,
+                clean_session=True,
+                keep_alive_secs=30)
+        else:
+            bootstrap = io.ClientBootstrap.get_or_create_static_default()
+            connection = mqtt.Connection(
+                client=mqtt.Client(bootstrap, None),
+                host_name="127.0.0.1",
+                port=self.port,
+                client_id=client_id,
+                clean_session=True,
+                keep_alive_secs=30)
+        connection.connect().result(timeout=10)
+        return connection
+
+    def stop(self):
+        if self.broker:
+            self.broker.stop()
+        if self.local_broker:
+            self.local_broker.shutdown()
+        if self.cert_dir:
+            self.cert_dir.cleanup()
+
+
+class Subscriber:
+    """Counts deliveries and records publish-to-receive latency"""
+
+    def __init__(self, connection, topic_filter, qos):
+        self.connection = connection
+        self.received = 0
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+        subscribe_future, packet_id = connection.subscribe(
+            topic=topic_filter, qos=qos, callback=self.on_message_received)
+        subscribe_future.result(timeout=10)
+
+    def on_message_received(self, topic, payload, dup, qos, retain, **kwargs):
+        received_at = time.perf_counter()
+        seq, sent_at = PAYLOAD_HEADER.unpack_from(payload)
+        with self._lock:
+            self.received += 1
+            self.latency.record(received_at - sent_at)
+
+
+def publisher_worker(queue, topic, messages, rate, filler, qos, errors):
+    """Publish messages at rate msgs/sec (0 = as fast as the queue accepts)"""
+    interval = 1.0 / rate if rate else 0.0
+    next_send = time.monotonic()
+    futures = []
+    for seq in range(messages):
+        if interval:
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_send += interval
+        payload = PAYLOAD_HEADER.pack(seq, time.perf_counter()) + filler
+        futures.append(queue.submit(topic, payload, qos))
+    queue.flush()
+    errors.extend(future.exception() for future in futures if future.exception())
+
+
+def run_benchmark(args):
+    rng = random.Random(args.seed)
+    filler = bytes(rng.getrandbits(8) for _ in range(max(0, args.payload_size - PAYLOAD_HEADER.size)))
+    qos = mqtt.QoS(args.qos)
+
+    environment = BenchEnvironment(args)
+    environment.start()
+    try:
+        subscribers = [Subscriber(environment.connect(f"bench-sub-{index}"), "bench/#", qos)
+                       for index in range(args.subscribers)]
+        metrics = PublishMetrics()
+        queues = []
+        for index in range(args.publishers):
+            queue = PublishQueue(environment.connect(f"bench-pub-{index}"), qos=qos,
+                                 batch_size=args.batch_size, max_in_flight=args.max_in_flight,
+                                 metrics=metrics)
+            queue.start()
+            queues.append(queue)
+
+        errors = []
+        threads = [threading.Thread(target=publisher_worker, daemon=True,
+                                    args=(queue, f"bench/{index}/data", args.messages, args.rate,
+                                          filler, qos, errors))
+                   for index, queue in enumerate(queues)]
+
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        publish_elapsed = time.perf_counter() - start
+
+        expected = args.publishers * args.messages * args.subscribers
+        deadline = time.monotonic() + args.timeout
+        while sum(s.received for s in subscribers) < expected and time.monotonic() < deadline:
+            time.sleep(0.01)
+        delivery_elapsed = time.perf_counter() - start
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+
+        for queue in queues:
+            queue.stop()
+            queue.mqtt_connection.disconnect().result(timeout=5)
+        for subscriber in subscribers:
+            subscriber.connection.disconnect().result(timeout=5)
+    finally:
+        environment.stop()
+
+    puback = LatencyHistogram()
+    for topic_metrics in metrics.topics.values():
+        puback.merge(topic_metrics.ack_latency)
+    end_to_end = LatencyHistogram()
+    for subscriber in subscribers:
+        end_to_end.merge(subscriber.latency)
+
+    published = args.publishers * args.messages
+    received = sum(s.received for s in subscribers)
+    cpu_seconds = ((usage_after.ru_utime - usage_before.ru_utime)
+                   + (usage_after.ru_stime - usage_before.ru_stime))
+    return {
+        "publish_rate": (published - len(errors)) / publish_elapsed,
+        "delivery_rate": received / delivery_elapsed if received else 0.0,
+        "published": published,
+        "failed": len(errors),
+        "received": received,
+        "lost": max(0, expected - received),
+        "puback_p50_ms": puback.percentile(50) * 1000,
+        "puback_p99_ms": puback.percentile(99) * 1000,
+        "puback_p999_ms": puback.percentile(99.9) * 1000,
+        "e2e_p50_ms": end_to_end.percentile(50) * 1000,
+        "e2e_p99_ms": end_to_end.percentile(99) * 1000,
+        "e2e_p999_ms": end_to_end.percentile(99.9) * 1000,
+        "cpu_seconds": cpu_seconds,
+        "cpu_percent": cpu_seconds / delivery_elapsed * 100,
+        "cpu_us_per_message": cpu_seconds / max(1, published + received) * 1e6,
+        "max_rss_mb": usage_after.ru_maxrss / 1024,
+        "elapsed_seconds": delivery_elapsed,
+    }
+
+
+def print_results(config, results):
+    print("Configuration: " + ", ".join(f"{key}={value}" for key, value in config.items()))
+    print(f"  publish rate   {results['publish_rate']:>12,.0f} msgs/sec  "
+          f"({results['published']} sent, {results['failed']} failed)")
+    print(f"  delivery rate  {results['delivery_rate']:>12,.0f} msgs/sec  "
+          f"({results['received']} received, {results['lost']} lost)")
+    print(f"  PUBACK latency  p50 {results['puback_p50_ms']:.3f} ms  p99 {results['puback_p99_ms']:.3f} ms  "
+          f"p999 {results['puback_p999_ms']:.3f} ms")
+    print(f"  end-to-end      p50 {results['e2e_p50_ms']:.3f} ms  p99 {results['e2e_p99_ms']:.3f} ms  "
+          f"p999 {results['e2e_p999_ms']:.3f} ms")
+    print(f"  CPU {results['cpu_seconds']:.2f} s ({results['cpu_percent']:.0f}%, "
+          f"{results['cpu_us_per_message']:.1f} us/msg)  max RSS {results['max_rss_mb']:.1f} MB")
+
+
+def compare_results(baseline, results, tolerance):
+    """Print metric changes against a baseline; return the names that regressed"""
+    regressions = []
+    print(f"Comparison with baseline (tolerance {tolerance:.0%}):")
+    for name in COMPARED_METRICS:
+        old, new = baseline.get(name), results.get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        worse = -change if name in HIGHER_IS_BETTER else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        if flag:
+            regressions.append(name)
+        print(f"  {name:<20}{old:>14.3f}{new:>14.3f}{change:>+9.1%}  {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["crt", "local"], default="crt",
+                        help="crt: awscrt client over TCP to MQTTTestBroker; local: in-process LocalBroker")
+    parser.add_argument("--tls", action="store_true", help="serve mTLS with generated certificates")
+    parser.add_argument("--publishers", type=int, default=2)
+    parser.add_argument("--subscribers", type=int, default=1)
+    parser.add_argument("--messages", type=int, default=5000, help="messages per publisher")
+    parser.add_argument("--rate", type=float, default=0, help="msgs/sec per publisher (0 = unlimited)")
+    parser.add_argument("--payload-size", type=int, default=256)
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="runs to take the median publish rate of")
+    parser.add_argument("--timeout", type=float, default=30, help="seconds to wait for deliveries")
+    parser.add_argument("--json", help="write configuration and results to this file")
+    parser.add_argument("--compare", help="baseline JSON file from an earlier --json run")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    config = {key: getattr(args, key) for key in
+              ("backend", "tls", "publishers", "subscribers", "messages", "rate", "payload_size",
+               "qos", "batch_size", "max_in_flight", "seed")}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("Warning: baseline was recorded with a different configuration")
+
+    runs = [run_benchmark(args) for _ in range(args.repeat)]
+    median_rate = statistics.median_low(run["publish_rate"] for run in runs)
+    results = next(run for run in runs if run["publish_rate"] == median_rate)
+    print_results(config, results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": config, "results": results, "python": sys.version.split()[0],
+                       "host": os.uname().nodename}, f, indent=2)
+    if args.compare:
+        if compare_results(baseline["results"], results, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Capture recording cost and replay read rate, capture file vs JSON text log.
+
+Records --messages telemetry messages over 8 topics with CaptureWriter,
+and writes the same messages as the engine's "📨 Received message" log
+lines. Then reads everything back for replay: from the memory-mapped
+capture (raw payloads, no parsing) and from the text log (regex per
+line, json.loads, re-encode). Publishing is left out; both feed a no-op.
+
+    python benchmarks/bench_capture.py --messages 200000
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture import CaptureReader, CaptureWriter, Replayer
+
+LOG_LINE = re.compile(r"📨 Received message on topic '([^']*)': (.*)$")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    messages = [(f"test/dc/sensor-{index % 8}",
+                 b'{"timestamp":%d,"client_id":"Raspberry_AWS_IoT092025","data":{"temperature":%.1f,'
+                 b'"humidity":60.0,"status":"active"}}' % (1760000000 + index, 20 + index % 100 / 10))
+                for index in range(args.messages)]
+
+    with tempfile.TemporaryDirectory(prefix="mqtt-capture-") as directory:
+        capture_path = os.path.join(directory, "traffic.cap")
+        log_path = os.path.join(directory, "messages.log")
+
+        writer = CaptureWriter(capture_path)
+        start = time.perf_counter()
+        for topic, payload in messages:
+            writer.record(topic, payload)
+        writer.close()
+        record_seconds = time.perf_counter() - start
+
+        with open(log_path, "w", encoding="utf-8") as log:
+            for topic, payload in messages:
+                log.write(f"2025-10-18 12:00:00 INFO 📨 Received message on topic '{topic}': {payload.decode()}\n")
+
+        reader = CaptureReader(capture_path)
+        replayer = Replayer(reader, lambda topic, payload, qos: None, speed=None)
+        capture_seconds = replayer.run()["elapsed"]
+        reader.close()
+
+        start = time.perf_counter()
+        with open(log_path, encoding="utf-8") as log:
+            for line in log:
+                match = LOG_LINE.search(line)
+                json.dumps(json.loads(match.group(2)), separators=(",", ":")).encode("utf-8")
+        log_seconds = time.perf_counter() - start
+
+        print(f"{args.messages} messages, capture {os.path.getsize(capture_path) / 1024:,.0f} KB, "
+              f"text log {os.path.getsize(log_path) / 1024:,.0f} KB")
+        print(f"record            {record_seconds / args.messages * 1e6:.2f} us/msg")
+        print(f"replay, capture   {args.messages / capture_seconds:>12,.0f} msgs/sec")
+        print(f"replay, text log  {args.messages / log_seconds:>12,.0f} msgs/sec "
+              f"({log_seconds / capture_seconds:.1f}x slower)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Aggregate publish throughput of ConnectionPool as the pool size grows.
+
+The local broker stand-in enforces a per-connection publish rate, like the
+AWS IoT per-connection limit, so a single connection saturates at that rate.
+
+    python benchmarks/bench_connection_pool.py --rate-limit 2000 --sizes 1,2,4,8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import ConnectionPool
+from local_broker import LocalBroker
+
+
+def run_once(size, args):
+    broker = LocalBroker(puback_latency=args.latency, max_rate_per_connection=args.rate_limit)
+    pool = ConnectionPool(
+        endpoint="local", client_id="bench", cert_path=None, key_path=None, root_ca_path=None,
+        size=size, max_in_flight=args.window,
+        connection_factory=lambda client_id, **callbacks: broker.create_connection(client_id, **callbacks))
+    pool.connect()
+
+    topics = [f"bench/device{index}/telemetry" for index in range(args.topics)]
+    payload = b"x" * args.payload_size
+    start = time.perf_counter()
+    futures = [pool.publish(topics[index % len(topics)], payload) for index in range(args.messages)]
+    pool.flush()
+    elapsed = time.perf_counter() - start
+
+    failed = sum(1 for future in futures if future.exception())
+    pool.disconnect()
+    broker.shutdown()
+    return args.messages / elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--topics", type=int, default=256)
+    parser.add_argument("--payload-size", type=int, default=128)
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated PUBACK latency (s)")
+    parser.add_argument("--rate-limit", type=float, default=2000, help="per-connection msgs/sec cap")
+    parser.add_argument("--window", type=int, default=64, help="in-flight window per connection")
+    parser.add_argument("--sizes", default="1,2,4,8")
+    args = parser.parse_args()
+
+    print(f"{args.messages} messages over {args.topics} topics, {args.rate_limit:.0f} msgs/sec per connection")
+    print(f"{'connections':>12}{'msgs/sec':>12}{'failed':>8}")
+    for size in [int(value) for value in args.sizes.split(",")]:
+        rate, failed = run_once(size, args)
+        print(f"{size:>12}{rate:>12,.0f}{failed:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Duplicate suppression cost and accuracy for QoS 1 redeliveries.
+
+Feeds --messages unique telemetry payloads through a DuplicateFilter and,
+every --reconnect-every messages, redelivers the last --redeliver of them
+as a broker does after a reconnect, flagged dup. Reports the cost per
+check, how many redeliveries were caught, unique messages wrongly dropped
+(none should be, as they are not flagged) and the filter's memory, next
+to an exact set of every identity and next to decoding and formatting
+every message for display
+(client_engine.format_payload, what the GUI does with each message).
+
+    python benchmarks/bench_dedup.py --messages 500000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DuplicateFilter
+from client_engine import format_payload
+
+TOPIC = "test/dc/subtopic"
+
+
+def payload(seq):
+    return (b'{"timestamp":%d,"seq":%d,"client_id":"Raspberry_AWS_IoT092025",'
+            b'"data":{"temperature":%.1f,"humidity":60.0,"status":"active"}}' % (1760000000 + seq, seq, 20 + seq % 100 / 10))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500000)
+    parser.add_argument("--reconnect-every", type=int, default=10000)
+    parser.add_argument("--redeliver", type=int, default=200)
+    parser.add_argument("--capacity", type=int, default=10000)
+    parser.add_argument("--bloom-capacity", type=int, default=100000)
+    args = parser.parse_args()
+
+    stream = []
+    for seq in range(args.messages):
+        stream.append((payload(seq), False))
+        if seq and seq % args.reconnect_every == 0:
+            stream.extend((payload(old), True) for old in range(seq - args.redeliver + 1, seq + 1))
+    redelivered = len(stream) - args.messages
+
+    dedup = DuplicateFilter(capacity=args.capacity, bloom_capacity=args.bloom_capacity)
+    caught = wrongly_dropped = 0
+    start = time.perf_counter()
+    for data, is_redelivery in stream:
+        if dedup.is_duplicate(TOPIC, data, is_redelivery):
+            if is_redelivery:
+                caught += 1
+            else:
+                wrongly_dropped += 1
+    filter_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data, _ in stream:
+        format_payload(data)
+    format_seconds = time.perf_counter() - start
+
+    exact = {dedup.identity(TOPIC, data) for data, _ in stream}
+    exact_bytes = sys.getsizeof(exact) + sum(sys.getsizeof(key) for key in exact)
+
+    print(f"{args.messages} messages + {redelivered} redeliveries")
+    print(f"check             {filter_seconds / len(stream) * 1e6:.2f} us/msg "
+          f"(format_payload: {format_seconds / len(stream) * 1e6:.2f} us/msg)")
+    print(f"caught            {caught}/{redelivered} redeliveries, {wrongly_dropped} unique messages dropped")
+    print(f"memory            {dedup.memory_bytes() / 1024:,.0f} KB "
+          f"(exact set of every identity: {exact_bytes / 1024:,.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Messages and bytes sent for slowly changing telemetry, full documents vs DeltaPublisher.
+
+Simulates --devices sensors publishing once a second for --seconds:
+temperature and humidity random-walk slowly, the status changes rarely,
+and the timestamp changes every tick. Each stream is sent as full
+documents, as deltas without deadbands and as deltas with deadbands
+(0.1 for temperature, 0.5 for humidity), all JSON encoded. A DeltaState
+on the receiving side checks every rebuilt document against the source.
+
+    python benchmarks/bench_delta_publish.py --devices 10 --seconds 3600
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delta import DeltaPublisher, DeltaState
+from payload_codecs import encode_payload
+
+DEADBANDS = {"temperature": 0.1, "humidity": 0.5}
+
+
+def telemetry(device, seconds, seed):
+    rng = random.Random(seed * 1000 + device)
+    temperature = rng.uniform(18.0, 26.0)
+    humidity = rng.uniform(40.0, 60.0)
+    status = "active"
+    for tick in range(seconds):
+        temperature += rng.gauss(0.0, 0.01)
+        humidity += rng.gauss(0.0, 0.05)
+        if rng.random() < 0.001:
+            status = "inactive" if status == "active" else "active"
+        yield {
+            "timestamp": 1760000000 + tick,
+            "client_id": f"sensor-{device:03d}",
+            "data": {"temperature": round(temperature, 2), "humidity": round(humidity, 1), "status": status},
+        }
+
+
+def run_mode(deadbands, args):
+    receiver = DeltaState()
+    totals = {"messages": 0, "bytes": 0, "max_error": 0.0}
+    current = {}
+
+    def publish(topic, message):
+        totals["messages"] += 1
+        totals["bytes"] += len(encode_payload(message))
+        document = receiver.apply(topic, message)
+        source = current[topic]["data"]
+        for field in ("temperature", "humidity"):
+            totals["max_error"] = max(totals["max_error"], abs(document["data"][field] - source[field]))
+        if document["data"]["status"] != source["status"]:
+            raise AssertionError(f"{topic}: status not delivered")
+
+    sender = None if deadbands is None else DeltaPublisher(publish, deadbands=deadbands,
+                                                           keyframe_every=args.keyframe_every,
+                                                           keyframe_interval=0)
+    streams = [telemetry(device, args.seconds, args.seed) for device in range(args.devices)]
+    for tick in range(args.seconds):
+        for device, stream in enumerate(streams):
+            topic = f"sensors/{device}/telemetry"
+            message = next(stream)
+            current[topic] = message
+            if sender is None:
+                publish(topic, message)
+            else:
+                # The receiver keeps its last document between deltas; check it still holds
+                if sender.send(topic, message) is None:
+                    document = receiver.documents[topic]["data"]
+                    for field, band in deadbands.items():
+                        error = abs(document[field] - message["data"][field])
+                        if error > band + 1e-9:
+                            raise AssertionError(f"{topic}: {field} off by {error} (deadband {band})")
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--seconds", type=int, default=3600)
+    parser.add_argument("--keyframe-every", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    offered = args.devices * args.seconds
+    print(f"{args.devices} devices x {args.seconds} ticks = {offered} documents")
+    print(f"{'mode':<22}{'messages':>10}{'bytes':>12}{'reduction':>11}{'max error':>11}")
+    baseline = None
+    for name, deadbands in (("full documents", None), ("delta", {}), ("delta + deadbands", DEADBANDS)):
+        totals = run_mode(deadbands, args)
+        baseline = baseline or totals["bytes"]
+        print(f"{name:<22}{totals['messages']:>10}{totals['bytes']:>12,}"
+              f"{baseline / totals['bytes']:>10.1f}x{totals['max_error']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""PUBACK latency of a client whose message handlers are slow, inline vs DispatchExecutor.
+
+A subscriber connected to MQTTTestBroker handles each incoming message with
+a blocking handler (--work-ms of sleep, like a database write) while it
+publishes its own QoS 1 heartbeats every 10 ms. Handled inline, the
+handlers hold the awscrt event-loop thread and the heartbeat PUBACKs wait
+behind them; on a DispatchExecutor they run on worker lanes. Per-topic
+order is checked for every mode.
+
+    python benchmarks/bench_dispatch_executor.py --rate 400 --work-ms 2 --workers 1,4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awscrt import io, mqtt
+
+from dispatch_executor import DispatchExecutor
+from local_broker import MQTTTestBroker
+from metrics import LatencyHistogram
+
+
+def new_connection(port, client_id):
+    connection = mqtt.Connection(
+        client=mqtt.Client(io.ClientBootstrap.get_or_create_static_default(), None),
+        host_name="127.0.0.1",
+        port=port,
+        client_id=client_id,
+        clean_session=True,
+        keep_alive_secs=30)
+    connection.connect().result(10)
+    return connection
+
+
+def run_mode(workers, args):
+    broker = MQTTTestBroker()
+    port = broker.start()
+    last_seen = {}
+    out_of_order = [0]
+    handled = [0]
+
+    def handler(topic, payload, **kwargs):
+        time.sleep(args.work_ms / 1000)
+        seq = int(payload)
+        if seq < last_seen.get(topic, -1):
+            out_of_order[0] += 1
+        last_seen[topic] = seq
+        handled[0] += 1
+
+    executor = None
+    callback = handler
+    if workers:
+        executor = DispatchExecutor(workers, max_queued=args.queue_size)
+        executor.start()
+        callback = executor.wrap(handler)
+
+    subscriber = new_connection(port, "bench-sub")
+    subscriber.subscribe("bench/in/#", mqtt.QoS.AT_LEAST_ONCE, callback)[0].result(10)
+    publisher = new_connection(port, "bench-pub")
+
+    heartbeat = LatencyHistogram()
+    stop = threading.Event()
+
+    def send_heartbeats():
+        while not stop.wait(0.01):
+            sent_at = time.perf_counter()
+            future, _ = subscriber.publish("bench/heartbeat", b"1", mqtt.QoS.AT_LEAST_ONCE)
+            future.add_done_callback(lambda f, sent_at=sent_at: heartbeat.record(time.perf_counter() - sent_at))
+
+    heartbeat_thread = threading.Thread(target=send_heartbeats, daemon=True)
+    heartbeat_thread.start()
+
+    total = int(args.rate * args.seconds)
+    next_send = time.monotonic()
+    for seq in range(total):
+        publisher.publish(f"bench/in/{seq % args.topics}", str(seq).encode(), mqtt.QoS.AT_MOST_ONCE)
+        next_send += 1.0 / args.rate
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    stop.set()
+    heartbeat_thread.join()
+
+    deadline = time.monotonic() + args.seconds * 4 + 10
+    while handled[0] < total and time.monotonic() < deadline:
+        time.sleep(0.01)
+    if executor is not None:
+        executor.stop()
+    for connection in (publisher, subscriber):
+        connection.disconnect().result(10)
+    broker.stop()
+    return heartbeat, handled[0], total, out_of_order[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=400, help="incoming msgs/sec")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--work-ms", type=float, default=2.0, help="time each handler call blocks")
+    parser.add_argument("--topics", type=int, default=16)
+    parser.add_argument("--workers", default="1,4", help="comma-separated lane counts to try besides inline")
+    parser.add_argument("--queue-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    modes = [0] + [int(count) for count in args.workers.split(",") if count]
+    print(f"{args.rate:g} msgs/sec over {args.topics} topics, handlers block {args.work_ms:g} ms")
+    print(f"{'mode':<12}{'PUBACK p50':>12}{'p99':>10}{'max':>10}{'handled':>14}{'reordered':>11}")
+    for workers in modes:
+        heartbeat, handled, total, out_of_order = run_mode(workers, args)
+        name = f"{workers} lanes" if workers else "inline"
+        print(f"{name:<12}{heartbeat.percentile(50) * 1000:>10.2f}ms{heartbeat.percentile(99) * 1000:>8.1f}ms"
+              f"{heartbeat.max * 1000:>8.1f}ms{handled:>8}/{total:<5}{out_of_order:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Per-message overhead bytes and publish throughput, MQTT 3.1.1 vs MQTT 5.
+
+Publishes --messages QoS 1 messages of a typical JSON telemetry payload
+round-robin over --topics topics through a PublishQueue, with awscrt
+clients against MQTTTestBroker over TCP, and counts the PUBLISH bytes
+the broker received. Modes:
+
+    3.1.1                    awscrt.mqtt connection (full topic in every PUBLISH)
+    5                        MQTT5Connection without aliases or properties
+    5 + aliases              LRU topic aliases (8, the AWS IoT maximum)
+    5 + aliases + props      plus payload format, content type and message expiry
+
+    python benchmarks/bench_mqtt5.py --messages 20000 --topics 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awscrt import io, mqtt, mqtt5
+
+from local_broker import MQTTTestBroker
+from mqtt5_connection import AWS_IOT_TOPIC_ALIAS_MAXIMUM, MQTT5Connection
+from publish_queue import PublishQueue
+
+PAYLOAD = (b'{"timestamp":1760000000,"client_id":"Raspberry_AWS_IoT092025",'
+           b'"data":{"temperature":25.5,"humidity":60.1,"status":"active"}}')
+
+MODES = {
+    "3.1.1": None,
+    "5": {"topic_aliases": 0, "send_content_type": False},
+    "5 + aliases": {"topic_aliases": AWS_IOT_TOPIC_ALIAS_MAXIMUM, "send_content_type": False},
+    "5 + aliases + props": {"topic_aliases": AWS_IOT_TOPIC_ALIAS_MAXIMUM, "message_expiry": 60},
+}
+
+
+def connect(port, client_id, options):
+    if options is None:
+        connection = mqtt.Connection(
+            client=mqtt.Client(io.ClientBootstrap.get_or_create_static_default(), None),
+            host_name="127.0.0.1", port=port, client_id=client_id, clean_session=True, keep_alive_secs=30)
+    else:
+        connection = MQTT5Connection(mqtt5.ClientOptions(
+            host_name="127.0.0.1", port=port,
+            connect_options=mqtt5.ConnectPacket(client_id=client_id, keep_alive_interval_sec=30)), **options)
+    connection.connect().result(timeout=10)
+    return connection
+
+
+def run_mode(broker, port, name, options, args):
+    connection = connect(port, f"bench-{len(name)}-{name[:1]}", options)
+    topics = [f"test/dc/pubtopic/sensor-{index:02d}" for index in range(args.topics)]
+    queue = PublishQueue(connection, max_in_flight=args.max_in_flight)
+    queue.start()
+    bytes_before = broker.publish_bytes
+    start = time.perf_counter()
+    for index in range(args.messages):
+        queue.submit(topics[index % len(topics)], PAYLOAD)
+    queue.flush()
+    elapsed = time.perf_counter() - start
+    queue.stop()
+    wire_bytes = broker.publish_bytes - bytes_before
+    connection.disconnect().result(timeout=10)
+    if queue.failed_count:
+        raise RuntimeError(f"{name}: {queue.failed_count} publishes failed")
+    return wire_bytes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--topics", type=int, default=4)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    args = parser.parse_args()
+
+    broker = MQTTTestBroker()
+    port = broker.start()
+    print(f"{args.messages} messages of {len(PAYLOAD)} bytes over {args.topics} topics "
+          f"like 'test/dc/pubtopic/sensor-00'")
+    print(f"{'mode':<22}{'bytes/msg':>11}{'overhead':>10}{'msgs/sec':>12}")
+    try:
+        for name, options in MODES.items():
+            wire_bytes, elapsed = run_mode(broker, port, name, options, args)
+            per_message = wire_bytes / args.messages
+            print(f"{name:<22}{per_message:>11.1f}{per_message - len(PAYLOAD):>10.1f}"
+                  f"{args.messages / elapsed:>12,.0f}")
+    finally:
+        broker.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Bytes on the wire and encode/decode CPU time for each payload codec.
+
+Payloads are modelled on the GUI's sensor template with varying readings.
+Codecs whose optional package (msgpack, cbor2, zstandard) is missing are skipped.
+
+    python benchmarks/bench_payload_codecs.py --messages 20000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payload_codecs import CODECS, decode_payload, encode_payload
+
+
+def sensor_payloads(count, seed=42):
+    rng = random.Random(seed)
+    base_time = 1760000000
+    return [{
+        "timestamp": base_time + index,
+        "message": "Hello from MQTT Publisher GUI",
+        "client_id": "Raspberry_AWS_IoT092025",
+        "data": {
+            "temperature": round(rng.uniform(18.0, 32.0), 1),
+            "humidity": round(rng.uniform(30.0, 80.0), 1),
+            "status": rng.choice(["active", "active", "active", "inactive"]),
+        },
+    } for index in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+
+    messages = sensor_payloads(args.messages)
+    baseline = None
+    print(f"{args.messages} sensor messages")
+    print(f"{'codec':>14}{'bytes/msg':>11}{'vs json':>9}{'encode us':>11}{'decode us':>11}")
+    for name in CODECS:
+        start = time.perf_counter()
+        encoded = [encode_payload(message, name) for message in messages]
+        encode_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for payload in encoded:
+            decode_payload(payload)
+        decode_time = time.perf_counter() - start
+
+        size = sum(len(payload) for payload in encoded) / len(encoded)
+        baseline = baseline or size
+        print(f"{name:>14}{size:>11.1f}{size / baseline:>9.0%}"
+              f"{encode_time / len(messages) * 1e6:>11.2f}{decode_time / len(messages) * 1e6:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Payload generation rate: per-publish JSON handling vs a compiled PayloadTemplate.
+
+Compares the ways a synthetic sensor payload used to be produced on every
+publish with PayloadTemplate.render() for the GUI's default template:
+
+    gui text      strip + json.loads of the message text, then encode it (old GUI tick)
+    dict dumps    copy a dict, refresh fields, json.dumps + encode (old CLI)
+    template      compiled once, rendered straight to bytes
+
+    python benchmarks/bench_payload_template.py --messages 200000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from payload_template import PayloadTemplate
+
+TEMPLATE = """{
+  "timestamp": {{timestamp}},
+  "seq": {{seq}},
+  "message": "Hello from MQTT Publisher GUI",
+  "client_id": "{{client_id}}",
+  "data": {
+    "temperature": {{walk:25.5:0.1:1}},
+    "humidity": {{walk:60.0:0.5:1}},
+    "status": "active"
+  }
+}"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    template = PayloadTemplate(TEMPLATE, client_id="Raspberry_AWS_IoT092025", seed=1)
+    gui_text = "\n" + template.render().decode("utf-8") + "\n"
+    document = json.loads(gui_text)
+
+    def gui_text_path():
+        content = gui_text.strip()
+        json.loads(content)
+        return content.encode("utf-8")
+
+    def dict_dumps_path():
+        message = dict(document)
+        message["timestamp"] = int(time.time())
+        message["data"] = dict(message["data"], temperature=round(rng.uniform(18, 32), 1))
+        return json.dumps(message).encode("utf-8")
+
+    print(f"{args.messages} payloads of about {len(gui_text)} bytes")
+    print(f"{'path':<14}{'msgs/sec':>14}{'us/msg':>10}")
+    baseline = None
+    for name, render in (("gui text", gui_text_path), ("dict dumps", dict_dumps_path),
+                         ("template", template.render)):
+        start = time.perf_counter()
+        for _ in range(args.messages):
+            render()
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{name:<14}{args.messages / elapsed:>14,.0f}{elapsed / args.messages * 1e6:>10.2f}"
+              f"  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
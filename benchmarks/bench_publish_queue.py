@@ -0,0 +1,66 @@
+"""Throughput of PublishQueue against the local broker stand-in.
+
+Sweeps batch size and in-flight window and prints msgs/sec for each pair.
+
+    python benchmarks/bench_publish_queue.py --messages 20000 --latency 0.002
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_broker import LocalBroker
+from metrics import PublishMetrics
+from publish_queue import PublishQueue
+
+
+def run_once(broker, messages, batch_size, max_in_flight, payload, metrics=None):
+    connection = broker.create_connection(f"bench-{batch_size}-{max_in_flight}")
+    connection.connect()
+    queue = PublishQueue(connection, batch_size=batch_size, max_in_flight=max_in_flight, metrics=metrics)
+    queue.start()
+
+    start = time.perf_counter()
+    futures = [queue.submit("bench/publish", payload) for _ in range(messages)]
+    queue.flush()
+    elapsed = time.perf_counter() - start
+
+    queue.stop()
+    failed = sum(1 for future in futures if future.exception())
+    return messages / elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated PUBACK latency (s)")
+    parser.add_argument("--payload-size", type=int, default=128)
+    parser.add_argument("--batch-sizes", default="1,8,64,256")
+    parser.add_argument("--windows", default="1,8,64,512")
+    parser.add_argument("--metrics", action="store_true", help="record latency metrics during the runs")
+    args = parser.parse_args()
+
+    batch_sizes = [int(value) for value in args.batch_sizes.split(",")]
+    windows = [int(value) for value in args.windows.split(",")]
+    payload = b"x" * args.payload_size
+    broker = LocalBroker(puback_latency=args.latency)
+
+    print(f"{args.messages} messages, {args.payload_size} B payload, {args.latency * 1000:.1f} ms PUBACK latency, "
+          f"metrics {'on' if args.metrics else 'off'}")
+    print(f"{'batch':>8}" + "".join(f"{'window=' + str(window):>14}" for window in windows))
+    for batch_size in batch_sizes:
+        row = f"{batch_size:>8}"
+        for window in windows:
+            # A window of 1 at 2 ms latency caps out around 500 msgs/sec; keep those runs short
+            count = min(args.messages, max(200, int(window / max(args.latency, 1e-4) * 2)))
+            metrics = PublishMetrics() if args.metrics else None
+            rate, failed = run_once(broker, count, batch_size, window, payload, metrics)
+            row += f"{rate:>14,.0f}" + ("!" if failed else "")
+        print(row)
+    broker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Throughput and throttling against a rate-limited broker, with and without AdaptiveRateLimiter.
+
+LocalBroker enforces --broker-limit publishes/sec per connection and
+rejects publishes that would queue behind it for more than --backlog
+seconds, as AWS IoT throttles. A producer offers --offered msgs/sec
+through a PublishQueue for each mode:
+
+    none       no limiter; everything over the limit is rejected
+    at-limit   limiter set to the known broker limit
+    adaptive   limiter starting at half the limit and probing up to twice it (AIMD)
+
+    python benchmarks/bench_rate_limiter.py --offered 300 --broker-limit 100 --seconds 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awscrt import mqtt
+
+from local_broker import LocalBroker
+from metrics import LatencyHistogram
+from publish_queue import PublishQueue
+from rate_limiter import AdaptiveRateLimiter
+
+
+def run_mode(mode, args):
+    broker = LocalBroker(puback_latency=0.005, max_rate_per_connection=args.broker_limit,
+                         throttle_backlog=args.backlog)
+    queue = PublishQueue(broker.create_connection("bench-pub"), batch_size=8, max_in_flight=256)
+    queue.connection = queue.mqtt_connection.connect()
+    queue.start()
+    limiter = None
+    if mode == "at-limit":
+        limiter = AdaptiveRateLimiter(args.broker_limit)
+    elif mode == "adaptive":
+        limiter = AdaptiveRateLimiter(args.broker_limit / 2, max_rate=args.broker_limit * 2)
+
+    latency = LatencyHistogram()
+    results = {"acked": 0, "failed": 0}
+
+    def on_done(future, submitted_at):
+        latency.record(time.monotonic() - submitted_at)
+        results["failed" if future.exception() else "acked"] += 1
+
+    payload = b"x" * 200
+    total = int(args.offered * args.seconds)
+    start = next_send = time.monotonic()
+    for seq in range(total):
+        topic = f"bench/{seq % 8}"
+        if limiter is not None:
+            limiter.acquire(topic, len(payload))
+        else:
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_send += 1.0 / args.offered
+        submitted_at = time.monotonic()
+        future = queue.submit(topic, payload)
+        future.add_done_callback(lambda done, submitted_at=submitted_at: on_done(done, submitted_at))
+        if limiter is not None:
+            future.add_done_callback(lambda done, submitted_at=submitted_at, limiter=limiter:
+                                     limiter.record_result(time.monotonic() - submitted_at, done.exception()))
+        if time.monotonic() - start > args.seconds:
+            break
+    queue.flush(timeout=10)
+    elapsed = time.monotonic() - start
+    queue.stop()
+    broker.shutdown()
+    return {
+        "acked_rate": results["acked"] / elapsed,
+        "failed": results["failed"],
+        "acked": results["acked"],
+        "p99_ms": latency.percentile(99) * 1000,
+        "final_rate": limiter.rate if limiter else None,
+        "decreases": limiter.decrease_count if limiter else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--offered", type=float, default=300, help="msgs/sec the producer tries to send")
+    parser.add_argument("--broker-limit", type=float, default=100, help="broker publishes/sec per connection")
+    parser.add_argument("--backlog", type=float, default=0.2, help="seconds of queueing before the broker throttles")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--modes", default="none,at-limit,adaptive")
+    args = parser.parse_args()
+
+    print(f"Offering {args.offered:g} msgs/sec to a broker limited to {args.broker_limit:g}/sec "
+          f"for {args.seconds:g} s")
+    print(f"{'mode':<10}{'acked/sec':>11}{'acked':>8}{'throttled':>11}{'p99 PUBACK':>12}{'final rate':>12}{'cuts':>6}")
+    for mode in args.modes.split(","):
+        result = run_mode(mode, args)
+        final = f"{result['final_rate']:.1f}" if result["final_rate"] is not None else "-"
+        print(f"{mode:<10}{result['acked_rate']:>11.1f}{result['acked']:>8}{result['failed']:>11}"
+              f"{result['p99_ms']:>10.1f}ms{final:>12}{result['decreases']:>6}")
+
+
+if __name__ == "__main__":
+    main()
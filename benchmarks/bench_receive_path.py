@@ -0,0 +1,127 @@
+"""Per-message CPU and allocations of the receive path at a fixed message rate.
+
+Feeds sensor payloads through TopicDispatcher at --rate msgs/sec (paced in
+1 ms batches), wrapped in ReceivedMessage as MQTTClientEngine.dispatch
+does, and compares the old eager path, which decoded, parsed and
+re-indented every payload, with handlers that keep the raw bytes or parse
+lazily through ReceivedMessage.data (stdlib json and, if installed, orjson). Peak transient memory per message is
+measured separately with tracemalloc.
+
+    python benchmarks/bench_receive_path.py --rate 10000 --seconds 3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import payload_codecs
+from payload_codecs import ReceivedMessage, encode_payload
+from topics import TopicDispatcher
+
+
+def sensor_payloads(count, seed=42):
+    rng = random.Random(seed)
+    return [encode_payload({
+        "timestamp": 1760000000 + index,
+        "message": "Hello from MQTT Publisher GUI",
+        "client_id": "Raspberry_AWS_IoT092025",
+        "data": {
+            "temperature": round(rng.uniform(18.0, 32.0), 1),
+            "humidity": round(rng.uniform(30.0, 80.0), 1),
+            "status": rng.choice(["active", "active", "active", "inactive"]),
+        },
+    }) for index in range(count)]
+
+
+def eager_handler(topic, payload, **kwargs):
+    # The receive path before lazy parsing: every payload decoded, parsed and re-indented
+    text = payload.decode("utf-8")
+    return json.dumps(json.loads(text), indent=2)
+
+
+def raw_handler(topic, payload, message, **kwargs):
+    return len(message)
+
+
+def parsing_handler(topic, payload, message, **kwargs):
+    return message.data["data"]["temperature"]
+
+
+PATHS = [
+    ("eager decode + re-indent", eager_handler, False),
+    ("raw bytes, never parsed", raw_handler, False),
+    ("lazy .data, stdlib json", parsing_handler, False),
+    ("lazy .data, orjson", parsing_handler, True),
+]
+
+
+def run_paced(dispatch, payloads, rate, seconds):
+    """Dispatch rate msgs/sec for seconds; return (messages, CPU seconds, wall seconds)"""
+    per_tick = max(1, int(rate / 1000))
+    total = int(rate * seconds)
+    index = 0
+    cpu_start = time.process_time()
+    start = next_tick = time.monotonic()
+    while index < total:
+        for _ in range(per_tick):
+            dispatch("sensors/site1/temp", payloads[index % len(payloads)], False, 1, False)
+            index += 1
+        next_tick += per_tick / rate
+        delay = next_tick - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    return index, time.process_time() - cpu_start, time.monotonic() - start
+
+
+def peak_bytes_per_message(dispatch, payloads, samples):
+    """Mean peak of memory allocated while handling one message"""
+    tracemalloc.start()
+    peaks = 0
+    for index in range(samples):
+        payload = payloads[index % len(payloads)]
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        dispatch("sensors/site1/temp", payload, False, 1, False)
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return peaks / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=10000)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--samples", type=int, default=2000, help="messages traced for allocations")
+    args = parser.parse_args()
+
+    payloads = sensor_payloads(1000)
+    print(f"{args.rate:,.0f} msgs/sec for {args.seconds:g} s, {len(payloads[0])}-byte JSON payloads")
+    print(f"{'path':<28}{'achieved':>12}{'CPU us/msg':>12}{'CPU %':>8}{'peak B/msg':>12}")
+    baseline = None
+    for name, handler, fast_json in PATHS:
+        if not payload_codecs.use_fast_json(fast_json) and fast_json:
+            print(f"{name:<28}  skipped (orjson not installed)")
+            continue
+        dispatcher = TopicDispatcher()
+        dispatcher.add_handler("sensors/+/temp", handler)
+
+        def dispatch(topic, payload, dup, qos, retain):
+            dispatcher.dispatch(topic, payload, dup, qos, retain,
+                                message=ReceivedMessage(topic, payload, qos, retain))
+
+        count, cpu, wall = run_paced(dispatch, payloads, args.rate, args.seconds)
+        peak = peak_bytes_per_message(dispatch, payloads, args.samples)
+        per_message = cpu / count * 1e6
+        baseline = baseline or per_message
+        print(f"{name:<28}{count / wall:>12,.0f}{per_message:>12.2f}{cpu / wall * 100:>8.1f}"
+              f"{peak:>12,.0f}  ({baseline / per_message:.1f}x)")
+    payload_codecs.use_fast_json(True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Time to recover from a dropped connection, and messages lost meanwhile.
+
+Each round drops the subscriber's connection at MQTTTestBroker, publishes a
+burst of QoS 1 messages to it from a second client while it is away, and
+measures how long the subscriber takes to be connected and subscribed again.
+
+    builtin        clean session, awscrt's own reconnect (first retry after 5 s)
+    managed        persistent session, ReconnectManager with jittered backoff
+    managed-clean  clean session, ReconnectManager resubscribing in one SUBSCRIBE
+
+    python benchmarks/bench_reconnect.py --rounds 3 --modes builtin,managed,managed-clean
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from awscrt import io, mqtt
+
+from local_broker import MQTTTestBroker
+from reconnect import CRT_RECONNECT_OPTIONS, ReconnectManager
+
+
+def new_connection(port, client_id, clean_session, **options):
+    return mqtt.Connection(
+        client=mqtt.Client(io.ClientBootstrap.get_or_create_static_default(), None),
+        host_name="127.0.0.1",
+        port=port,
+        client_id=client_id,
+        clean_session=clean_session,
+        keep_alive_secs=30,
+        **options)
+
+
+def run_mode(mode, args):
+    broker = MQTTTestBroker()
+    port = broker.start()
+    received = set()
+    connected = threading.Event()
+    interrupted = threading.Event()
+    connected_at = [None]
+
+    def on_connected(*args, **kwargs):
+        connected_at[0] = time.monotonic()
+        connected.set()
+
+    def on_message(topic, payload, **kwargs):
+        received.add(int(payload))
+
+    if mode.startswith("managed"):
+        manager = None
+
+        def on_interrupted(connection, error, **kwargs):
+            connected.clear()
+            interrupted.set()
+            manager.connection_interrupted(error)
+
+        def on_resumed(connection, return_code, session_present, **kwargs):
+            manager.connection_resumed(return_code, session_present)
+
+        connection = new_connection(port, "bench-sub", mode == "managed-clean", on_connection_interrupted=on_interrupted,
+                                    on_connection_resumed=on_resumed, **CRT_RECONNECT_OPTIONS)
+        manager = ReconnectManager(connection, on_connected=on_connected)
+        manager.connect()
+    else:
+        manager = None
+        connection = new_connection(port, "bench-sub", True,
+                                    on_connection_interrupted=lambda **kwargs: (connected.clear(), interrupted.set()),
+                                    on_connection_resumed=on_connected)
+        connection.connect().result()
+        connected.set()
+    subscribe = manager.subscribe if manager else connection.subscribe
+    subscribe("bench/#", mqtt.QoS.AT_LEAST_ONCE, on_message)[0].result()
+
+    publisher = new_connection(port, "bench-pub", True)
+    publisher.connect().result()
+
+    recoveries = []
+    sent = 0
+    for _ in range(args.rounds):
+        interrupted.clear()
+        start = time.monotonic()
+        broker.interrupt_clients("bench-sub")
+        for _ in range(args.burst):
+            publisher.publish("bench/data", str(sent).encode(), mqtt.QoS.AT_LEAST_ONCE)
+            sent += 1
+        if not interrupted.wait(args.timeout) or not connected.wait(args.timeout):
+            print(f"  {mode}: not reconnected within {args.timeout}s")
+            break
+        recoveries.append(connected_at[0] - start)
+        time.sleep(args.settle)
+
+    publisher.disconnect().result()
+    if mode.startswith("managed"):
+        manager.stop()
+    connection.disconnect().result()
+    broker.stop()
+    return recoveries, sent, len(received)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--burst", type=int, default=100, help="QoS 1 messages published per outage")
+    parser.add_argument("--settle", type=float, default=0.2, help="seconds to wait for deliveries per round")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--modes", default="builtin,managed")
+    args = parser.parse_args()
+
+    print(f"{'mode':>10}{'recovery mean':>16}{'recovery max':>15}{'delivered':>16}")
+    for mode in args.modes.split(","):
+        recoveries, sent, delivered = run_mode(mode, args)
+        if not recoveries:
+            continue
+        print(f"{mode:>10}{statistics.mean(recoveries) * 1000:>13.1f} ms{max(recoveries) * 1000:>12.1f} ms"
+              f"{delivered:>9}/{sent:<6}")
+
+
+if __name__ == "__main__":
+    main()
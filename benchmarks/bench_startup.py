@@ -0,0 +1,144 @@
+"""Where the time to first publish goes on a cold start, serial vs overlapped.
+
+Each phase is timed --runs times and the median reported. Imports are
+timed in a fresh interpreter each run: the front end's own modules (with
+awscrt deferred), awscrt/awsiot, which the engine now loads on the
+connecting thread, and tkinter plus Tk() (skipped without a display).
+The TLS context is built from freshly generated PEM files once cold and
+once from tls_context's cache, then a connection is made over mutual TLS
+to MQTTTestBroker and one QoS 1 message is published and acknowledged.
+
+"serial" adds the phases up the way the GUI used to start: everything
+imported up front, the window built, a fixed 1 s delay, then a TLS
+context parsed for the connect. "overlapped" is the current order: the
+connect thread (awscrt import, TLS context build, handshake) runs
+alongside Tk, and the first publish waits for whichever finishes last.
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from awscrt import mqtt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import tls_context
+from local_broker import MQTTTestBroker, generate_test_certs
+
+GUI_DELAY = 1.0
+
+IMPORT_PROBE = """
+import json, os, time
+start = time.perf_counter()
+import client_engine, payload_template, scheduler, logging_setup
+engine = time.perf_counter()
+import awscrt.mqtt, awscrt.mqtt5, mqtt5_connection, publish_queue
+crt = time.perf_counter()
+gui = None
+if os.environ.get("DISPLAY"):
+    import tkinter, tkinter.ttk, tkinter.scrolledtext, tkinter.messagebox
+    root = tkinter.Tk()
+    root.update_idletasks()
+    gui = time.perf_counter() - crt
+    root.destroy()
+print(json.dumps({"engine": engine - start, "crt": crt - engine, "gui": gui}))
+"""
+
+
+def import_times():
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, check=True,
+                            capture_output=True, text=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def connect_and_publish(port, certs, client_id):
+    start = time.perf_counter()
+    connection = tls_context.mtls_from_path(
+        endpoint="localhost",
+        port=port,
+        cert_filepath=certs["client_cert"],
+        pri_key_filepath=certs["client_key"],
+        ca_filepath=certs["ca"],
+        client_id=client_id,
+        clean_session=True,
+        keep_alive_secs=30)
+    connection.connect().result(timeout=10)
+    connected = time.perf_counter()
+    future, _ = connection.publish("test/dc/pubtopic", b'{"message":"first"}', mqtt.QoS.AT_LEAST_ONCE)
+    future.result(timeout=10)
+    published = time.perf_counter()
+    connection.disconnect().result(timeout=10)
+    return connected - start, published - connected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    phases = {name: [] for name in ("engine", "crt", "gui", "tls_cold", "tls_cached", "connect", "publish")}
+    with tempfile.TemporaryDirectory(prefix="mqtt-startup-") as directory:
+        certs = generate_test_certs(directory)
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(certs["server_cert"], certs["server_key"])
+        ssl_context.load_verify_locations(certs["ca"])
+        ssl_context.verify_mode = ssl.CERT_REQUIRED
+        broker = MQTTTestBroker(ssl_context=ssl_context)
+        port = broker.start()
+        try:
+            for run in range(args.runs):
+                for name, seconds in import_times().items():
+                    if seconds is not None:
+                        phases[name].append(seconds)
+
+                tls_context.clear()
+                start = time.perf_counter()
+                tls_context.client_tls_context(certs["client_cert"], certs["client_key"], certs["ca"])
+                phases["tls_cold"].append(time.perf_counter() - start)
+                start = time.perf_counter()
+                tls_context.client_tls_context(certs["client_cert"], certs["client_key"], certs["ca"])
+                phases["tls_cached"].append(time.perf_counter() - start)
+
+                connect_seconds, publish_seconds = connect_and_publish(port, certs, f"startup-{run}")
+                phases["connect"].append(connect_seconds)
+                phases["publish"].append(publish_seconds)
+        finally:
+            broker.stop()
+
+    median = {name: statistics.median(values) if values else 0.0 for name, values in phases.items()}
+    labels = {
+        "engine": "import front end (awscrt deferred)",
+        "crt": "import awscrt/awsiot",
+        "gui": "import tkinter + Tk()",
+        "tls_cold": "TLS context, PEM parse",
+        "tls_cached": "TLS context, cached",
+        "connect": "connect (TCP + TLS + CONNACK)",
+        "publish": "first publish (PUBACK)",
+    }
+    print(f"median of {args.runs} runs, MQTTTestBroker over mutual TLS on localhost")
+    for name, label in labels.items():
+        note = "" if phases[name] or name != "gui" else "  (no display)"
+        print(f"{label:<34}{median[name] * 1000:>9.1f} ms{note}")
+
+    serial = (median["engine"] + median["crt"] + median["gui"] + GUI_DELAY
+              + median["tls_cold"] + median["connect"] + median["publish"])
+    connect_path = median["crt"] + median["tls_cold"] + median["connect"]
+    overlapped = median["engine"] + max(median["gui"], connect_path) + median["publish"]
+    reconnect = median["tls_cached"] + median["connect"]
+    print(f"time to first publish, serial     {serial * 1000:>9.1f} ms (includes the {GUI_DELAY:.0f} s delay)")
+    print(f"time to first publish, overlapped {overlapped * 1000:>9.1f} ms")
+    print(f"reconnect with cached TLS context {reconnect * 1000:>9.1f} ms "
+          f"(vs {(median['tls_cold'] + median['connect']) * 1000:.1f} ms parsing again)")
+
+
+if __name__ == "__main__":
+    main()
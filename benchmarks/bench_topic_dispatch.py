@@ -0,0 +1,88 @@
+"""Topic routing cost: TopicTrie versus a linear scan of topic filters.
+
+Builds a set of wildcard filters shaped like 'site/+/sensor/+' and
+'site/<n>/#', then routes random device topics through both.
+
+    python benchmarks/bench_topic_dispatch.py --filters 500 --topics 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from topics import TopicTrie, topic_matches
+
+
+def build_filters(count, rng):
+    filters = set()
+    while len(filters) < count:
+        site = rng.randrange(count)
+        shape = rng.randrange(4)
+        if shape == 0:
+            filters.add(f"site{site}/#")
+        elif shape == 1:
+            filters.add(f"site{site}/+/temperature")
+        elif shape == 2:
+            filters.add(f"+/device{rng.randrange(50)}/+")
+        else:
+            filters.add(f"site{site}/device{rng.randrange(50)}/humidity")
+    return sorted(filters)
+
+
+def build_topics(count, sites, rng, distinct):
+    pool = [f"site{rng.randrange(sites)}/device{rng.randrange(50)}/{rng.choice(['temperature', 'humidity', 'status'])}"
+            for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filters", type=int, default=500)
+    parser.add_argument("--topics", type=int, default=1000000)
+    parser.add_argument("--distinct-topics", type=int, default=100000,
+                        help="distinct topic strings in the stream (cache pressure)")
+    parser.add_argument("--linear-sample", type=int, default=20000,
+                        help="topics routed through the linear scan (it is slow)")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    filters = build_filters(args.filters, rng)
+    topics = build_topics(args.topics, args.filters, rng, args.distinct_topics)
+
+    trie = TopicTrie()
+    for topic_filter in filters:
+        trie.add(topic_filter, topic_filter)
+
+    start = time.perf_counter()
+    trie_matches = 0
+    for topic in topics:
+        trie_matches += len(trie.match(topic))
+    trie_time = time.perf_counter() - start
+
+    uncached = TopicTrie(cache_size=0)
+    for topic_filter in filters:
+        uncached.add(topic_filter, topic_filter)
+    start = time.perf_counter()
+    for topic in topics:
+        uncached.match(topic)
+    uncached_time = time.perf_counter() - start
+
+    sample = topics[:args.linear_sample]
+    start = time.perf_counter()
+    for topic in sample:
+        [f for f in filters if topic_matches(f, topic)]
+    linear_time = (time.perf_counter() - start) * len(topics) / len(sample)
+
+    print(f"{len(filters)} filters, {len(topics):,} topics ({args.distinct_topics:,} distinct), "
+          f"{trie_matches / len(topics):.2f} matches/topic")
+    for name, elapsed in (("trie (cached)", trie_time), ("trie (no cache)", uncached_time),
+                          ("linear scan*", linear_time)):
+        print(f"{name:>16}: {len(topics) / elapsed:>12,.0f} topics/sec  {elapsed / len(topics) * 1e6:8.2f} us/topic")
+    print(f"* extrapolated from {len(sample):,} topics")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""Record received MQTT traffic to a capture file and replay it.
+
+    python capture.py info traffic.cap
+    python capture.py replay traffic.cap --speed 10 --topic 'test/dc/#' --target local
+    python capture.py replay traffic.cap --speed max --target aws
+
+Capture files are written by CaptureWriter, or by MQTTClientEngine.start_recording
+(--record on the CLI). Replay to 'aws' publishes through AWSIoTMQTTTestClient
+with the device settings from load_config; 'local' uses the in-process
+LocalBroker stand-in and reports the rate the replay itself can reach.
+"""
+import argparse
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from topics import topic_matches
+
+logger = logging.getLogger(__name__)
+
+# File header: magic, version, reserved, creation time
+HEADER = struct.Struct("<4sHHd")
+MAGIC = b"MQCP"
+VERSION = 1
+
+# Record header: total length, receive time, qos, retain, topic length
+RECORD = struct.Struct("<IdBBH")
+
+# Index entry: record number, receive time, file offset; written after the
+# records on close, followed by the footer: index offset, record count, magic
+INDEX_ENTRY = struct.Struct("<QdQ")
+FOOTER = struct.Struct("<QQ4s")
+INDEX_MAGIC = b"MQIX"
+
+
+class CaptureWriter:
+    """Appends received messages to a length-prefixed binary capture file.
+
+    Each record is a 16-byte header (length, receive time, QoS, retain,
+    topic length) followed by the topic and the raw payload, so nothing is
+    encoded or parsed while recording. Every index_every records the
+    position is noted and the file flushed; close() writes the index after
+    the records. A file that was never closed (power loss) is still
+    readable up to its last complete record; only the index is rebuilt.
+
+    Recording to an existing capture continues after its last record
+    (raising ValueError if the file is not a capture); overwrite=True
+    starts the file afresh.
+    """
+
+    def __init__(self, path, index_every=1000, topic_filter=None, overwrite=False):
+        self.path = path
+        self.index_every = index_every
+        self.topic_filter = topic_filter
+        self.count = 0
+        self.bytes_written = HEADER.size
+        self._index = []
+        self._topics = {}
+        self._lock = threading.Lock()
+        if not overwrite and os.path.exists(path) and os.path.getsize(path):
+            reader = CaptureReader(path)
+            try:
+                self.count, self.bytes_written, self._index = reader.count, reader.end, reader.index
+            finally:
+                reader.close()
+            self._file = open(path, "r+b", buffering=256 * 1024)
+            # Drop the old index and footer (or a torn last record); close() writes them again
+            self._file.truncate(self.bytes_written)
+            self._file.seek(self.bytes_written)
+            logger.info("📼 Appending to %s after its %d records", path, self.count)
+        else:
+            self._file = open(path, "wb", buffering=256 * 1024)
+            self._file.write(HEADER.pack(MAGIC, VERSION, 0, time.time()))
+
+    def record(self, topic, payload, qos=1, retain=False, timestamp=None):
+        """Append one message; topic is a str, payload bytes-like"""
+        topic_bytes = self._topics.get(topic)
+        if topic_bytes is None:
+            # b"" marks a topic outside topic_filter
+            wanted = not self.topic_filter or topic_matches(self.topic_filter, topic)
+            topic_bytes = self._topics[topic] = topic.encode("utf-8") if wanted else b""
+        if not topic_bytes:
+            return False
+        timestamp = time.time() if timestamp is None else timestamp
+        length = RECORD.size + len(topic_bytes) + len(payload)
+        with self._lock:
+            if self._file is None:
+                return False
+            if self.count % self.index_every == 0:
+                self._index.append((self.count, timestamp, self.bytes_written))
+                self._file.flush()
+            self._file.write(RECORD.pack(length, timestamp, int(qos), bool(retain), len(topic_bytes)))
+            self._file.write(topic_bytes)
+            self._file.write(payload)
+            self.count += 1
+            self.bytes_written += length
+        return True
+
+    def on_message(self, topic, payload, dup, qos, retain, **kwargs):
+        """Subscription-callback form of record()"""
+        self.record(topic, payload, qos, retain)
+
+    def close(self):
+        """Write the index and footer and close the file"""
+        with self._lock:
+            if self._file is None:
+                return
+            index_offset = self.bytes_written
+            for entry in self._index:
+                self._file.write(INDEX_ENTRY.pack(*entry))
+            self._file.write(FOOTER.pack(index_offset, self.count, INDEX_MAGIC))
+            self._file.close()
+            self._file = None
+
+    def stats(self):
+        return {"path": self.path, "records": self.count, "bytes": self.bytes_written}
+
+
+class CaptureReader:
+    """Memory-maps a capture file and iterates its records without copying the file into memory.
+
+    records() yields (timestamp, topic, qos, retain, payload). The index
+    (read from the footer, or rebuilt by walking the length prefixes when
+    the file was not closed) lets start skip ahead without reading the
+    records before it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a capture file")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.created = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} capture file")
+        self._load_index(size)
+
+    def _load_index(self, size):
+        if size >= HEADER.size + FOOTER.size:
+            index_offset, count, magic = FOOTER.unpack_from(self._mmap, size - FOOTER.size)
+            entries = (size - FOOTER.size - index_offset) // INDEX_ENTRY.size if magic == INDEX_MAGIC else -1
+            if magic == INDEX_MAGIC and HEADER.size <= index_offset and entries >= 0:
+                self.end = index_offset
+                self.count = count
+                self.index = [INDEX_ENTRY.unpack_from(self._mmap, index_offset + i * INDEX_ENTRY.size)
+                              for i in range(entries)]
+                return
+        # Not closed cleanly: walk the records up to the last complete one
+        logger.warning("📼 %s has no index, scanning it", self.path)
+        self.index = []
+        offset, number = HEADER.size, 0
+        while offset + RECORD.size <= size:
+            length, timestamp = struct.unpack_from("<Id", self._mmap, offset)
+            if length < RECORD.size or offset + length > size:
+                break
+            if number % 1000 == 0:
+                self.index.append((number, timestamp, offset))
+            offset += length
+            number += 1
+        self.end = offset
+        self.count = number
+
+    @property
+    def duration(self):
+        """Seconds from the first record to the last"""
+        if not self.index:
+            return 0.0
+        offset = self.index[-1][2]
+        last = self.index[-1][1]
+        while offset < self.end:
+            length, last = struct.unpack_from("<Id", self._mmap, offset)
+            offset += length
+        return last - self.index[0][1]
+
+    def records(self, topic_filter=None, start=0.0):
+        """Yield (timestamp, topic, qos, retain, payload), optionally from start seconds in"""
+        data = self._mmap
+        offset = HEADER.size
+        if start and self.index:
+            # Jump to the last index entry before the start time
+            first = self.index[0][1]
+            position = bisect.bisect_right([entry[1] - first for entry in self.index], start) - 1
+            if position > 0:
+                offset = self.index[position][2]
+            start += first
+        else:
+            start = None
+        selected = {}
+        end = self.end
+        unpack = RECORD.unpack_from
+        while offset < end:
+            length, timestamp, qos, retain, topic_length = unpack(data, offset)
+            if start is not None:
+                if timestamp < start:
+                    offset += length
+                    continue
+                start = None
+            topic_start = offset + RECORD.size
+            topic_bytes = data[topic_start:topic_start + topic_length]
+            entry = selected.get(topic_bytes)
+            if entry is None:
+                topic = topic_bytes.decode("utf-8")
+                entry = selected[topic_bytes] = (topic, not topic_filter or topic_matches(topic_filter, topic))
+            if entry[1]:
+                yield timestamp, entry[0], qos, bool(retain), data[topic_start + topic_length:offset + length]
+            offset += length
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class Replayer:
+    """Republishes a capture at its original pace, speed times faster, or as fast as possible.
+
+    publish(topic, payload, qos) sends one message: an engine's
+    publish_async (see engine_publisher) or a connection's publish. With
+    speed None the records are sent back to back and only the publisher's
+    own backpressure limits the rate. lag is how far sends fell behind the
+    schedule.
+    """
+
+    def __init__(self, reader, publish, speed=1.0, topic_filter=None, start=0.0, limit=None):
+        self.reader = reader
+        self.publish = publish
+        self.speed = speed
+        self.topic_filter = topic_filter
+        self.start = start
+        self.limit = limit
+        self.sent_count = 0
+        self.bytes_sent = 0
+        self.max_lag = 0.0
+        self.elapsed = 0.0
+        self._stopped = threading.Event()
+
+    def run(self):
+        """Replay until the capture ends, limit is reached or stop() is called; returns stats()"""
+        began = time.monotonic()
+        first = None
+        for timestamp, topic, qos, retain, payload in self.reader.records(self.topic_filter, self.start):
+            if self._stopped.is_set() or (self.limit and self.sent_count >= self.limit):
+                break
+            if self.speed:
+                if first is None:
+                    first = timestamp
+                delay = began + (timestamp - first) / self.speed - time.monotonic()
+                if delay > 0:
+                    if self._stopped.wait(delay):
+                        break
+                elif -delay > self.max_lag:
+                    self.max_lag = -delay
+            self.publish(topic, payload, qos)
+            self.sent_count += 1
+            self.bytes_sent += len(payload)
+        self.elapsed = time.monotonic() - began
+        return self.stats()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self):
+        return {
+            "sent": self.sent_count,
+            "bytes": self.bytes_sent,
+            "elapsed": self.elapsed,
+            "rate": self.sent_count / self.elapsed if self.elapsed else 0.0,
+            "max_lag_ms": self.max_lag * 1000,
+        }
+
+
+def engine_publisher(client):
+    """publish(topic, payload, qos) for Replayer through an MQTTClientEngine; the engine always sends QoS 1"""
+    warned = []
+
+    def publish(topic, payload, qos):
+        if qos != 1 and not warned:
+            warned.append(True)
+            logger.warning("📼 Replaying through the engine sends every message at QoS 1 (recorded QoS %d)", qos)
+        return client.publish_async(topic, payload)
+    return publish
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    info = subcommands.add_parser("info", help="summarise a capture file")
+    info.add_argument("path")
+    replay = subcommands.add_parser("replay", help="publish a capture again")
+    replay.add_argument("path")
+    replay.add_argument("--speed", default="1", help="1 = real time, N = N times faster, 'max' = as fast as possible")
+    replay.add_argument("--topic", help="only replay topics matching this filter")
+    replay.add_argument("--start", type=float, default=0.0, help="seconds into the capture to start from")
+    replay.add_argument("--limit", type=int, help="stop after this many messages")
+    replay.add_argument("--target", choices=["local", "aws"], default="local")
+    replay.add_argument("--config", help="JSON file overriding the built-in device settings (aws)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    reader = CaptureReader(args.path)
+    try:
+        if args.command == "info":
+            topics = {}
+            for _, topic, _, _, payload in reader.records():
+                count, size = topics.get(topic, (0, 0))
+                topics[topic] = (count + 1, size + len(payload))
+            print(f"{reader.count} records over {reader.duration:.1f}s, {reader.end / 1024:,.0f} KB, "
+                  f"{len(reader.index)} index entries")
+            for topic, (count, size) in sorted(topics.items(), key=lambda item: -item[1][0]):
+                print(f"  {count:>9}  {size / count:>8.0f} B  {topic}")
+            return
+
+        speed = None if args.speed == "max" else float(args.speed)
+        if args.target == "aws":
+            from client_engine import load_config
+            from mqtt_publisher import AWSIoTMQTTTestClient
+            client = AWSIoTMQTTTestClient(**load_config(args.config))
+            if not client.connect():
+                return
+            publish = engine_publisher(client)
+            finish = client.disconnect
+        else:
+            from local_broker import LocalBroker
+            broker = LocalBroker(puback_latency=0.0)
+            connection = broker.create_connection("replay")
+            connection.connect()
+            publish = lambda topic, payload, qos: connection.publish(topic, payload, qos)
+            finish = broker.shutdown
+
+        replayer = Replayer(reader, publish, speed, args.topic, args.start, args.limit)
+        try:
+            stats = replayer.run()
+        except KeyboardInterrupt:
+            stats = replayer.stats()
+        finally:
+            finish()
+        logger.info("📤 Replayed %d messages (%.0f KB) in %.2fs: %.0f msgs/sec, max lag %.1f ms",
+                    stats["sent"], stats["bytes"] / 1024, stats["elapsed"], stats["rate"], stats["max_lag_ms"])
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
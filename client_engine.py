@@ -0,0 +1,515 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+# awscrt, and the modules built on it, are imported by connect() on the
+# connecting thread, so constructing an engine (and starting a front end) stays cheap
+import tls_context
+from rate_limiter import BLOCK, AdaptiveRateLimiter, RateLimitExceeded
+from dispatch_executor import DispatchExecutor
+from reconnect import CRT_RECONNECT_OPTIONS, ReconnectManager
+from spool import Spool, SpoolFullError
+from payload_codecs import ReceivedMessage, TopicCodecs, decode_payload, payload_text
+from aggregation import SampleAggregator
+from delta import DeltaPublisher
+from dedup import DuplicateFilter
+from capture import CaptureWriter
+from topics import TopicDispatcher
+from logging_setup import MESSAGE_LOGGER
+from metrics import PublishMetrics, serve_metrics
+
+logger = logging.getLogger(__name__)
+message_logger = logging.getLogger(MESSAGE_LOGGER)
+
+BASE_DIR = "/home/nippoh/mqtt_publisher"
+
+# Device settings shared by every front end; a JSON file named by
+# $MQTT_PUBLISHER_CONFIG (or passed to load_config) overrides them
+DEFAULT_CONFIG = {
+    "endpoint": "a2kymckba2gab5-ats.iot.ap-northeast-1.amazonaws.com",
+    "client_id": "Raspberry_AWS_IoT092025",
+    "cert_path": os.path.join(BASE_DIR, "14aa5e7756dbca4a909370cb57ad581e1bd334d390c0b17b96f6efa6bba834ac-certificate.pem.crt"),
+    "key_path": os.path.join(BASE_DIR, "14aa5e7756dbca4a909370cb57ad581e1bd334d390c0b17b96f6efa6bba834ac-private.pem.key"),
+    "root_ca_path": os.path.join(BASE_DIR, "AmazonRootCA1.pem"),
+}
+CONFIG_ENV = "MQTT_PUBLISHER_CONFIG"
+
+
+def load_config(path=None, **overrides):
+    """Return DEFAULT_CONFIG updated from a JSON file (path or $MQTT_PUBLISHER_CONFIG) and overrides"""
+    config = dict(DEFAULT_CONFIG)
+    path = path or os.environ.get(CONFIG_ENV)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            config.update(json.load(f))
+    config.update(overrides)
+    return config
+
+
+def format_payload(payload, content_type=None):
+    """Decode a received payload for display: text as-is, anything else as indented JSON"""
+    message = decode_payload(payload, content_type)
+    if isinstance(message, str):
+        return message
+    return json.dumps(message, indent=2, default=repr)
+
+
+class MQTTClientEngine:
+    """Headless AWS IoT client shared by the CLI, daemon and GUI front ends.
+
+    Owns one long-lived connection (kept up by ReconnectManager), the send
+    queue and spool, topic dispatch and metrics. Front ends are views: they
+    call connect/subscribe/publish and get told about connection changes
+    through connection_listeners (callables taking connected=bool, called
+    from MQTT threads). Messages no handler matches go to on_message if
+    given, otherwise they are logged.
+
+    With dispatch_workers > 0, handlers run on a DispatchExecutor (one
+    lane per worker, per-topic order kept) instead of the awscrt
+    event-loop thread, so a slow handler no longer delays PUBACKs and
+    keep-alives.
+
+    With rate_limit (msgs/sec, e.g. rate_limiter.AWS_IOT_CONNECTION_TPS),
+    publishes go through an AdaptiveRateLimiter: per-connection, optional
+    per-topic (topic_rate_limit) and bandwidth (bandwidth_limit, bytes/sec)
+    budgets, lowered when PUBACKs slow down or fail. rate_limit_policy
+    'block' makes publish_async wait for budget, 'drop' makes it raise
+    RateLimitExceeded.
+
+    With mqtt5=True the connection is an MQTT5Connection (awscrt.mqtt5)
+    instead of MQTT 3.1.1: hot topics are sent as topic aliases (up to
+    topic_aliases), publishes say their payload format and content type,
+    and with message_expiry (seconds) the broker drops messages still
+    undelivered after that long. Handlers then also get content_type.
+    topic_aliases defaults to the AWS IoT maximum.
+
+    With dedup=True (or a configured DuplicateFilter), QoS 1 redeliveries
+    seen within the filter's ttl are dropped in dispatch, before anything
+    decodes them. MQTT 5 deliveries have no dup flag, so there only a
+    filter with a sequence_field drops anything.
+    """
+
+    def __init__(self, endpoint, client_id, cert_path, key_path, root_ca_path=None,
+                 batch_size=64, batch_delay=0.002, max_in_flight=64,
+                 spool_path=None, spool_capacity=16 * 1024 * 1024, spool_eviction="drop_oldest",
+                 drain_rate=100.0, default_codec="json", metrics=False, clean_session=False,
+                 reconnect_min_delay=0.05, reconnect_max_delay=30.0, on_message=None,
+                 dispatch_workers=0, dispatch_queue_size=1000, rate_limit=None, topic_rate_limit=None,
+                 bandwidth_limit=None, rate_limit_policy=BLOCK, mqtt5=False,
+                 topic_aliases=None, message_expiry=None, dedup=False):
+        self.endpoint = endpoint
+        self.client_id = client_id
+        self.cert_path = cert_path
+        self.key_path = key_path
+        self.root_ca_path = root_ca_path
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_in_flight = max_in_flight
+        self.clean_session = clean_session
+        self.reconnect_min_delay = reconnect_min_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self.mqtt5 = mqtt5
+        self.topic_aliases = topic_aliases
+        self.message_expiry = message_expiry
+        self.mqtt_connection = None
+        self.reconnect = None
+        self.publish_queue = None
+        self.is_connected = False
+        self.connection_listeners = []
+        self.on_message = on_message
+        self.codecs = TopicCodecs(default_codec)
+        self.dispatcher = TopicDispatcher(default=self.on_message_received)
+        self.recorder = None
+        self.dedup = None
+        if dedup:
+            self.dedup = dedup if isinstance(dedup, DuplicateFilter) else DuplicateFilter()
+            if mqtt5 and not self.dedup.sequence_field:
+                logger.warning("⚠️ MQTT 5 messages carry no dup flag here; without a sequence_field "
+                               "duplicate suppression drops nothing")
+        self.executor = None
+        if dispatch_workers:
+            self.executor = DispatchExecutor(dispatch_workers, max_queued=dispatch_queue_size)
+        self.rate_limiter = None
+        if rate_limit:
+            self.rate_limiter = AdaptiveRateLimiter(rate_limit, topic_rate=topic_rate_limit,
+                                                    byte_rate=bandwidth_limit, policy=rate_limit_policy)
+        self.metrics = PublishMetrics() if metrics else None
+        self._metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.set_gauge("publish_in_flight", lambda: self.publish_queue.in_flight if self.publish_queue else 0)
+            self.metrics.set_gauge("spool_messages", lambda: len(self.spool) if self.spool is not None else 0)
+            if self.executor is not None:
+                self.metrics.set_gauge("dispatch_queued", self.executor.queued)
+                self.metrics.set_gauge("dispatch_dropped", lambda: self.executor.dropped_count)
+            if self.dedup is not None:
+                self.metrics.set_gauge("duplicates_dropped", lambda: self.dedup.duplicate_count)
+            if self.rate_limiter is not None:
+                self.metrics.set_gauge("publish_rate_limit", lambda: self.rate_limiter.rate)
+                self.metrics.set_gauge("rate_limited_dropped", lambda: self.rate_limiter.dropped_count)
+        self.drain_rate = drain_rate
+        self.spool = None
+        if spool_path:
+            self.spool = Spool(spool_path, capacity=spool_capacity, eviction=spool_eviction)
+        self._spool_lock = threading.Lock()
+        self._draining = False
+        
+    def on_connection_interrupted(self, connection, error, **kwargs):
+        logger.warning("Connection interrupted. error: %s", error)
+        self.is_connected = False
+        if self.metrics is not None:
+            self.metrics.connection_lost()
+        if self.reconnect:
+            self.reconnect.connection_interrupted(error)
+        self._notify_listeners(False)
+
+    def on_connection_resumed(self, connection, return_code, session_present, **kwargs):
+        if self.reconnect:
+            self.reconnect.connection_resumed(return_code, session_present)
+
+    def on_connected(self, session_present):
+        """Runs after the first connect and every reconnect (ReconnectManager thread)"""
+        if self.publish_queue is None:
+            self._start_publish_queue()
+        self.is_connected = True
+        if self.metrics is not None:
+            self.metrics.connection_restored()
+        self._start_spool_drain()
+        self._notify_listeners(True)
+
+    def _notify_listeners(self, connected):
+        for listener in self.connection_listeners:
+            try:
+                listener(connected)
+            except Exception as e:
+                logger.error("❌ Connection listener failed: %s", e)
+
+    def on_message_received(self, topic, payload, dup, qos, retain, **kwargs):
+        if self.metrics is not None:
+            self.metrics.record_received()
+        if self.on_message is not None:
+            self.on_message(topic=topic, payload=payload, dup=dup, qos=qos, retain=retain, **kwargs)
+            return
+        if not message_logger.isEnabledFor(logging.INFO):
+            return
+        try:
+            # Logged as received; parsing only to re-indent cost more than the rest of the path
+            message = payload_text(payload)
+        except Exception as e:
+            message_logger.warning("📨 Received undecodable message on topic '%s': %s", topic, e)
+            return
+        separator = "\n" if "\n" in message else " "
+        message_logger.info("📨 Received message on topic '%s':%s%s", topic, separator, message)
+
+    def connect(self, max_attempts=None):
+        """Connect, retrying with jittered exponential backoff (forever unless max_attempts)"""
+        if self.is_connected:
+            return True
+        if self.reconnect is not None:
+            # A manager from an earlier connect may still be retrying; this one replaces it
+            self.reconnect.stop()
+        if self.executor is not None:
+            self.executor.start()
+        try:
+            # Create MQTT connection; a persistent session keeps subscriptions
+            # and queued QoS1 messages at the broker across reconnects. The
+            # parsed certificate and key are cached by tls_context, so only
+            # the first connect reads the PEM files.
+            if self.mqtt5:
+                import mqtt5_connection
+                builder = mqtt5_connection.mtls_from_path
+                topic_aliases = self.topic_aliases
+                if topic_aliases is None:
+                    topic_aliases = mqtt5_connection.AWS_IOT_TOPIC_ALIAS_MAXIMUM
+                options = {"topic_aliases": topic_aliases, "message_expiry": self.message_expiry}
+            else:
+                builder = tls_context.mtls_from_path
+                options = CRT_RECONNECT_OPTIONS
+            self.mqtt_connection = builder(
+                endpoint=self.endpoint,
+                cert_filepath=self.cert_path,
+                pri_key_filepath=self.key_path,
+                ca_filepath=self.root_ca_path,
+                client_id=self.client_id,
+                clean_session=self.clean_session,
+                keep_alive_secs=30,
+                on_connection_interrupted=self.on_connection_interrupted,
+                on_connection_resumed=self.on_connection_resumed,
+                **options)
+            self.reconnect = ReconnectManager(
+                self.mqtt_connection,
+                on_connected=self.on_connected,
+                min_delay=self.reconnect_min_delay,
+                max_delay=self.reconnect_max_delay)
+            
+            logger.info("Connecting to %s with client ID %s%s...", self.endpoint, self.client_id,
+                        " (MQTT 5)" if self.mqtt5 else "")
+            
+            # Connect to AWS IoT
+            if not self.reconnect.connect(max_attempts):
+                logger.error("❌ Connection failed: %s", self.reconnect.last_error)
+                return False
+            
+            logger.info("✅ Successfully connected to AWS IoT!")
+            return True
+            
+        except Exception as e:
+            logger.error("❌ Connection failed: %s", e)
+            return False
+
+    def _start_publish_queue(self):
+        from awscrt import mqtt
+        from publish_queue import PublishQueue
+        self.publish_queue = PublishQueue(
+            self.mqtt_connection,
+            qos=mqtt.QoS.AT_LEAST_ONCE,
+            batch_size=self.batch_size,
+            batch_delay=self.batch_delay,
+            max_in_flight=self.max_in_flight,
+            metrics=self.metrics)
+        self.publish_queue.start()
+
+    def _start_spool_drain(self):
+        """Replay spooled messages in the background once the link is up"""
+        if self.spool is None or not self.publish_queue:
+            return
+        with self._spool_lock:
+            if self._draining or not len(self.spool):
+                return
+            self._draining = True
+        threading.Thread(target=self._spool_drain_worker, daemon=True).start()
+
+    def _spool_drain_worker(self):
+        from awscrt import mqtt
+        logger.info("💾 Draining %d spooled messages...", len(self.spool))
+        drained = 0
+        draining = True
+        try:
+            while draining:
+                try:
+                    drained += self.spool.drain(
+                        lambda topic, payload, qos: self._submit(topic, payload, mqtt.QoS(qos), BLOCK),
+                        rate=self.drain_rate,
+                        keep_going=lambda: self.is_connected)
+                except RuntimeError as e:
+                    # Publish queue stopped by disconnect(); the rest stays spooled
+                    logger.warning("❌ Spool drain stopped: %s", e)
+                    break
+                with self._spool_lock:
+                    # Cleared together with the check, so a message spooled after it is not stranded
+                    if not self.is_connected or not len(self.spool):
+                        self._draining = draining = False
+        finally:
+            if draining:
+                with self._spool_lock:
+                    self._draining = False
+        logger.info("💾 Drained %d spooled messages (%d left)", drained, len(self.spool))
+
+    def start_metrics_server(self, port=9100, host="127.0.0.1"):
+        """Expose /metrics (Prometheus) and /stats (JSON); requires metrics=True"""
+        if self._metrics is None:
+            raise RuntimeError("Client was created with metrics=False")
+        return serve_metrics(self._metrics, port, host)
+
+    def set_metrics_enabled(self, enabled):
+        """Pause or resume recording; the collected PublishMetrics are kept"""
+        self.metrics = self._metrics if enabled else None
+        if self.publish_queue:
+            self.publish_queue.metrics = self.metrics
+
+    def add_handler(self, topic_filter, handler):
+        """Route messages matching topic_filter to handler.
+
+        Handlers are matched locally, so one broad subscription (e.g.
+        'test/dc/#') can feed any number of filters. Messages no handler
+        matches go to on_message_received.
+        """
+        self.dispatcher.add_handler(topic_filter, handler)
+
+    def remove_handler(self, topic_filter, handler=None):
+        return self.dispatcher.remove_handler(topic_filter, handler)
+
+    def dispatch(self, topic, payload, dup, qos, retain, **kwargs):
+        """Subscription callback: route a message to its handlers.
+
+        Handlers get the payload exactly as awscrt delivered it plus message,
+        one ReceivedMessage shared by all of them, so the payload is parsed
+        at most once and only if a handler reads message.data.
+        """
+        if self.dedup is not None and self.dedup.is_duplicate(topic, payload, dup):
+            return
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record(topic, payload, qos, retain)
+        message = ReceivedMessage(topic, payload, qos, retain, kwargs.get("content_type"))
+        if self.executor is not None:
+            self.executor.submit(topic, self.dispatcher.dispatch, topic, payload, dup, qos, retain,
+                                 message=message, **kwargs)
+            return
+        self.dispatcher.dispatch(topic, payload, dup, qos, retain, message=message, **kwargs)
+
+    def start_recording(self, path, topic_filter=None, overwrite=False):
+        """Append every received message (after duplicate suppression) to a capture file for replay"""
+        self.stop_recording()
+        self.recorder = CaptureWriter(path, topic_filter=topic_filter, overwrite=overwrite)
+        logger.info("📼 Recording received messages to %s", path)
+        return self.recorder
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.close()
+            logger.info("📼 Recorded %d messages to %s", recorder.count, recorder.path)
+
+    def subscribe(self, topic):
+        if not self.is_connected:
+            logger.warning("Not connected to AWS IoT")
+            return False
+            
+        try:
+            from awscrt import mqtt
+            logger.info("Subscribing to topic: %s", topic)
+            subscribe_future, packet_id = self.reconnect.subscribe(
+                topic=topic,
+                qos=mqtt.QoS.AT_LEAST_ONCE,
+                callback=self.dispatch)
+            
+            subscribe_result = subscribe_future.result()
+            logger.info("✅ Subscribed to %s with QoS: %s", topic, subscribe_result['qos'])
+            return True
+            
+        except Exception as e:
+            logger.error("❌ Subscription failed: %s", e)
+            return False
+
+    def unsubscribe(self, topic):
+        if not self.reconnect:
+            return False
+            
+        try:
+            logger.info("Unsubscribing from topic: %s", topic)
+            unsubscribe_future, packet_id = self.reconnect.unsubscribe(topic)
+            unsubscribe_future.result()
+            logger.info("✅ Unsubscribed from %s", topic)
+            return True
+            
+        except Exception as e:
+            logger.error("❌ Unsubscribe failed: %s", e)
+            return False
+
+    @property
+    def subscribed_topics(self):
+        """Topic filters of the current connection, in subscription order"""
+        return list(self.reconnect.subscriptions) if self.reconnect else []
+
+    def publish_async(self, topic, message):
+        """Queue a message and return a Future that resolves on PUBACK.
+
+        dict messages are encoded with the codec selected for the topic
+        (see set_topic_codec); str and bytes are sent as-is.
+
+        While the link is down (or a spool drain is running, to keep ordering)
+        messages go to the spool instead and the Future resolves immediately
+        with {'spooled': True}.
+
+        With a rate limit, this waits for budget or raises RateLimitExceeded,
+        depending on rate_limit_policy.
+        """
+        if isinstance(message, dict):
+            message = self.codecs.encode(topic, message)
+
+        if self.spool is not None:
+            with self._spool_lock:
+                if not self.is_connected or self._draining:
+                    self.spool.append(topic, message)
+                    future = Future()
+                    future.set_result({"spooled": True})
+                    return future
+
+        if not self.is_connected:
+            raise ConnectionError("Not connected to AWS IoT")
+
+        # The queue's QoS, AT_LEAST_ONCE
+        return self._submit(topic, message, None)
+
+    def _submit(self, topic, payload, qos, policy=None):
+        """Queue a publish within the rate budget and feed its outcome back to the limiter"""
+        publish_queue = self.publish_queue
+        if publish_queue is None:
+            raise RuntimeError("Publish queue is not running")
+        limiter = self.rate_limiter
+        if limiter is None:
+            return publish_queue.submit(topic, payload, qos)
+        limiter.acquire(topic, len(payload), policy)
+        submitted_at = time.monotonic()
+        future = publish_queue.submit(topic, payload, qos)
+        future.add_done_callback(
+            lambda done: limiter.record_result(time.monotonic() - submitted_at, done.exception()))
+        return future
+
+    def set_topic_codec(self, topic_filter, codec_name):
+        """Encode dict messages on topics matching topic_filter with codec_name"""
+        self.codecs.set_codec(topic_filter, codec_name)
+
+    def create_aggregator(self, topic, fields, **options):
+        """Return a SampleAggregator that publishes one message per window on topic"""
+        options.setdefault("extra", {"client_id": self.client_id})
+        options.setdefault("codec", self.codecs.codec_for(topic))
+        return SampleAggregator(self.publish_async, topic, fields, **options)
+
+    def create_delta_publisher(self, **options):
+        """Return a DeltaPublisher whose send(topic, message) publishes only what changed"""
+        return DeltaPublisher(self.publish_async, **options)
+
+    def publish(self, topic, message):
+        if not self.is_connected and self.spool is None:
+            logger.warning("Not connected to AWS IoT")
+            return False
+            
+        try:
+            future = self.publish_async(topic, message)
+            
+            if future.done() and future.result().get("spooled"):
+                message_logger.info("💾 Not connected, spooled message for %s: %s", topic, message)
+            else:
+                message_logger.info("📤 Queued message for %s: %s", topic, message)
+            return True
+            
+        except SpoolFullError as e:
+            logger.error("❌ Spool full, message dropped: %s", e)
+            return False
+        except RateLimitExceeded as e:
+            logger.warning("❌ Rate limited, message dropped: %s", e)
+            return False
+        except Exception as e:
+            logger.error("❌ Publish failed: %s", e)
+            return False
+
+    def disconnect(self):
+        if self.reconnect:
+            self.reconnect.stop()
+
+        # From here publishes are spooled or refused, never handed to a queue being stopped
+        with self._spool_lock:
+            was_connected, self.is_connected = self.is_connected, False
+
+        if self.publish_queue:
+            self.publish_queue.stop()
+            self.publish_queue = None
+
+        if self.mqtt_connection and was_connected:
+            logger.info("Disconnecting from AWS IoT...")
+            disconnect_future = self.mqtt_connection.disconnect()
+            disconnect_future.result()
+            logger.info("✅ Disconnected")
+            self._notify_listeners(False)
+        self.reconnect = None
+
+        if self.executor is not None:
+            # Nothing new arrives now; handle what is already queued
+            self.executor.stop()
+        self.stop_recording()
+
+        if self.spool is not None:
+            self.spool.sync()
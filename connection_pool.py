@@ -0,0 +1,164 @@
+import json
+import logging
+import threading
+import time
+import zlib
+from awscrt import mqtt
+from publish_queue import PublishQueue
+import tls_context
+
+logger = logging.getLogger(__name__)
+
+
+class PooledConnection:
+    """One member of a ConnectionPool with its own publish queue and health state"""
+
+    def __init__(self, pool, index, client_id):
+        self.pool = pool
+        self.index = index
+        self.client_id = client_id
+        self.mqtt_connection = None
+        self.publish_queue = None
+        self.is_connected = False
+        self.interruption_count = 0
+        self.connect_attempts = 0
+        self.last_error = None
+        self.disconnected_since = time.monotonic()
+        self._stopping = False
+
+    def on_connection_interrupted(self, connection, error, **kwargs):
+        logger.warning("Pool connection %s interrupted. error: %s", self.client_id, error)
+        self.is_connected = False
+        self.interruption_count += 1
+        self.last_error = error
+        self.disconnected_since = time.monotonic()
+
+    def on_connection_resumed(self, connection, return_code, session_present, **kwargs):
+        logger.info("Pool connection %s resumed. return_code: %s", self.client_id, return_code)
+        self.is_connected = True
+        self.disconnected_since = None
+
+    def connect(self):
+        """Connect, retrying with exponential backoff until connected or stopped"""
+        self.mqtt_connection = self.pool.connection_factory(
+            client_id=self.client_id,
+            on_connection_interrupted=self.on_connection_interrupted,
+            on_connection_resumed=self.on_connection_resumed)
+        self.publish_queue = PublishQueue(
+            self.mqtt_connection,
+            batch_size=self.pool.batch_size,
+            max_in_flight=self.pool.max_in_flight)
+        self.publish_queue.start()
+
+        delay = self.pool.retry_min_delay
+        while not self._stopping:
+            self.connect_attempts += 1
+            try:
+                self.mqtt_connection.connect().result()
+                self.is_connected = True
+                self.disconnected_since = None
+                return True
+            except Exception as e:
+                self.last_error = e
+                logger.error("❌ Pool connection %s failed: %s; retrying in %.1fs", self.client_id, e, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, self.pool.retry_max_delay)
+        return False
+
+    def disconnect(self):
+        self._stopping = True
+        if self.publish_queue:
+            self.publish_queue.stop()
+        if self.mqtt_connection and self.is_connected:
+            self.mqtt_connection.disconnect().result()
+        self.is_connected = False
+
+    def stats(self):
+        return {
+            "client_id": self.client_id,
+            "connected": self.is_connected,
+            "interruptions": self.interruption_count,
+            "connect_attempts": self.connect_attempts,
+            "in_flight": self.publish_queue.in_flight if self.publish_queue else 0,
+            "sent": self.publish_queue.sent_count if self.publish_queue else 0,
+            "acked": self.publish_queue.acked_count if self.publish_queue else 0,
+            "failed": self.publish_queue.failed_count if self.publish_queue else 0,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
+
+
+class ConnectionPool:
+    """N mTLS connections with derived client IDs, sharding publishes by topic.
+
+    A topic always maps to the same connection (crc32 of the topic modulo N),
+    so per-topic ordering is preserved while aggregate throughput scales with
+    the number of connections. With failover=True, topics on an unhealthy
+    connection are rehashed onto the healthy ones (ordering is then only kept
+    per connection).
+    """
+
+    def __init__(self, endpoint, client_id, cert_path, key_path, root_ca_path, size=4,
+                 batch_size=64, max_in_flight=64, failover=False,
+                 retry_min_delay=1.0, retry_max_delay=60.0, connection_factory=None):
+        self.endpoint = endpoint
+        self.client_id = client_id
+        self.cert_path = cert_path
+        self.key_path = key_path
+        self.root_ca_path = root_ca_path
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.failover = failover
+        self.retry_min_delay = retry_min_delay
+        self.retry_max_delay = retry_max_delay
+        self.connection_factory = connection_factory or self._build_connection
+        self.connections = [PooledConnection(self, index, f"{client_id}-{index}") for index in range(size)]
+
+    def _build_connection(self, client_id, on_connection_interrupted, on_connection_resumed):
+        return tls_context.mtls_from_path(
+            endpoint=self.endpoint,
+            cert_filepath=self.cert_path,
+            pri_key_filepath=self.key_path,
+            ca_filepath=self.root_ca_path,
+            client_id=client_id,
+            clean_session=True,
+            keep_alive_secs=30,
+            on_connection_interrupted=on_connection_interrupted,
+            on_connection_resumed=on_connection_resumed)
+
+    def connect(self, timeout=None):
+        """Connect all members in parallel; returns the number connected within timeout"""
+        threads = [threading.Thread(target=member.connect, daemon=True) for member in self.connections]
+        for thread in threads:
+            thread.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        connected = sum(1 for member in self.connections if member.is_connected)
+        logger.info("✅ Connection pool: %d/%d connected", connected, len(self.connections))
+        return connected
+
+    def shard_for(self, topic):
+        """Return the pool member that owns topic"""
+        index = zlib.crc32(topic.encode("utf-8")) % len(self.connections)
+        member = self.connections[index]
+        if self.failover and not member.is_connected:
+            healthy = [m for m in self.connections if m.is_connected]
+            if healthy:
+                member = healthy[index % len(healthy)]
+        return member
+
+    def publish(self, topic, message, qos=mqtt.QoS.AT_LEAST_ONCE):
+        """Queue a message on the topic's connection and return its Future"""
+        if isinstance(message, dict):
+            message = json.dumps(message)
+        return self.shard_for(topic).publish_queue.submit(topic, message, qos)
+
+    def flush(self, timeout=None):
+        return all(member.publish_queue.flush(timeout) for member in self.connections)
+
+    def disconnect(self):
+        for member in self.connections:
+            member.disconnect()
+
+    def stats(self):
+        return [member.stats() for member in self.connections]
@@ -0,0 +1,172 @@
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 16-byte digests.
+
+    Sized for capacity items at false_positive_rate. The bit positions are
+    derived from the digest by double hashing, so adding or checking an
+    item hashes nothing.
+    """
+
+    def __init__(self, capacity, false_positive_rate=1e-6):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, digest):
+        """Add digest; returns True if it was (probably) present already"""
+        bits = self.bits
+        size = self.size
+        position = int.from_bytes(digest[:8], "little") % size
+        step = int.from_bytes(digest[8:16], "little") % size | 1
+        present = True
+        for _ in range(self.hashes):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                present = False
+            position = (position + step) % size
+        if not present:
+            self.count += 1
+        return present
+
+    def __contains__(self, digest):
+        bits = self.bits
+        size = self.size
+        position = int.from_bytes(digest[:8], "little") % size
+        step = int.from_bytes(digest[8:16], "little") % size | 1
+        for _ in range(self.hashes):
+            if not bits[position >> 3] & 1 << (position & 7):
+                return False
+            position = (position + step) % size
+        return True
+
+
+class DuplicateFilter:
+    """Recognises QoS 1 redeliveries on the receive path before anything parses them.
+
+    A message's identity is a 128-bit hash of its topic and payload or,
+    with sequence_field (e.g. '_seq' from DeltaPublisher), of its topic and
+    the sequence number read from the raw payload. Sequence numbers must
+    not restart within ttl, or new messages look like old ones.
+
+    Every message is recorded, but only one the broker flagged dup, or one
+    carrying a sequence number, is dropped when its identity was seen:
+    a device sending the same reading twice sends two messages.
+
+    Identities are remembered exactly in an LRU of the last capacity seen
+    within ttl seconds, and approximately in two generations of Bloom
+    filters sized for bloom_capacity identities each. The current
+    generation is retired after ttl seconds, or sooner once full, so memory
+    is fixed however fast messages arrive. A hit in the LRU is a
+    duplicate; a hit only in the Bloom filters is one with probability
+    1 - false_positive_rate, and with drop_probable=False is counted but
+    let through.
+    """
+
+    def __init__(self, ttl=300.0, capacity=10000, bloom_capacity=100000, false_positive_rate=1e-6,
+                 sequence_field=None, drop_probable=True):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.bloom_capacity = bloom_capacity
+        self.false_positive_rate = false_positive_rate
+        self.drop_probable = drop_probable
+        self.sequence_field = sequence_field
+        self._sequence = None
+        if sequence_field:
+            self._sequence = re.compile(rb'"' + re.escape(sequence_field.encode("utf-8")) + rb'"\s*:\s*(\d+)')
+
+        self.checked_count = 0
+        self.duplicate_count = 0
+        self.probable_count = 0
+        self.flagged_count = 0
+
+        self._recent = OrderedDict()
+        self._current = BloomFilter(bloom_capacity, false_positive_rate)
+        self._previous = None
+        self._generation_started = time.monotonic()
+        self._next_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def identity(self, topic, payload):
+        """128-bit digest identifying a message"""
+        return self._identify(topic, payload)[0]
+
+    def _identify(self, topic, payload):
+        """Return (digest, whether it came from a sequence number)"""
+        digest = hashlib.blake2b(topic.encode("utf-8"), digest_size=16)
+        digest.update(b"\x00")
+        if self._sequence is not None:
+            match = self._sequence.search(payload)
+            if match is not None:
+                digest.update(match.group(1))
+                return digest.digest(), True
+        digest.update(payload)
+        return digest.digest(), False
+
+    def is_duplicate(self, topic, payload, dup=False):
+        """Record a received message; True if it is a redelivery seen within ttl and should be dropped"""
+        key, sequenced = self._identify(topic, payload)
+        now = time.monotonic()
+        with self._lock:
+            self.checked_count += 1
+            if dup:
+                self.flagged_count += 1
+            if now >= self._next_sweep or self._current.count >= self.bloom_capacity:
+                self._expire(now)
+            recent = self._recent
+            exact = key in recent
+            if exact:
+                recent.move_to_end(key)
+            recent[key] = now
+            if len(recent) > self.capacity:
+                recent.popitem(last=False)
+            seen = exact or self._current.add(key)
+            if not seen and self._previous is not None:
+                seen = key in self._previous
+            if not seen or not (dup or sequenced):
+                return False
+            if not exact:
+                self.probable_count += 1
+                if not self.drop_probable:
+                    return False
+            self.duplicate_count += 1
+            return True
+
+    def _expire(self, now):
+        # Swept at most 100 times per ttl; entries outlive ttl by 1% at most
+        self._next_sweep = now + self.ttl / 100
+        recent = self._recent
+        cutoff = now - self.ttl
+        while recent:
+            key, seen_at = next(iter(recent.items()))
+            if seen_at > cutoff:
+                break
+            del recent[key]
+        if now - self._generation_started >= self.ttl or self._current.count >= self.bloom_capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.bloom_capacity, self.false_positive_rate)
+            self._generation_started = now
+
+    def memory_bytes(self):
+        """Approximate size: Bloom bit arrays plus LRU entries"""
+        bloom = len(self._current.bits) + (len(self._previous.bits) if self._previous is not None else 0)
+        return bloom + len(self._recent) * 120
+
+    def stats(self):
+        return {
+            "checked": self.checked_count,
+            "duplicates": self.duplicate_count,
+            "probable": self.probable_count,
+            "flagged_dup": self.flagged_count,
+            "recent": len(self._recent),
+            "memory_bytes": self.memory_bytes(),
+        }
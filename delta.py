@@ -0,0 +1,219 @@
+import threading
+import time
+
+SEQ_FIELD = "_seq"
+KEYFRAME_FIELD = "_keyframe"
+REMOVED_FIELD = "_removed"
+
+_MISSING = object()
+
+
+class DeltaPublisher:
+    """Publishes only the fields that changed since the last message on each topic.
+
+    Nested dicts are compared leaf by leaf against the last values sent.
+    A number within its deadband of the last sent value counts as unchanged
+    (deadbands maps a dotted path such as 'data.temperature', or just the
+    leaf name 'temperature', to a tolerance), so slow drift still goes out
+    once it adds up. Fields in carry (e.g. the timestamp) never count as a
+    change but ride along with every message. When nothing changed, nothing
+    is published.
+
+    Every message gets a per-topic sequence number in '_seq'. The first
+    message on a topic, then every keyframe_every messages or
+    keyframe_interval seconds, is a keyframe ('_keyframe': true) holding
+    the whole document; deltas hold the changed fields and, in '_removed',
+    the dotted paths of fields that disappeared. DeltaState rebuilds the
+    documents on the receiving side.
+    """
+
+    def __init__(self, publish, deadbands=None, keyframe_every=60, keyframe_interval=60.0,
+                 carry=("timestamp",)):
+        self.publish = publish
+        self.deadbands = dict(deadbands or {})
+        self.keyframe_every = keyframe_every
+        self.keyframe_interval = keyframe_interval
+        self.carry = {tuple(path.split(".")) for path in carry}
+
+        self.offered_count = 0
+        self.sent_count = 0
+        self.keyframe_count = 0
+        self.suppressed_count = 0
+
+        self._topics = {}
+        self._lock = threading.Lock()
+
+    def send(self, topic, message):
+        """Publish message (a dict) on topic as a keyframe or a delta.
+
+        Returns what publish returned, or None if the message was suppressed.
+        """
+        now = time.monotonic()
+        flat = {}
+        _flatten(message, (), flat)
+        with self._lock:
+            self.offered_count += 1
+            state = self._topics.get(topic)
+            if state is None or self._keyframe_due(state, now):
+                out = dict(message)
+                out[KEYFRAME_FIELD] = True
+                state = self._topics[topic] = _TopicState(now, state.seq if state else 0)
+                state.last = {path: value for path, value in flat.items() if path not in self.carry}
+                self.keyframe_count += 1
+            else:
+                changed = self._changes(state.last, flat)
+                removed = [path for path in state.last if path not in flat]
+                if not changed and not removed:
+                    self.suppressed_count += 1
+                    return None
+                state.last.update(changed)
+                for path in removed:
+                    del state.last[path]
+                for path in self.carry:
+                    if path in flat:
+                        changed[path] = flat[path]
+                out = _unflatten(changed)
+                if removed:
+                    out[REMOVED_FIELD] = [".".join(path) for path in removed]
+                state.since_keyframe += 1
+            state.seq += 1
+            out[SEQ_FIELD] = state.seq
+            self.sent_count += 1
+        return self.publish(topic, out)
+
+    def force_keyframe(self, topic=None):
+        """Make the next message on topic (or on every topic) a keyframe"""
+        with self._lock:
+            for name, state in self._topics.items():
+                if topic is None or name == topic:
+                    state.keyframe_at = None
+
+    def _keyframe_due(self, state, now):
+        if state.keyframe_at is None:
+            return True
+        if self.keyframe_every and state.since_keyframe + 1 >= self.keyframe_every:
+            return True
+        return bool(self.keyframe_interval) and now - state.keyframe_at >= self.keyframe_interval
+
+    def _deadband(self, path):
+        band = self.deadbands.get(".".join(path))
+        if band is None:
+            band = self.deadbands.get(path[-1])
+        return band
+
+    def _changes(self, last, flat):
+        changed = {}
+        for path, value in flat.items():
+            if path in self.carry:
+                continue
+            old = last.get(path, _MISSING)
+            if old is _MISSING:
+                changed[path] = value
+                continue
+            if value == old and type(value) is type(old):
+                continue
+            band = self._deadband(path)
+            if band and _is_number(value) and _is_number(old) and abs(value - old) <= band:
+                continue
+            changed[path] = value
+        return changed
+
+    def stats(self):
+        return {
+            "offered": self.offered_count,
+            "sent": self.sent_count,
+            "keyframes": self.keyframe_count,
+            "suppressed": self.suppressed_count,
+        }
+
+
+class _TopicState:
+    __slots__ = ("last", "seq", "since_keyframe", "keyframe_at")
+
+    def __init__(self, keyframe_at, seq):
+        self.last = {}
+        self.seq = seq
+        self.since_keyframe = 0
+        self.keyframe_at = keyframe_at
+
+
+class DeltaState:
+    """Rebuilds full documents from a DeltaPublisher stream, per topic.
+
+    apply() returns the current document (shared state; copy it before
+    changing it), the message unchanged if it carries no sequence number,
+    or None for a duplicate or while waiting for a keyframe after a gap.
+    """
+
+    def __init__(self):
+        self.documents = {}
+        self.resync_count = 0
+        self._seqs = {}
+
+    def apply(self, topic, message):
+        seq = message.get(SEQ_FIELD)
+        if seq is None:
+            return message
+        last_seq = self._seqs.get(topic)
+        if message.get(KEYFRAME_FIELD):
+            document = {key: value for key, value in message.items() if key not in (SEQ_FIELD, KEYFRAME_FIELD)}
+            self.documents[topic] = document
+            self._seqs[topic] = seq
+            return document
+
+        document = self.documents.get(topic)
+        if document is None or last_seq is None:
+            return None
+        if seq <= last_seq:
+            return None  # redelivered duplicate
+        if seq != last_seq + 1:
+            # Missed a message: wait for the next keyframe
+            self.resync_count += 1
+            del self.documents[topic]
+            return None
+
+        for dotted in message.get(REMOVED_FIELD, ()):
+            _remove_path(document, dotted.split("."))
+        _merge(document, {key: value for key, value in message.items()
+                          if key not in (SEQ_FIELD, REMOVED_FIELD)})
+        self._seqs[topic] = seq
+        return document
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _flatten(message, prefix, out):
+    for key, value in message.items():
+        path = prefix + (key,)
+        if isinstance(value, dict) and value:
+            _flatten(value, path, out)
+        else:
+            out[path] = value
+
+
+def _unflatten(flat):
+    message = {}
+    for path, value in flat.items():
+        node = message
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+    return message
+
+
+def _merge(document, changes):
+    for key, value in changes.items():
+        if isinstance(value, dict) and value and isinstance(document.get(key), dict):
+            _merge(document[key], value)
+        else:
+            document[key] = value
+
+
+def _remove_path(document, keys):
+    for key in keys[:-1]:
+        document = document.get(key)
+        if not isinstance(document, dict):
+            return
+    document.pop(keys[-1], None)
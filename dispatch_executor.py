@@ -0,0 +1,163 @@
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class DispatchExecutor:
+    """Runs message handlers off the awscrt event-loop thread, keeping per-topic order.
+
+    Messages are spread over workers lanes by a hash of their key (the
+    topic); each lane is a bounded queue drained by one thread, so messages
+    on a topic are handled in arrival order while different topics run in
+    parallel. With processes=True the lanes hand each call to a process
+    pool, letting CPU-heavy handlers use several cores; such handlers must
+    be module-level functions and are given plain bytes (see wrap).
+
+    A full lane is backpressure: submit() blocks for up to block_timeout
+    seconds, which stops awscrt reading from the socket, then drops the
+    message and counts it. Messages submitted while the executor is not
+    running (before start() or after stop()) are dropped and counted too.
+    """
+
+    def __init__(self, workers=4, max_queued=1000, processes=False, block_timeout=5.0, name="dispatch"):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.processes = processes
+        self.block_timeout = block_timeout
+        self.name = name
+
+        self.submitted_count = 0
+        self.handled_count = 0
+        self.error_count = 0
+        self.dropped_count = 0
+
+        self._lanes = []
+        self._threads = []
+        self._pool = None
+        self._lock = threading.Lock()
+        self._submitting = 0
+        self._submits_done = threading.Condition(self._lock)
+
+    def start(self):
+        """Start the lane threads (and process pool); does nothing if already running"""
+        with self._lock:
+            if self._threads:
+                return
+            if self.processes:
+                # awscrt's native threads do not survive fork, so workers are spawned
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self._lanes = [queue.Queue(self.max_queued) for _ in range(self.workers)]
+            self._threads = [threading.Thread(target=self._lane_worker, args=(lane, self._pool),
+                                              name=f"{self.name}-{index}", daemon=True)
+                             for index, lane in enumerate(self._lanes)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, function, *args, callback=None, **kwargs):
+        """Queue function(*args, **kwargs) on the lane for key; False if it was dropped.
+
+        callback, if given, is called with the function's result on the lane
+        thread.
+        """
+        # Checked under the lock stop() takes, so nothing lands behind a lane's stop marker
+        with self._lock:
+            lanes = self._lanes
+            if not lanes:
+                self._dropped(key, "Dispatch executor not running")
+                return False
+            self._submitting += 1
+        try:
+            lanes[hash(key) % self.workers].put((function, args, kwargs, callback), timeout=self.block_timeout)
+        except queue.Full:
+            self._dropped(key, "Dispatch queue full")
+            return False
+        finally:
+            with self._lock:
+                self._submitting -= 1
+                if not self._submitting:
+                    self._submits_done.notify_all()
+        self.submitted_count += 1
+        return True
+
+    def _dropped(self, key, reason):
+        # Called from awscrt threads: count and log, never raise
+        self.dropped_count += 1
+        if self.dropped_count == 1 or self.dropped_count % 1000 == 0:
+            logger.warning("❌ %s, %d messages dropped so far (last on %s)", reason, self.dropped_count, key)
+
+    def wrap(self, handler, on_result=None):
+        """Turn a message handler into one that runs on this executor.
+
+        The result has the awscrt callback signature, so it can be given to
+        subscribe or add_handler. In process mode handler is called as
+        handler(topic, payload, dup, qos, retain) with payload as bytes, and
+        on_result receives whatever it returns.
+        """
+        def submit_message(topic, payload, dup, qos, retain, **kwargs):
+            if self.processes:
+                self.submit(topic, handler, topic, bytes(payload), dup, qos, retain, callback=on_result)
+            else:
+                self.submit(topic, handler, topic=topic, payload=payload, dup=dup, qos=qos, retain=retain,
+                            callback=on_result, **kwargs)
+        return submit_message
+
+    def queued(self):
+        return sum(lane.qsize() for lane in self._lanes)
+
+    def flush(self):
+        """Wait until every queued message has been handled"""
+        for lane in self._lanes:
+            lane.join()
+
+    def stop(self, timeout=5.0):
+        """Handle what is queued, then stop the lane threads and the process pool"""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            lanes, self._lanes = self._lanes, []
+            pool, self._pool = self._pool, None
+            # Let submits already past the running check finish their put
+            self._submits_done.wait_for(lambda: not self._submitting, timeout)
+        for lane in lanes:
+            lane.put(_STOP)
+        for thread in threads:
+            thread.join(timeout)
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _lane_worker(self, lane, pool):
+        while True:
+            item = lane.get()
+            try:
+                if item is _STOP:
+                    return
+                function, args, kwargs, callback = item
+                try:
+                    if pool is not None:
+                        result = pool.submit(function, *args, **kwargs).result()
+                    else:
+                        result = function(*args, **kwargs)
+                    if callback is not None:
+                        callback(result)
+                except Exception as e:
+                    self.error_count += 1
+                    logger.error("❌ Message handler %s failed: %r", getattr(function, "__name__", function), e)
+                self.handled_count += 1
+            finally:
+                lane.task_done()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "processes": self.processes,
+            "queued": self.queued(),
+            "submitted": self.submitted_count,
+            "handled": self.handled_count,
+            "errors": self.error_count,
+            "dropped": self.dropped_count,
+        }
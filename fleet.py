@@ -0,0 +1,338 @@
+"""Fleet simulator: thousands of virtual devices, each with its own MQTT connection.
+
+Every device has its own client ID, topic namespace (<topic-prefix>/<client_id>/telemetry)
+and publish schedule. Connections share one awscrt client (TLS context)
+and a small event-loop group; publishes are issued from a few scheduler
+threads, so the per-device cost is the connection plus a __slots__ record.
+Devices come up following a ramp profile, and aggregate stats are printed
+while the fleet runs.
+
+    python fleet.py --broker test --devices 2000 --ramp linear:500 --interval 5 --duration 60
+    python fleet.py --broker aws --devices 100 --ramp step:10:1 --port 8883
+
+'test' runs MQTTTestBroker in this process (its CPU and memory are included
+in the report); 'aws' uses the device settings from client_engine.load_config
+and, like the engine, port 443 with ALPN unless --port (or "port" in the
+config) says otherwise.
+"""
+import argparse
+import logging
+import random
+import resource
+import threading
+import time
+
+from awscrt import io, mqtt
+
+from client_engine import load_config
+from metrics import LatencyHistogram
+from scheduler import PublishScheduler
+from tls_context import client_tls_context
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_FORMAT = b'{"client_id":"%s","seq":%d,"timestamp":%d,"temperature":%.2f}'
+
+
+class RampProfile:
+    """When each device starts, as an offset in seconds from the fleet start.
+
+    instant          everything at once
+    linear:RATE      RATE devices per second
+    step:COUNT:SECS  COUNT devices every SECS seconds
+    """
+
+    def __init__(self, spec="instant"):
+        kind, _, args = spec.partition(":")
+        values = [float(value) for value in args.split(":")] if args else []
+        if kind == "instant" and not values:
+            self.offset = lambda index: 0.0
+        elif kind == "linear" and len(values) == 1 and values[0] > 0:
+            rate = values[0]
+            self.offset = lambda index: index / rate
+        elif kind == "step" and len(values) == 2 and values[0] >= 1:
+            count, every = int(values[0]), values[1]
+            self.offset = lambda index: (index // count) * every
+        else:
+            raise ValueError(f"Unknown ramp profile: {spec}")
+        self.spec = spec
+
+
+class VirtualDevice:
+    """State of one simulated device, kept small with __slots__"""
+
+    __slots__ = ("fleet", "client_id", "topic", "connection", "connected", "seq", "value",
+                 "sent", "acked", "failed", "interruptions", "job")
+
+    def __init__(self, fleet, client_id, topic, value):
+        self.fleet = fleet
+        self.client_id = client_id
+        self.topic = topic
+        self.connection = None
+        self.connected = False
+        self.seq = 0
+        self.value = value
+        self.sent = 0
+        self.acked = 0
+        self.failed = 0
+        self.interruptions = 0
+        self.job = None
+
+    def publish(self):
+        """Scheduled tick: send one telemetry message, never blocking the scheduler"""
+        if not self.connected:
+            return
+        self.seq += 1
+        self.value += self.fleet.rng.uniform(-0.05, 0.05)
+        payload = PAYLOAD_FORMAT % (self.client_id.encode(), self.seq, int(time.time()), self.value)
+        sent_at = time.perf_counter()
+        try:
+            future, _ = self.connection.publish(self.topic, payload, self.fleet.qos)
+        except Exception:
+            self.failed += 1
+            return
+        self.sent += 1
+        future.add_done_callback(lambda done: self._on_done(done, sent_at))
+
+    def _on_done(self, future, sent_at):
+        if future.exception():
+            self.failed += 1
+        else:
+            self.acked += 1
+            self.fleet.record_latency(time.perf_counter() - sent_at)
+
+    def on_connection_interrupted(self, connection, error, **kwargs):
+        self.connected = False
+        self.interruptions += 1
+
+    def on_connection_resumed(self, connection, return_code, session_present, **kwargs):
+        self.connected = True
+
+
+class FleetSimulator:
+    """Runs devices virtual devices against one broker endpoint.
+
+    connection_factory(client_id, on_connection_interrupted,
+    on_connection_resumed) returns an unconnected awscrt-style connection
+    (see crt_connection_factory). At most max_connecting CONNECTs are
+    outstanding during the ramp. Publishes are spread over schedulers
+    PublishScheduler threads; every device publishes every interval
+    seconds with a random phase and optional jitter. seed makes the
+    simulated readings repeatable.
+    """
+
+    def __init__(self, connection_factory, devices=1000, client_id_prefix="sim", topic_prefix="sim",
+                 interval=1.0, jitter=0.0, qos=mqtt.QoS.AT_LEAST_ONCE, ramp="instant",
+                 schedulers=2, max_connecting=100, seed=None):
+        self.connection_factory = connection_factory
+        self.interval = interval
+        self.jitter = jitter
+        self.qos = qos
+        self.ramp = ramp if isinstance(ramp, RampProfile) else RampProfile(ramp)
+        self.max_connecting = max_connecting
+        rng = self.rng = random.Random(seed)
+        width = len(str(devices - 1))
+        self.devices = []
+        for index in range(devices):
+            client_id = f"{client_id_prefix}-{index:0{width}d}"
+            self.devices.append(VirtualDevice(self, client_id, f"{topic_prefix}/{client_id}/telemetry",
+                                              rng.uniform(18.0, 28.0)))
+        # No busy-wait before deadlines: with thousands of jobs it would spin most of the time
+        self.schedulers = [PublishScheduler(spin=0.0) for _ in range(schedulers)]
+
+        self.connect_failed_count = 0
+        self.latency = LatencyHistogram()
+        self.started_at = None
+        self._latency_lock = threading.Lock()
+        self._connecting = threading.BoundedSemaphore(max_connecting)
+        self._stopped = threading.Event()
+        self._ramp_thread = None
+
+    def record_latency(self, seconds):
+        with self._latency_lock:
+            self.latency.record(seconds)
+
+    def start(self):
+        """Start the schedulers and bring devices up along the ramp in the background"""
+        self.started_at = time.monotonic()
+        for scheduler in self.schedulers:
+            scheduler.start()
+        self._ramp_thread = threading.Thread(target=self._ramp_worker, name="fleet-ramp", daemon=True)
+        self._ramp_thread.start()
+
+    def _ramp_worker(self):
+        for index, device in enumerate(self.devices):
+            delay = self.started_at + self.ramp.offset(index) - time.monotonic()
+            if delay > 0 and self._stopped.wait(delay):
+                return
+            # Wait for a CONNECT slot, but never past stop()
+            while not self._connecting.acquire(timeout=0.1):
+                if self._stopped.is_set():
+                    return
+            if self._stopped.is_set():
+                self._connecting.release()
+                return
+            try:
+                device.connection = self.connection_factory(
+                    client_id=device.client_id,
+                    on_connection_interrupted=device.on_connection_interrupted,
+                    on_connection_resumed=device.on_connection_resumed)
+                future = device.connection.connect()
+            except Exception as e:
+                self._connect_done(index, device, None, e)
+                continue
+            future.add_done_callback(lambda done, index=index, device=device:
+                                     self._connect_done(index, device, done, done.exception()))
+        logger.info("✅ Ramp finished: %d devices started", len(self.devices))
+
+    def _connect_done(self, index, device, future, error):
+        self._connecting.release()
+        if error is not None:
+            self.connect_failed_count += 1
+            logger.debug("❌ %s failed to connect: %s", device.client_id, error)
+            return
+        device.connected = True
+        scheduler = self.schedulers[index % len(self.schedulers)]
+        device.job = scheduler.add_job(device.publish, self.interval, jitter=self.jitter, name=device.client_id)
+
+    def stop(self, timeout=10.0):
+        """Stop publishing and disconnect every device"""
+        self._stopped.set()
+        for scheduler in self.schedulers:
+            scheduler.stop()
+        if self._ramp_thread:
+            self._ramp_thread.join(timeout)
+        futures = []
+        for device in self.devices:
+            device.connected = False
+            if device.connection is not None:
+                try:
+                    futures.append(device.connection.disconnect())
+                except Exception:
+                    pass
+        deadline = time.monotonic() + timeout
+        for future in futures:
+            try:
+                future.result(max(0.0, deadline - time.monotonic()))
+            except Exception:
+                pass
+
+    def stats(self):
+        devices = self.devices
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        sent = sum(device.sent for device in devices)
+        jobs = [device.job for device in devices if device.job is not None]
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        with self._latency_lock:
+            latency = self.latency.summary()
+        return {
+            "elapsed": elapsed,
+            "devices": len(devices),
+            "connected": sum(1 for device in devices if device.connected),
+            "connect_failed": self.connect_failed_count,
+            "interruptions": sum(device.interruptions for device in devices),
+            "sent": sent,
+            "acked": sum(device.acked for device in devices),
+            "failed": sum(device.failed for device in devices),
+            "publish_rate": sent / elapsed if elapsed else 0.0,
+            "puback_p50_ms": latency["p50"] * 1000,
+            "puback_p99_ms": latency["p99"] * 1000,
+            "max_lateness_ms": max((job.max_lateness for job in jobs), default=0.0) * 1000,
+            "cpu_seconds": usage.ru_utime + usage.ru_stime,
+            "max_rss_mb": usage.ru_maxrss / 1024,
+        }
+
+
+def crt_connection_factory(host, port=None, cert_path=None, key_path=None, root_ca_path=None,
+                           event_loop_threads=2, keep_alive_secs=60):
+    """Connection factory sharing one event-loop group and one TLS context across devices.
+
+    As in tls_context.mtls_from_path, port None means 443 with ALPN
+    'x-amzn-mqtt-ca' where the platform supports ALPN, 8883 otherwise.
+    """
+    if port is None:
+        port = 443 if io.is_alpn_available() else 8883
+    alpn_list = ["x-amzn-mqtt-ca"] if port == 443 and io.is_alpn_available() else None
+    event_loop_group = io.EventLoopGroup(event_loop_threads)
+    bootstrap = io.ClientBootstrap(event_loop_group, io.DefaultHostResolver(event_loop_group))
+    tls_ctx = client_tls_context(cert_path, key_path, root_ca_path, alpn_list) if cert_path else None
+    client = mqtt.Client(bootstrap, tls_ctx)
+
+    def connect(client_id, on_connection_interrupted, on_connection_resumed):
+        return mqtt.Connection(
+            client=client,
+            host_name=host,
+            port=port,
+            client_id=client_id,
+            clean_session=True,
+            keep_alive_secs=keep_alive_secs,
+            on_connection_interrupted=on_connection_interrupted,
+            on_connection_resumed=on_connection_resumed)
+    return connect
+
+
+def format_stats(stats):
+    return (f"[{stats['elapsed']:6.1f}s] {stats['connected']}/{stats['devices']} connected "
+            f"({stats['connect_failed']} failed)  {stats['publish_rate']:,.0f} msgs/sec  "
+            f"sent {stats['sent']} acked {stats['acked']} failed {stats['failed']}  "
+            f"PUBACK p50 {stats['puback_p50_ms']:.1f} ms p99 {stats['puback_p99_ms']:.1f} ms  "
+            f"RSS {stats['max_rss_mb']:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--broker", choices=["test", "aws"], default="test")
+    parser.add_argument("--config", help="JSON file overriding the built-in device settings (aws)")
+    parser.add_argument("--port", type=int, help="broker port (aws; default 443 with ALPN, else 8883)")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between publishes per device")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--qos", type=int, choices=[0, 1], default=1)
+    parser.add_argument("--ramp", default="linear:200", help="instant, linear:RATE or step:COUNT:SECONDS")
+    parser.add_argument("--prefix", default="sim", help="client ID and topic prefix")
+    parser.add_argument("--event-loop-threads", type=int, default=2)
+    parser.add_argument("--schedulers", type=int, default=2)
+    parser.add_argument("--max-connecting", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between stats lines")
+    parser.add_argument("--seed", type=int, help="seed for repeatable simulated readings")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    broker = None
+    if args.broker == "test":
+        from local_broker import MQTTTestBroker
+        broker = MQTTTestBroker()
+        factory = crt_connection_factory("127.0.0.1", broker.start(), event_loop_threads=args.event_loop_threads)
+    else:
+        config = load_config(args.config)
+        factory = crt_connection_factory(config["endpoint"], args.port or config.get("port"),
+                                         config["cert_path"], config["key_path"],
+                                         config.get("root_ca_path"), event_loop_threads=args.event_loop_threads)
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    fleet = FleetSimulator(factory, devices=args.devices, client_id_prefix=args.prefix,
+                           topic_prefix=args.prefix, interval=args.interval, jitter=args.jitter,
+                           qos=mqtt.QoS(args.qos), ramp=args.ramp, schedulers=args.schedulers,
+                           max_connecting=args.max_connecting, seed=args.seed)
+    fleet.start()
+    try:
+        deadline = time.monotonic() + args.duration
+        while time.monotonic() < deadline:
+            time.sleep(min(args.report, max(0.0, deadline - time.monotonic())))
+            print(format_stats(fleet.stats()), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stats = fleet.stats()
+        fleet.stop()
+        if broker is not None:
+            broker.stop()
+    per_device_kb = (stats["max_rss_mb"] - rss_before) * 1024 / max(1, stats["devices"])
+    cpu = stats["cpu_seconds"] / stats["elapsed"] * 100 if stats["elapsed"] else 0.0
+    print(f"{stats['devices']} devices: {cpu:.0f}% CPU, "
+          f"~{per_device_kb:.0f} KB RSS per device, scheduler lateness max {stats['max_lateness_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
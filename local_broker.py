@@ -0,0 +1,581 @@
+import asyncio
+import heapq
+import itertools
+import os
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+from topics import TopicTrie, topic_matches
+
+
+class LocalBroker:
+    """In-process stand-in for the AWS IoT broker used by benchmarks.
+
+    Acknowledges QoS1 publishes after a fixed latency, optionally enforces a
+    per-connection publish rate (like the AWS IoT per-connection TPS limit)
+    and routes messages to local subscriptions. Over the rate, publishes
+    queue up; with throttle_backlog set, one that would wait longer than
+    that many seconds is rejected instead, as AWS IoT throttles.
+    """
+
+    def __init__(self, puback_latency=0.002, max_rate_per_connection=None, throttle_backlog=None):
+        self.puback_latency = puback_latency
+        self.max_rate_per_connection = max_rate_per_connection
+        self.throttle_backlog = throttle_backlog
+        self.throttled_count = 0
+        self.connections = []
+        self.published_count = 0
+        self._events = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._running = True
+        self._thread = threading.Thread(target=self._event_worker, daemon=True)
+        self._thread.start()
+
+    def create_connection(self, client_id="local-client", **kwargs):
+        """Create a connection object with the awscrt mqtt.Connection interface"""
+        connection = LocalBrokerConnection(self, client_id, **kwargs)
+        with self._lock:
+            self.connections.append(connection)
+        return connection
+
+    def schedule(self, delay, callback, *args):
+        """Run callback on the broker thread after delay seconds"""
+        with self._condition:
+            heapq.heappush(self._events, (time.monotonic() + delay, next(self._sequence), callback, args))
+            self._condition.notify()
+
+    def route(self, topic, payload, qos, retain=False):
+        """Deliver a message to every matching subscription"""
+        with self._lock:
+            self.published_count += 1
+            targets = [(connection, callback)
+                       for connection in self.connections if connection.is_connected
+                       for topic_filter, callback in list(connection.subscriptions.items())
+                       if topic_matches(topic_filter, topic)]
+        for connection, callback in targets:
+            if callback is not None:
+                callback(topic=topic, payload=payload, dup=False, qos=qos, retain=retain)
+
+    def shutdown(self):
+        """Stop the broker thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        self._thread.join(timeout=1)
+
+    def _event_worker(self):
+        """Fire scheduled events (PUBACKs, deliveries) in deadline order"""
+        while True:
+            with self._condition:
+                while self._running and (not self._events or self._events[0][0] > time.monotonic()):
+                    timeout = self._events[0][0] - time.monotonic() if self._events else None
+                    self._condition.wait(timeout)
+                if not self._running:
+                    return
+                due = []
+                now = time.monotonic()
+                while self._events and self._events[0][0] <= now:
+                    due.append(heapq.heappop(self._events))
+            for _, _, callback, args in due:
+                callback(*args)
+
+
+class LocalBrokerConnection:
+    """Mimics awscrt.mqtt.Connection against a LocalBroker"""
+
+    def __init__(self, broker, client_id, on_connection_interrupted=None,
+                 on_connection_resumed=None, **kwargs):
+        self.broker = broker
+        self.client_id = client_id
+        self.on_connection_interrupted = on_connection_interrupted
+        self.on_connection_resumed = on_connection_resumed
+        self.subscriptions = {}
+        self.is_connected = False
+        self._packet_ids = itertools.count(1)
+        self._next_free = 0.0
+        self._lock = threading.Lock()
+
+    def _done(self, result):
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def connect(self):
+        self.is_connected = True
+        return self._done({"session_present": False})
+
+    def disconnect(self):
+        self.is_connected = False
+        return self._done({})
+
+    def interrupt(self, error="simulated network loss"):
+        """Simulate a dropped link"""
+        self.is_connected = False
+        if self.on_connection_interrupted:
+            self.on_connection_interrupted(connection=self, error=error)
+
+    def resume(self, session_present=False):
+        """Simulate the link coming back"""
+        self.is_connected = True
+        if self.on_connection_resumed:
+            self.on_connection_resumed(connection=self, return_code=0, session_present=session_present)
+
+    def publish(self, topic, payload, qos, retain=False):
+        future = Future()
+        packet_id = next(self._packet_ids) & 0xFFFF
+        if not self.is_connected:
+            future.set_exception(ConnectionError("Not connected"))
+            return future, packet_id
+
+        delay = self.broker.puback_latency
+        rate = self.broker.max_rate_per_connection
+        if rate:
+            with self._lock:
+                now = time.monotonic()
+                next_free = max(self._next_free, now) + 1.0 / rate
+                backlog = self.broker.throttle_backlog
+                if backlog is not None and next_free - now > backlog:
+                    self.broker.throttled_count += 1
+                    self.broker.schedule(delay, future.set_exception, RuntimeError("Throttled: rate limit exceeded"))
+                    return future, packet_id
+                self._next_free = next_free
+                delay += next_free - now
+
+        def complete():
+            self.broker.route(topic, payload, qos, retain)
+            if not future.done():
+                future.set_result({"packet_id": packet_id})
+
+        self.broker.schedule(delay, complete)
+        return future, packet_id
+
+    def subscribe(self, topic, qos, callback=None):
+        packet_id = next(self._packet_ids) & 0xFFFF
+        self.subscriptions[topic] = callback
+        return self._done({"packet_id": packet_id, "topic": topic, "qos": qos}), packet_id
+
+    def unsubscribe(self, topic):
+        packet_id = next(self._packet_ids) & 0xFFFF
+        self.subscriptions.pop(topic, None)
+        return self._done({"packet_id": packet_id}), packet_id
+
+    def resubscribe_existing_topics(self):
+        packet_id = next(self._packet_ids) & 0xFFFF
+        topics = [(topic, 1) for topic in self.subscriptions]
+        return self._done({"packet_id": packet_id, "topics": topics}), packet_id
+
+
+class MQTTTestBroker:
+    """Minimal MQTT 3.1.1 and 5 broker on asyncio for local benchmarks.
+
+    Speaks enough of the protocol for the awscrt clients: CONNECT, PUBLISH
+    (QoS 0/1, QoS 2 acknowledged but delivered as QoS 1), SUBSCRIBE with
+    '+'/'#' filters, UNSUBSCRIBE, PINGREQ and DISCONNECT. Persistent
+    sessions (clean_session=False) keep their subscriptions, and QoS 1
+    messages not yet acknowledged or sent while the client was away are
+    delivered again when it resumes. No retained messages or wills.
+
+    MQTT 5 clients may use up to topic_alias_maximum topic aliases (8, as
+    AWS IoT allows). Payload format, content type and message expiry are
+    passed on to MQTT 5 subscribers, and a message whose expiry passes
+    while it waits for an offline session is dropped (expired_count).
+    publish_bytes counts the PUBLISH packets received, headers included.
+
+    Pass an ssl.SSLContext to serve TLS (see generate_test_certs). Runs its
+    own event loop thread.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, ssl_context=None, topic_alias_maximum=8):
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+        self.topic_alias_maximum = topic_alias_maximum
+        self.subscriptions = TopicTrie(cache_size=0)
+        self.sessions = {}
+        self.published_count = 0
+        self.delivered_count = 0
+        self.expired_count = 0
+        self.publish_bytes = 0
+        self.client_count = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._tasks = {}
+
+    def start(self):
+        """Start serving in a background thread and return the bound port"""
+        started = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(asyncio.start_server(
+                self._handle_client, self.host, self.port, ssl=self.ssl_context))
+            self.port = self._server.sockets[0].getsockname()[1]
+            started.set()
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="mqtt-test-broker", daemon=True)
+        self._thread.start()
+        started.wait()
+        return self.port
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=2)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=2)
+
+    def interrupt_clients(self, client_id=None):
+        """Drop client connections (all, or just client_id) without a DISCONNECT, like a network blip"""
+        self._loop.call_soon_threadsafe(self._abort_all, client_id)
+
+    def _abort_all(self, client_id=None):
+        for session in list(self._tasks.values()):
+            if session.writer and client_id in (None, session.client_id):
+                session.writer.transport.abort()
+
+    async def _shutdown(self):
+        self._server.close()
+        # Closing the sockets ends each client handler with EOF
+        self._abort_all()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _handle_client(self, reader, writer):
+        session = _BrokerSession(writer)
+        task = asyncio.current_task()
+        self._tasks[task] = session
+        self.client_count += 1
+        try:
+            while True:
+                header = await reader.readexactly(1)
+                length = 0
+                multiplier = 1
+                while True:
+                    byte = (await reader.readexactly(1))[0]
+                    length += (byte & 0x7F) * multiplier
+                    multiplier *= 128
+                    if not byte & 0x80:
+                        break
+                body = await reader.readexactly(length) if length else b""
+                if header[0] >> 4 == 3:
+                    self.publish_bytes += 1 + len(_encode_length(length)) + length
+                if header[0] >> 4 == 1:  # CONNECT
+                    session = self._connect(writer, body)
+                    self._tasks[task] = session
+                elif not self._handle_packet(session, header[0], body):
+                    break
+                if writer.transport.get_write_buffer_size() > 1024 * 1024:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if session.writer is writer:
+                session.writer = None
+                if not session.persistent:
+                    self._drop_session(session)
+            self.client_count -= 1
+            self._tasks.pop(task, None)
+            writer.close()
+
+    def _connect(self, writer, body):
+        """Attach the connection to a new or resumed session and send CONNACK"""
+        protocol_length = struct.unpack_from("!H", body)[0]
+        protocol_level = body[2 + protocol_length]
+        flags = body[2 + protocol_length + 1]
+        offset = 2 + protocol_length + 4
+        properties = {}
+        if protocol_level >= 5:
+            properties, offset = _read_properties(body, offset)
+        client_id_length = struct.unpack_from("!H", body, offset)[0]
+        client_id = body[offset + 2:offset + 2 + client_id_length].decode("utf-8")
+        clean_session = bool(flags & 0x02)
+        # MQTT 5 separates starting clean from keeping the session afterwards
+        persistent = properties.get(0x11, 0) > 0 if protocol_level >= 5 else not clean_session
+
+        session = self.sessions.pop(client_id, None)
+        if session and session.writer:
+            # Session takeover: the old connection is closed
+            session.writer.transport.abort()
+        if session and clean_session:
+            self._drop_session(session)
+            session = None
+        session_present = session is not None
+        if session is None:
+            session = _BrokerSession(writer, client_id)
+        session.writer = writer
+        session.protocol_level = protocol_level
+        session.topic_aliases = {}
+        session.persistent = persistent
+        if session.persistent:
+            self.sessions[client_id] = session
+        if protocol_level >= 5:
+            properties = b"\x22" + struct.pack("!H", self.topic_alias_maximum) if self.topic_alias_maximum else b""
+            variable = bytes((session_present, 0)) + _encode_length(len(properties)) + properties
+            session.send(b"\x20" + _encode_length(len(variable)) + variable)
+        else:
+            session.send(b"\x20\x02" + bytes((session_present, 0)))
+        self.expired_count += session.resend_unacknowledged()
+        return session
+
+    def _drop_session(self, session):
+        for topic_filter, entry in list(session.subscriptions.items()):
+            self.subscriptions.remove(topic_filter, entry)
+        session.subscriptions.clear()
+        if self.sessions.get(session.client_id) is session:
+            del self.sessions[session.client_id]
+
+    def _handle_packet(self, session, first_byte, body):
+        packet_type = first_byte >> 4
+        if packet_type == 4:  # PUBACK
+            session.unacknowledged.pop(body[:2], None)
+        elif packet_type == 3:  # PUBLISH
+            qos = (first_byte >> 1) & 0x03
+            topic_length = struct.unpack_from("!H", body)[0]
+            topic = body[2:2 + topic_length].decode("utf-8")
+            offset = 2 + topic_length
+            packet_id = None
+            if qos:
+                packet_id = body[offset:offset + 2]
+                offset += 2
+            properties = {}
+            if session.protocol_level >= 5:
+                properties, offset = _read_properties(body, offset)
+                alias = properties.get(0x23)
+                if alias is not None:
+                    if topic:
+                        session.topic_aliases[alias] = topic
+                    else:
+                        topic = session.topic_aliases.get(alias)
+                        if topic is None:
+                            return False  # unknown alias is a protocol error
+            if packet_id is not None:
+                session.send((b"\x40\x02" if qos == 1 else b"\x50\x02") + packet_id)
+            self._route(topic, body[offset:], min(qos, 1), properties)
+        elif packet_type == 6:  # PUBREL
+            session.send(b"\x70\x02" + body[:2])
+        elif packet_type == 8:  # SUBSCRIBE
+            packet_id = body[:2]
+            offset = 2
+            if session.protocol_level >= 5:
+                _, offset = _read_properties(body, offset)
+            granted = bytearray()
+            while offset < len(body):
+                topic_length = struct.unpack_from("!H", body, offset)[0]
+                topic_filter = body[offset + 2:offset + 2 + topic_length].decode("utf-8")
+                qos = min(body[offset + 2 + topic_length] & 0x03, 1)
+                offset += 3 + topic_length
+                previous = session.subscriptions.pop(topic_filter, None)
+                if previous:
+                    self.subscriptions.remove(topic_filter, previous)
+                entry = (session, qos)
+                session.subscriptions[topic_filter] = entry
+                self.subscriptions.add(topic_filter, entry)
+                granted.append(qos)
+            if session.protocol_level >= 5:
+                packet_id += b"\x00"  # no SUBACK properties
+            session.send(bytes((0x90,)) + _encode_length(len(packet_id) + len(granted)) + packet_id + bytes(granted))
+        elif packet_type == 10:  # UNSUBSCRIBE
+            packet_id = body[:2]
+            offset = 2
+            if session.protocol_level >= 5:
+                _, offset = _read_properties(body, offset)
+            count = 0
+            while offset < len(body):
+                topic_length = struct.unpack_from("!H", body, offset)[0]
+                topic_filter = body[offset + 2:offset + 2 + topic_length].decode("utf-8")
+                offset += 2 + topic_length
+                entry = session.subscriptions.pop(topic_filter, None)
+                if entry:
+                    self.subscriptions.remove(topic_filter, entry)
+                count += 1
+            if session.protocol_level >= 5:
+                session.send(bytes((0xB0,)) + _encode_length(3 + count) + packet_id + bytes(1 + count))
+            else:
+                session.send(b"\xb0\x02" + packet_id)
+        elif packet_type == 12:  # PINGREQ
+            session.send(b"\xd0\x00")
+        elif packet_type == 14:  # DISCONNECT
+            return False
+        return True
+
+    def _route(self, topic, payload, qos, properties=None):
+        self.published_count += 1
+        topic_bytes = struct.pack("!H", len(topic.encode("utf-8"))) + topic.encode("utf-8")
+        message = _Message(topic_bytes, payload, properties)
+        for session, subscription_qos in self.subscriptions.match(topic):
+            session.deliver(message, min(qos, subscription_qos))
+            self.delivered_count += 1
+
+
+class _Message:
+    """A routed PUBLISH: topic and payload plus the MQTT 5 properties passed on to subscribers"""
+
+    __slots__ = ("topic_bytes", "payload", "forwarded", "expires_at")
+
+    def __init__(self, topic_bytes, payload, properties=None):
+        self.topic_bytes = topic_bytes
+        self.payload = payload
+        self.forwarded = b""
+        self.expires_at = None
+        if properties:
+            if 0x01 in properties:
+                self.forwarded += bytes((0x01, properties[0x01]))
+            if 0x03 in properties:
+                self.forwarded += b"\x03" + struct.pack("!H", len(properties[0x03])) + properties[0x03]
+            if 0x02 in properties:
+                self.expires_at = time.monotonic() + properties[0x02]
+
+    def packet(self, qos, packet_id, protocol_level, dup=False):
+        variable = self.topic_bytes + (packet_id or b"")
+        if protocol_level >= 5:
+            properties = self.forwarded
+            if self.expires_at is not None:
+                # Subscribers see the time left, not the original interval
+                remaining = max(0, int(self.expires_at - time.monotonic() + 0.5))
+                properties += b"\x02" + struct.pack("!I", remaining)
+            variable += _encode_length(len(properties)) + properties
+        first_byte = 0x30 | qos << 1 | (0x08 if dup else 0)
+        return bytes((first_byte,)) + _encode_length(len(variable) + len(self.payload)) + variable + self.payload
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+
+class _BrokerSession:
+    MAX_UNACKNOWLEDGED = 10000
+
+    def __init__(self, writer, client_id=None):
+        self.writer = writer
+        self.client_id = client_id
+        self.persistent = False
+        self.protocol_level = 4
+        self.topic_aliases = {}
+        self.subscriptions = {}
+        self.unacknowledged = {}
+        self._packet_id = 0
+
+    def send(self, data):
+        if self.writer is not None:
+            self.writer.write(data)
+
+    def deliver(self, message, qos):
+        """Send a message; persistent sessions keep QoS 1 deliveries until PUBACK"""
+        packet_id = None
+        if qos:
+            packet_id = struct.pack("!H", self.next_packet_id())
+            if self.persistent:
+                if len(self.unacknowledged) >= self.MAX_UNACKNOWLEDGED:
+                    return
+                self.unacknowledged[packet_id] = message
+        if self.writer is not None:
+            self.writer.write(message.packet(qos, packet_id, self.protocol_level))
+
+    def resend_unacknowledged(self):
+        """Send kept messages again with the DUP flag, dropping expired ones; returns how many expired"""
+        expired = 0
+        for packet_id, message in list(self.unacknowledged.items()):
+            if message.expired():
+                del self.unacknowledged[packet_id]
+                expired += 1
+                continue
+            self.writer.write(message.packet(1, packet_id, self.protocol_level, dup=True))
+        return expired
+
+    def next_packet_id(self):
+        self._packet_id = self._packet_id % 0xFFFF + 1
+        return self._packet_id
+
+
+# MQTT 5 property identifiers by value type: one byte, two bytes, four bytes,
+# variable byte integer, and length-prefixed string or binary; 0x26 (user
+# property) is a pair of strings
+_BYTE_PROPERTIES = {0x01, 0x17, 0x19, 0x24, 0x25, 0x28, 0x29, 0x2A}
+_TWO_BYTE_PROPERTIES = {0x13, 0x21, 0x22, 0x23}
+_FOUR_BYTE_PROPERTIES = {0x02, 0x11, 0x18, 0x27}
+_VARINT_PROPERTIES = {0x0B}
+
+
+def _read_length(data, offset):
+    """Decode a variable byte integer; returns (value, offset after it)"""
+    value = 0
+    multiplier = 1
+    while True:
+        byte = data[offset]
+        offset += 1
+        value += (byte & 0x7F) * multiplier
+        multiplier *= 128
+        if not byte & 0x80:
+            return value, offset
+
+
+def _read_properties(data, offset):
+    """Parse an MQTT 5 property block; returns ({id: value}, offset after it).
+
+    User properties are skipped.
+    """
+    length, offset = _read_length(data, offset)
+    end = offset + length
+    properties = {}
+    while offset < end:
+        identifier = data[offset]
+        offset += 1
+        if identifier in _BYTE_PROPERTIES:
+            properties[identifier] = data[offset]
+            offset += 1
+        elif identifier in _TWO_BYTE_PROPERTIES:
+            properties[identifier] = struct.unpack_from("!H", data, offset)[0]
+            offset += 2
+        elif identifier in _FOUR_BYTE_PROPERTIES:
+            properties[identifier] = struct.unpack_from("!I", data, offset)[0]
+            offset += 4
+        elif identifier in _VARINT_PROPERTIES:
+            properties[identifier], offset = _read_length(data, offset)
+        else:
+            for _ in range(2 if identifier == 0x26 else 1):
+                size = struct.unpack_from("!H", data, offset)[0]
+                if identifier != 0x26:
+                    properties[identifier] = bytes(data[offset + 2:offset + 2 + size])
+                offset += 2 + size
+    return properties, end
+
+
+def _encode_length(length):
+    encoded = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(encoded)
+
+
+def generate_test_certs(directory):
+    """Create a throwaway CA plus server and client certificates with openssl.
+
+    Returns a dict of file paths: ca, server_cert, server_key, client_cert,
+    client_key. The server certificate is valid for localhost/127.0.0.1.
+    """
+    paths = {name: os.path.join(directory, f"{name}.pem")
+             for name in ("ca", "ca_key", "server_cert", "server_key", "client_cert", "client_key")}
+    extensions = os.path.join(directory, "server_ext.cnf")
+    with open(extensions, "w") as f:
+        f.write("subjectAltName=DNS:localhost,IP:127.0.0.1\n")
+
+    def openssl(*args):
+        subprocess.run(["openssl", *args], check=True, capture_output=True)
+
+    openssl("req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=bench-ca",
+            "-keyout", paths["ca_key"], "-out", paths["ca"])
+    for role, extra in (("server", ["-extfile", extensions]), ("client", [])):
+        request = os.path.join(directory, f"{role}.csr")
+        openssl("req", "-newkey", "rsa:2048", "-nodes", "-subj",
+                "/CN=localhost" if role == "server" else "/CN=bench-client",
+                "-keyout", paths[f"{role}_key"], "-out", request)
+        openssl("x509", "-req", "-in", request, "-CA", paths["ca"], "-CAkey", paths["ca_key"],
+                "-CAcreateserial", "-days", "1", "-out", paths[f"{role}_cert"], *extra)
+    return paths
@@ -0,0 +1,80 @@
+import logging
+import logging.handlers
+import queue
+from collections import deque
+
+# Per-message logs (every publish / received payload) go to this logger so
+# they can be silenced under load without hiding connection events.
+MESSAGE_LOGGER = "mqtt.messages"
+
+CONSOLE_FORMAT = "%(message)s"
+FILE_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+UI_FORMAT = "[%(asctime)s] %(message)s"
+UI_DATE_FORMAT = "%H:%M:%S"
+
+
+class DequeHandler(logging.Handler):
+    """Keeps the most recent formatted records for a UI to drain in batches"""
+
+    def __init__(self, maxlen=1000):
+        super().__init__()
+        self.records = deque(maxlen=maxlen)
+        self.setFormatter(logging.Formatter(UI_FORMAT, UI_DATE_FORMAT))
+
+    def emit(self, record):
+        try:
+            self.records.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def drain(self):
+        """Return and clear the buffered lines"""
+        lines = []
+        while self.records:
+            lines.append(self.records.popleft())
+        return lines
+
+
+def setup_logging(level=logging.INFO, message_level=None, log_file=None,
+                  max_bytes=1024 * 1024, backup_count=3, console=True, handlers=()):
+    """Route all logging through a QueueHandler and return the running QueueListener.
+
+    Callers only enqueue a record; formatting and I/O for the console,
+    the rotating log_file and any extra handlers happen on the listener
+    thread. If log_file cannot be opened, file logging is skipped with a
+    warning. message_level sets the level of the per-message logger
+    (defaults to level); raise it to WARNING to turn per-message logs off.
+    """
+    targets = list(handlers)
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        targets.append(stream_handler)
+    file_error = None
+    if log_file:
+        try:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        except OSError as e:
+            file_error = e
+        else:
+            file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+            targets.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+    set_message_level(message_level if message_level is not None else level)
+
+    listener = logging.handlers.QueueListener(log_queue, *targets, respect_handler_level=True)
+    listener.start()
+    if file_error:
+        logging.getLogger(__name__).warning("❌ File logging disabled: %s", file_error)
+    return listener
+
+
+def set_message_level(level):
+    logging.getLogger(MESSAGE_LOGGER).setLevel(level)
@@ -0,0 +1,267 @@
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OTHER_TOPIC = "_other"
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of latencies in microseconds.
+
+    Each power-of-two range is split into 16 linear sub-buckets, giving
+    about 6% relative precision from 1 us to well over a day with a fixed
+    array of counters; record() is a few integer operations.
+    """
+
+    SUB_BUCKETS = 16
+    RANGES = 40
+
+    def __init__(self):
+        self.counts = [0] * (self.SUB_BUCKETS * (self.RANGES + 1))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = int(seconds * 1e6)
+        if micros < self.SUB_BUCKETS:
+            index = max(micros, 0)
+        else:
+            shift = micros.bit_length() - 5
+            index = self.SUB_BUCKETS * (shift + 1) + (micros >> shift) - self.SUB_BUCKETS
+            if index >= len(self.counts):
+                index = len(self.counts) - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        """Add the counts of another histogram into this one"""
+        for index, bucket_count in enumerate(other.counts):
+            if bucket_count:
+                self.counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def _bucket_value(self, index):
+        """Midpoint of a bucket, in seconds"""
+        if index < self.SUB_BUCKETS:
+            return index / 1e6
+        shift = index // self.SUB_BUCKETS - 1
+        sub = index % self.SUB_BUCKETS + self.SUB_BUCKETS
+        low = sub << shift
+        high = (sub + 1) << shift
+        return (low + high) / 2 / 1e6
+
+    def percentile(self, percent):
+        if not self.count:
+            return 0.0
+        target = self.count * percent / 100.0
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count and seen >= target:
+                return min(self._bucket_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.max,
+        }
+
+
+class TopicMetrics:
+    __slots__ = ("published", "acked", "failed", "queue_latency", "ack_latency", "total_latency")
+
+    def __init__(self):
+        self.published = 0
+        self.acked = 0
+        self.failed = 0
+        self.queue_latency = LatencyHistogram()   # enqueue -> send
+        self.ack_latency = LatencyHistogram()     # send -> PUBACK
+        self.total_latency = LatencyHistogram()   # enqueue -> PUBACK
+
+
+class PublishMetrics:
+    """Per-topic publish counters and latency histograms plus connection health.
+
+    Topics beyond max_topics are folded into '_other' to bound memory and
+    exporter output. Gauges are read lazily from registered callables.
+    """
+
+    def __init__(self, max_topics=256):
+        self.max_topics = max_topics
+        self.topics = {}
+        self.gauges = {}
+        self.reconnect_count = 0
+        self.disconnected_seconds = 0.0
+        self.received_count = 0
+        self._disconnected_at = None
+        self._lock = threading.Lock()
+
+    def _topic(self, topic):
+        metrics = self.topics.get(topic)
+        if metrics is None:
+            if len(self.topics) >= self.max_topics:
+                topic = OTHER_TOPIC
+            metrics = self.topics.setdefault(topic, TopicMetrics())
+        return metrics
+
+    def record_sent(self, topic, enqueued_at, sent_at):
+        with self._lock:
+            metrics = self._topic(topic)
+            metrics.published += 1
+            if enqueued_at is not None:
+                metrics.queue_latency.record(sent_at - enqueued_at)
+
+    def record_ack(self, topic, enqueued_at, sent_at, acked_at):
+        with self._lock:
+            metrics = self._topic(topic)
+            metrics.acked += 1
+            metrics.ack_latency.record(acked_at - sent_at)
+            if enqueued_at is not None:
+                metrics.total_latency.record(acked_at - enqueued_at)
+
+    def record_failure(self, topic):
+        with self._lock:
+            self._topic(topic).failed += 1
+
+    def record_received(self):
+        self.received_count += 1
+
+    def connection_lost(self):
+        if self._disconnected_at is None:
+            self._disconnected_at = time.monotonic()
+
+    def connection_restored(self):
+        if self._disconnected_at is not None:
+            self.disconnected_seconds += time.monotonic() - self._disconnected_at
+            self._disconnected_at = None
+            self.reconnect_count += 1
+
+    def set_gauge(self, name, source):
+        """Register a callable returning the current value of a gauge"""
+        self.gauges[name] = source
+
+    def snapshot(self):
+        """Return all metrics as a JSON-serialisable dict"""
+        with self._lock:
+            topics = {
+                topic: {
+                    "published": metrics.published,
+                    "acked": metrics.acked,
+                    "failed": metrics.failed,
+                    "queue_latency": metrics.queue_latency.summary(),
+                    "ack_latency": metrics.ack_latency.summary(),
+                    "total_latency": metrics.total_latency.summary(),
+                }
+                for topic, metrics in self.topics.items()
+            }
+        disconnected = self.disconnected_seconds
+        if self._disconnected_at is not None:
+            disconnected += time.monotonic() - self._disconnected_at
+        gauges = {}
+        for name, source in self.gauges.items():
+            try:
+                gauges[name] = source()
+            except Exception:
+                gauges[name] = None
+        return {
+            "topics": topics,
+            "totals": {
+                "published": sum(t["published"] for t in topics.values()),
+                "acked": sum(t["acked"] for t in topics.values()),
+                "failed": sum(t["failed"] for t in topics.values()),
+                "received": self.received_count,
+            },
+            "gauges": gauges,
+            "reconnects": self.reconnect_count,
+            "disconnected_seconds": disconnected,
+            "connected": self._disconnected_at is None,
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """Render metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        topics = [(_escape_label(topic), stats) for topic, stats in snapshot["topics"].items()]
+        # Each family's samples follow its TYPE line, across all topics
+        lines = []
+        for family, key in (("mqtt_publish_total", "published"),
+                            ("mqtt_publish_acked_total", "acked"),
+                            ("mqtt_publish_failed_total", "failed")):
+            lines.append(f"# TYPE {family} counter")
+            for label, stats in topics:
+                lines.append(f'{family}{{topic="{label}"}} {stats[key]}')
+        lines.append("# TYPE mqtt_publish_latency_seconds summary")
+        for label, stats in topics:
+            for stage in ("queue_latency", "ack_latency", "total_latency"):
+                summary = stats[stage]
+                stage_label = stage.replace("_latency", "")
+                for quantile, key in (("0.5", "p50"), ("0.9", "p90"), ("0.99", "p99"), ("0.999", "p999")):
+                    lines.append(f'mqtt_publish_latency_seconds{{topic="{label}",stage="{stage_label}",'
+                                 f'quantile="{quantile}"}} {summary[key]:.6f}')
+                lines.append(f'mqtt_publish_latency_seconds_count{{topic="{label}",stage="{stage_label}"}} '
+                             f'{summary["count"]}')
+                lines.append(f'mqtt_publish_latency_seconds_sum{{topic="{label}",stage="{stage_label}"}} '
+                             f'{summary["mean"] * summary["count"]:.6f}')
+        lines.append("# TYPE mqtt_received_total counter")
+        lines.append(f"mqtt_received_total {snapshot['totals']['received']}")
+        lines.append("# TYPE mqtt_reconnects_total counter")
+        lines.append(f"mqtt_reconnects_total {snapshot['reconnects']}")
+        lines.append("# TYPE mqtt_disconnected_seconds_total counter")
+        lines.append(f"mqtt_disconnected_seconds_total {snapshot['disconnected_seconds']:.3f}")
+        lines.append("# TYPE mqtt_connected gauge")
+        lines.append(f"mqtt_connected {int(snapshot['connected'])}")
+        for name, value in snapshot["gauges"].items():
+            if value is not None:
+                lines.append(f"# TYPE mqtt_{name} gauge")
+                lines.append(f"mqtt_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def serve_metrics(metrics, port=9100, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /stats (JSON) from a background thread"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics"):
+                body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+            elif self.path.startswith("/stats"):
+                body, content_type = metrics.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            logger.debug("metrics endpoint: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("📊 Metrics at http://%s:%d/metrics and /stats", host, server.server_address[1])
+    return server
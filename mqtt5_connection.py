@@ -0,0 +1,307 @@
+import heapq
+import logging
+import threading
+from concurrent.futures import Future
+from awscrt import mqtt, mqtt5
+import tls_context
+from payload_codecs import content_type_for
+from topics import TopicTrie
+
+logger = logging.getLogger(__name__)
+
+# AWS IoT Core accepts up to 8 topic aliases per connection
+AWS_IOT_TOPIC_ALIAS_MAXIMUM = 8
+# Asked for by persistent sessions: the one hour AWS IoT keeps 3.1.1 sessions
+SESSION_EXPIRY_SECS = 3600
+
+
+class MQTT5Connection:
+    """An awscrt.mqtt5.Client behind the awscrt.mqtt.Connection interface.
+
+    ReconnectManager, PublishQueue and the engine use it unchanged:
+    connect() and disconnect() start and stop the client and return
+    Futures, publish/subscribe/unsubscribe return (Future, packet_id) with
+    the same result dicts, and subscription callbacks get topic, payload,
+    dup, qos and retain plus content_type and message_expiry.
+
+    The topic_aliases busiest topics (capped at what the broker allows) get
+    topic aliases from HotTopicAliases, so after its first publish on a
+    connection a hot topic is sent as a two-byte alias. Every publish
+    carries the payload-format indicator and, with send_content_type, the
+    content type from payload_codecs.content_type_for; with message_expiry
+    (seconds) the broker drops telemetry nobody received in time.
+
+    As with CRT_RECONNECT_OPTIONS on 3.1.1, awscrt's own retry loop is
+    stopped after a failed connect so ReconnectManager decides when to
+    retry; without a manager an interrupted client reconnects by itself
+    and on_connection_resumed is called.
+    """
+
+    def __init__(self, client_options, on_connection_interrupted=None, on_connection_resumed=None,
+                 topic_aliases=AWS_IOT_TOPIC_ALIAS_MAXIMUM, message_expiry=None, send_content_type=True):
+        self.on_connection_interrupted = on_connection_interrupted
+        self.on_connection_resumed = on_connection_resumed
+        self.message_expiry = message_expiry
+        self.send_content_type = send_content_type
+        self.is_connected = False
+        self.topic_aliases = topic_aliases
+        self.topic_alias_maximum = 0
+        self.aliases = HotTopicAliases(0)
+        self.subscriptions = {}
+        self.rejected_count = 0
+
+        self._handlers = TopicTrie()
+        self._lock = threading.Lock()
+        self._connect_future = None
+        self._stop_future = None
+        self._running = False
+
+        # awscrt's LRU aliasing rebinds an alias on every miss, which costs more
+        # than no aliases once more topics are in use than there are aliases
+        client_options.topic_aliasing_options = mqtt5.TopicAliasingOptions(
+            outbound_behavior=(mqtt5.OutboundTopicAliasBehaviorType.MANUAL if topic_aliases
+                               else mqtt5.OutboundTopicAliasBehaviorType.DISABLED))
+        client_options.on_publish_callback_fn = self._on_publish_received
+        client_options.on_lifecycle_event_connection_success_fn = self._on_connection_success
+        client_options.on_lifecycle_event_connection_failure_fn = self._on_connection_failure
+        client_options.on_lifecycle_event_disconnection_fn = self._on_disconnection
+        client_options.on_lifecycle_event_stopped_fn = self._on_stopped
+        self.client = mqtt5.Client(client_options)
+
+    def connect(self):
+        """Start the client; the Future resolves with {'session_present': ...} or the connect error"""
+        future = Future()
+        with self._lock:
+            self._connect_future = future
+            self._running = True
+        self.client.start()
+        return future
+
+    def disconnect(self):
+        """Stop the client; the Future resolves once it has stopped"""
+        future = Future()
+        with self._lock:
+            self._connect_future = None
+            if not self._running:
+                future.set_result({})
+                return future
+            self._stop_future = future
+        self.client.stop()
+        return future
+
+    def publish(self, topic, payload, qos, retain=False):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        utf8, content_type = content_type_for(payload)
+        packet = mqtt5.PublishPacket(
+            topic=topic,
+            payload=payload,
+            qos=mqtt5.QoS(int(qos)),
+            retain=retain,
+            payload_format_indicator=(mqtt5.PayloadFormatIndicator.AWS_MQTT5_PFI_UTF8 if utf8
+                                      else mqtt5.PayloadFormatIndicator.AWS_MQTT5_PFI_BYTES),
+            content_type=content_type if self.send_content_type else None,
+            message_expiry_interval_sec=self.message_expiry,
+            topic_alias=self.aliases.alias_for(topic))
+        future = Future()
+        self.client.publish(packet).add_done_callback(lambda done: self._publish_done(done, future))
+        return future, None
+
+    def _publish_done(self, done, future):
+        error = done.exception()
+        if error is None:
+            puback = done.result().puback
+            if puback is not None and puback.reason_code >= 0x80:
+                # e.g. NOT_AUTHORIZED or QUOTA_EXCEEDED from AWS IoT
+                self.rejected_count += 1
+                error = RuntimeError(f"Publish rejected: {puback.reason_code.name} {puback.reason_string or ''}".rstrip())
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result({"packet_id": None})
+
+    def subscribe(self, topic, qos, callback=None):
+        previous = self.subscriptions.get(topic)
+        if previous is not None:
+            self._handlers.remove(topic, previous[1])
+        self.subscriptions[topic] = (qos, callback)
+        if callback is not None:
+            self._handlers.add(topic, callback)
+        future = self._subscribe([(topic, qos)], lambda granted: {"packet_id": None, "topic": topic, "qos": granted[0]})
+        return future, None
+
+    def unsubscribe(self, topic):
+        entry = self.subscriptions.pop(topic, None)
+        if entry is not None:
+            self._handlers.remove(topic, entry[1])
+        future = Future()
+        crt_future = self.client.unsubscribe(mqtt5.UnsubscribePacket(topic_filters=[topic]))
+        crt_future.add_done_callback(lambda done: _chain(done, future, lambda unsuback: {"packet_id": None}))
+        return future, None
+
+    def resubscribe_existing_topics(self):
+        """Restore every tracked subscription with one SUBSCRIBE"""
+        topics = [(topic, qos) for topic, (qos, _) in self.subscriptions.items()]
+        if not topics:
+            future = Future()
+            future.set_result({"packet_id": None, "topics": []})
+            return future, None
+        future = self._subscribe(topics, lambda granted: {
+            "packet_id": None, "topics": [(topic, qos) for (topic, _), qos in zip(topics, granted)]})
+        return future, None
+
+    def _subscribe(self, topics, result):
+        packet = mqtt5.SubscribePacket(subscriptions=[
+            mqtt5.Subscription(topic_filter=topic, qos=mqtt5.QoS(int(qos))) for topic, qos in topics])
+        future = Future()
+
+        def granted(suback):
+            codes = suback.reason_codes
+            failed = [code for code in codes if code >= 0x80]
+            if failed:
+                raise RuntimeError(f"Subscription rejected: {failed[0].name}")
+            return result([mqtt.QoS(int(code)) for code in codes])
+
+        self.client.subscribe(packet).add_done_callback(lambda done: _chain(done, future, granted))
+        return future
+
+    def _on_publish_received(self, data):
+        packet = data.publish_packet
+        # awscrt's PublishPacket has no duplicate flag, so dup is always False
+        for callback in self._handlers.match(packet.topic):
+            callback(topic=packet.topic, payload=packet.payload, dup=False, qos=mqtt.QoS(int(packet.qos)),
+                     retain=packet.retain, content_type=packet.content_type,
+                     message_expiry=packet.message_expiry_interval_sec)
+
+    def _on_connection_success(self, data):
+        self.is_connected = True
+        self.topic_alias_maximum = data.negotiated_settings.topic_alias_maximum_to_server
+        self.aliases.resize(min(self.topic_aliases, self.topic_alias_maximum))
+        session_present = data.connack_packet.session_present
+        with self._lock:
+            future, self._connect_future = self._connect_future, None
+        if future is not None:
+            future.set_result({"session_present": session_present})
+        elif self.on_connection_resumed:
+            self.on_connection_resumed(connection=self, return_code=0, session_present=session_present)
+
+    def _on_connection_failure(self, data):
+        with self._lock:
+            future, self._connect_future = self._connect_future, None
+        if future is not None:
+            # Leave retrying to the caller (ReconnectManager)
+            self.client.stop()
+            future.set_exception(data.exception)
+
+    def _on_disconnection(self, data):
+        was_connected, self.is_connected = self.is_connected, False
+        with self._lock:
+            stopping = self._stop_future is not None
+        if was_connected and not stopping and self.on_connection_interrupted:
+            self.on_connection_interrupted(connection=self, error=data.exception)
+
+    def _on_stopped(self, data):
+        with self._lock:
+            self._running = False
+            future, self._stop_future = self._stop_future, None
+        if future is not None:
+            future.set_result({})
+
+    def stats(self):
+        return {
+            "connected": self.is_connected,
+            "topic_alias_maximum": self.topic_alias_maximum,
+            "aliased_topics": len(self.aliases),
+            "rejected": self.rejected_count,
+        }
+
+
+class HotTopicAliases:
+    """Hands the topic aliases of a connection to its most published topics.
+
+    Publishes are counted per topic over windows of window publishes. At
+    the end of each window the size busiest topics hold the aliases, those
+    that already had one keeping it, so aliases rarely change hands (each
+    change resends the full topic once). Until the first window ends,
+    aliases go to topics in order of first use.
+    """
+
+    def __init__(self, size, window=1000):
+        self.size = size
+        self.window = window
+        self.reassigned_count = 0
+        self._aliases = {}
+        self._counts = {}
+        self._published = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._aliases)
+
+    def resize(self, size):
+        """Set the number of aliases, e.g. to what the broker allows on a new connection"""
+        with self._lock:
+            self.size = size
+            self._aliases = {topic: alias for topic, alias in self._aliases.items() if alias <= size}
+
+    def alias_for(self, topic):
+        """Count a publish on topic and return its alias, or None"""
+        with self._lock:
+            self._counts[topic] = self._counts.get(topic, 0) + 1
+            self._published += 1
+            if self._published >= self.window:
+                self._rerank()
+            alias = self._aliases.get(topic)
+            if alias is None and len(self._aliases) < self.size:
+                alias = self._aliases[topic] = self._free_aliases()[0]
+            return alias
+
+    def _rerank(self):
+        hot = heapq.nlargest(self.size, self._counts, key=self._counts.get)
+        aliases = {topic: alias for topic, alias in self._aliases.items() if topic in hot}
+        self.reassigned_count += len(self._aliases) - len(aliases)
+        self._aliases = aliases
+        free = self._free_aliases()
+        for topic in hot:
+            if topic not in aliases and free:
+                aliases[topic] = free.pop(0)
+        self._counts = {}
+        self._published = 0
+
+    def _free_aliases(self):
+        used = set(self._aliases.values())
+        return [alias for alias in range(1, self.size + 1) if alias not in used]
+
+
+def _chain(done, future, convert):
+    """Resolve future from an awscrt Future, converting its result"""
+    error = done.exception()
+    if error is None:
+        try:
+            future.set_result(convert(done.result()))
+            return
+        except Exception as e:
+            error = e
+    future.set_exception(error)
+
+
+def mtls_from_path(endpoint, cert_filepath, pri_key_filepath, ca_filepath=None, client_id=None,
+                   clean_session=False, keep_alive_secs=30, port=8883, **kwargs):
+    """Build an MQTT5Connection to AWS IoT with mutual TLS, like mqtt_connection_builder.mtls_from_path.
+
+    Remaining keyword arguments (callbacks, topic_aliases, message_expiry,
+    send_content_type) go to MQTT5Connection.
+    """
+    client_options = mqtt5.ClientOptions(
+        host_name=endpoint,
+        port=port,
+        tls_ctx=tls_context.client_tls_context(cert_filepath, pri_key_filepath, ca_filepath),
+        connect_options=mqtt5.ConnectPacket(
+            client_id=client_id,
+            keep_alive_interval_sec=keep_alive_secs,
+            session_expiry_interval_sec=None if clean_session else SESSION_EXPIRY_SECS),
+        session_behavior=(mqtt5.ClientSessionBehaviorType.CLEAN if clean_session
+                          else mqtt5.ClientSessionBehaviorType.REJOIN_ALWAYS),
+        extended_validation_and_flow_control_options=(
+            mqtt5.ExtendedValidationAndFlowControlOptions.AWS_IOT_CORE_DEFAULTS))
+    return MQTT5Connection(client_options, **kwargs)
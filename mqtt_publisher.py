@@ -1,148 +1,136 @@
+import argparse
 import json
-import time
+import logging
+import os
+import signal
 import threading
-from awscrt import mqtt
-from awsiot import mqtt_connection_builder
-
-class AWSIoTMQTTTestClient:
-    def __init__(self, endpoint, client_id, cert_path, key_path, root_ca_path):
-        self.endpoint = endpoint
-        self.client_id = client_id
-        self.cert_path = cert_path
-        self.key_path = key_path
-        self.root_ca_path = root_ca_path
-        self.mqtt_connection = None
-        self.is_connected = False
-        
-    def on_connection_interrupted(self, connection, error, **kwargs):
-        print(f"Connection interrupted. error: {error}")
-        self.is_connected = False
-
-    def on_connection_resumed(self, connection, return_code, session_present, **kwargs):
-        print(f"Connection resumed. return_code: {return_code} session_present: {session_present}")
-        self.is_connected = True
-
-    def on_message_received(self, topic, payload, dup, qos, retain, **kwargs):
-        try:
-            message = json.loads(payload.decode('utf-8'))
-            print(f"📨 Received message on topic '{topic}':")
-            print(json.dumps(message, indent=2))
-        except:
-            print(f"📨 Received message on topic '{topic}': {payload.decode('utf-8')}")
-
-    def connect(self):
-        try:
-            # Create MQTT connection
-            self.mqtt_connection = mqtt_connection_builder.mtls_from_path(
-                endpoint=self.endpoint,
-                cert_filepath=self.cert_path,
-                pri_key_filepath=self.key_path,
-                client_id=self.client_id,
-                clean_session=True,
-                keep_alive_secs=30,
-                on_connection_interrupted=self.on_connection_interrupted,
-                on_connection_resumed=self.on_connection_resumed)
-            
-            print(f"Connecting to {self.endpoint} with client ID {self.client_id}...")
-            
-            # Connect to AWS IoT
-            connect_future = self.mqtt_connection.connect()
-            connect_future.result()  # Wait for connection
-            self.is_connected = True
-            
-            print("✅ Successfully connected to AWS IoT!")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Connection failed: {e}")
-            return False
-
-    def subscribe(self, topic):
-        if not self.is_connected:
-            print("Not connected to AWS IoT")
-            return False
-            
-        try:
-            print(f"Subscribing to topic: {topic}")
-            subscribe_future, packet_id = self.mqtt_connection.subscribe(
-                topic=topic,
-                qos=mqtt.QoS.AT_LEAST_ONCE,
-                callback=self.on_message_received)
-            
-            subscribe_result = subscribe_future.result()
-            print(f"✅ Subscribed to {topic} with QoS: {subscribe_result['qos']}")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Subscription failed: {e}")
-            return False
-
-    def publish(self, topic, message):
-        if not self.is_connected:
-            print("Not connected to AWS IoT")
-            return False
-            
-        try:
-            if isinstance(message, dict):
-                message = json.dumps(message)
-            
-            print(f"Publishing to {topic}: {message}")
-            self.mqtt_connection.publish(
-                topic=topic,
-                payload=message,
-                qos=mqtt.QoS.AT_LEAST_ONCE)
-            
-            print("✅ Message published successfully")
-            return True
-            
-        except Exception as e:
-            print(f"❌ Publish failed: {e}")
-            return False
-
-    def disconnect(self):
-        if self.mqtt_connection and self.is_connected:
-            print("Disconnecting from AWS IoT...")
-            disconnect_future = self.mqtt_connection.disconnect()
-            disconnect_future.result()
-            self.is_connected = False
-            print("✅ Disconnected")
-
-# Usage example
-if __name__ == "__main__":
-    # Configuration - Update these paths with your actual certificate files
-    config = {
-        "endpoint": "a2kymckba2gab5-ats.iot.ap-northeast-1.amazonaws.com",
-        "client_id": "Raspberry_AWS_IoT092025",  # Or use your test client ID
-        "cert_path": "/home/nippoh/mqtt_publisher/14aa5e7756dbca4a909370cb57ad581e1bd334d390c0b17b96f6efa6bba834ac-certificate.pem.crt",
-        "key_path": "/home/nippoh/mqtt_publisher/14aa5e7756dbca4a909370cb57ad581e1bd334d390c0b17b96f6efa6bba834ac-private.pem.key",
-        "root_ca_path": "/home/nippoh/mqtt_publisher/AmazonRootCA1.pem"
+import time
+from client_engine import BASE_DIR, MQTTClientEngine, load_config
+from scheduler import PublishScheduler
+from delta import DeltaPublisher
+from payload_template import PayloadTemplate
+from logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# The client now lives in client_engine; this name is kept for existing imports
+AWSIoTMQTTTestClient = MQTTClientEngine
+
+
+def build_message(template):
+    """Copy of the message template with a fresh timestamp"""
+    message = dict(template)
+    if "timestamp" in message:
+        message["timestamp"] = int(time.time())
+    return message
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless MQTT publisher for AWS IoT (no tkinter needed)")
+    parser.add_argument("--config", help="JSON file overriding the built-in device settings")
+    parser.add_argument("--topic", default="test/dc/pubtopic")
+    parser.add_argument("--subscribe", action="append", help="topic filter to subscribe to (repeatable)")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between publishes")
+    parser.add_argument("--message", help="JSON message template; 'timestamp' is refreshed on every publish")
+    parser.add_argument("--template", help="payload template with {{placeholders}} (see payload_template.py), "
+                                           "or @FILE to read it from a file")
+    parser.add_argument("--burst", type=int, default=1, help="messages published per interval")
+    parser.add_argument("--daemon", action="store_true",
+                        help="run unattended: per-message logs off, stop cleanly on SIGTERM")
+    parser.add_argument("--metrics-port", type=int, help="serve /metrics and /stats on this port")
+    parser.add_argument("--dispatch-workers", type=int, default=0,
+                        help="handle received messages on this many worker lanes (0 = inline)")
+    parser.add_argument("--rate-limit", type=float,
+                        help="max publishes/sec on the connection, lowered while the broker pushes back")
+    parser.add_argument("--topic-rate-limit", type=float, help="max publishes/sec per topic")
+    parser.add_argument("--delta", action="store_true",
+                        help="publish only changed fields, with a full keyframe every --keyframe-every messages")
+    parser.add_argument("--deadband", action="append", default=[], metavar="FIELD=TOLERANCE",
+                        help="with --delta, ignore numeric changes up to TOLERANCE (repeatable)")
+    parser.add_argument("--keyframe-every", type=int, default=60)
+    parser.add_argument("--dedup", action="store_true",
+                        help="drop QoS 1 redeliveries of messages received in the last 5 minutes")
+    parser.add_argument("--record", metavar="FILE",
+                        help="append received messages to a capture file (replay with capture.py)")
+    parser.add_argument("--mqtt5", action="store_true",
+                        help="connect with MQTT 5: topic aliases, content types, message expiry")
+    parser.add_argument("--message-expiry", type=int, metavar="SECONDS",
+                        help="with --mqtt5, let the broker drop messages undelivered after this long")
+    args = parser.parse_args()
+    if args.template and args.delta:
+        parser.error("--delta works on --message documents, not on --template payloads")
+
+    config = load_config(args.config)
+    config.setdefault("spool_path", os.path.join(BASE_DIR, "publish.spool"))
+    if args.mqtt5:
+        config["mqtt5"] = True
+    if args.message_expiry:
+        config["message_expiry"] = args.message_expiry
+    payload_template = None
+    if args.template:
+        text = args.template
+        if text.startswith("@"):
+            with open(text[1:]) as f:
+                text = f.read()
+        payload_template = PayloadTemplate(text, client_id=config["client_id"])
+    template = json.loads(args.message) if args.message else {
+        "timestamp": int(time.time()),
+        "message": "Hello from MQTT Test Client",
+        "client_id": config["client_id"]
     }
-    
-    # Create client instance
-    client = AWSIoTMQTTTestClient(**config)
-    
+
+    # Log through a background queue; daemons skip per-message logs
+    log_listener = setup_logging(
+        logging.INFO,
+        message_level=logging.WARNING if args.daemon else None,
+        log_file=os.path.join(BASE_DIR, "mqtt_publisher.log"))
+
+    client = MQTTClientEngine(**config, metrics=args.metrics_port is not None,
+                              dispatch_workers=args.dispatch_workers, rate_limit=args.rate_limit,
+                              topic_rate_limit=args.topic_rate_limit, dedup=args.dedup)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    scheduler = PublishScheduler()
+    publish = client.publish
+    if args.delta:
+        deadbands = {field: float(tolerance) for field, tolerance in
+                     (option.split("=", 1) for option in args.deadband)}
+        publish = DeltaPublisher(client.publish, deadbands=deadbands, keyframe_every=args.keyframe_every).send
+
     try:
-        # Connect to AWS IoT
+        # Connect to AWS IoT (retries until connected)
         if client.connect():
+            if args.metrics_port is not None:
+                client.start_metrics_server(args.metrics_port)
+            if args.record:
+                client.start_recording(args.record)
+
             # Subscribe to topics based on your policy
-            client.subscribe("test/dc/#")  # Wildcard subscription
-            
-            # Publish test messages
-            test_message = {
-                "timestamp": int(time.time()),
-                "message": "Hello from MQTT Test Client",
-                "client_id": config["client_id"]
-            }
-            
-            client.publish("test/dc/pubtopic", test_message)
-            
+            for topic_filter in args.subscribe or ["test/dc/#"]:
+                client.subscribe(topic_filter)
+
+            def publish_tick():
+                for _ in range(args.burst):
+                    if payload_template is not None:
+                        publish(args.topic, payload_template.render())
+                    else:
+                        publish(args.topic, build_message(template))
+
+            # Publish on monotonic deadlines instead of sleep(interval) + publish time
+            scheduler.add_job(publish_tick, args.interval, phase=0.0)
+            scheduler.start()
+
             # Keep the client running to receive messages
-            print("Listening for messages... Press Ctrl+C to exit")
-            while True:
-                time.sleep(1)
-                client.publish("test/dc/pubtopic", test_message)
-                
+            logger.info("Listening for messages... Press Ctrl+C to exit")
+            stop.wait()
+
     except KeyboardInterrupt:
-        print("\nExiting...")
+        logger.info("Exiting...")
     finally:
+        scheduler.stop()
         client.disconnect()
+        log_listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,89 @@
 import json
+import logging
 import time
 import threading
+import os
+from collections import deque
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-from awscrt import mqtt
-from awsiot import mqtt_connection_builder
 from datetime import datetime
+from client_engine import BASE_DIR, MQTTClientEngine, format_payload, load_config
+from payload_codecs import CODECS, encode_payload, json_loads
+from payload_template import PayloadTemplate
+from rate_limiter import DROP
+from scheduler import PublishScheduler
+from logging_setup import MESSAGE_LOGGER, DequeHandler, set_message_level, setup_logging
+
+logger = logging.getLogger(__name__)
+message_logger = logging.getLogger(MESSAGE_LOGGER)
+
+JSON_TEMPLATE = """{
+  "timestamp": {{timestamp}},
+  "seq": {{seq}},
+  "message": "Hello from MQTT Publisher GUI",
+  "client_id": "{{client_id}}",
+  "data": {
+    "temperature": {{walk:25.5:0.1:1}},
+    "humidity": {{walk:60.0:0.5:1}},
+    "status": "active"
+  }
+}"""
 
 class MQTTPublisherGUI:
     def __init__(self):
-        self.root = tk.Tk()
-        self.root.title("MQTT Publisher - Send Data")
-        self.root.geometry("600x700")
-        self.root.resizable(True, True)
+        # MQTT Configuration (shared with the CLI; see client_engine.load_config)
+        self.config = load_config()
         
-        # MQTT Configuration
-        self.config = {
-            "endpoint": "a2kymckba2gab5-ats.iot.ap-northeast-1.amazonaws.com",
-            "client_id": "Raspberry_AWS_IoT092025",
-            "cert_path": "/home/nippoh/mqtt_publisher/14aa5e7756dbca4a909370cb57ad581e1bd334d390c0b17b96f6efa6bba834ac-certificate.pem.crt",
-            "key_path": "/home/nippoh/mqtt_publisher/14aa5e7756dbca4a909370cb57ad581e1bd334d390c0b17b96f6efa6bba834ac-private.pem.key",
-            "root_ca_path": "/home/nippoh/mqtt_publisher/AmazonRootCA1.pem"
-        }
-        
-        self.mqtt_connection = None
-        self.is_connected = False
         self.auto_publish_active = False
-        self.auto_publish_thread = None
-        self.subscribed_topics = []
+        self.auto_publish_job = None
+        self._compiled_template = None
+        
+        self.scheduler = PublishScheduler()
+        self.scheduler.start()
+        
+        # Received messages are buffered raw and drawn in batches by a Tk timer
+        self.receive_buffer_size = 2000
+        self.received_max_lines = 500
+        self.display_interval_ms = 100
+        self.received_buffer = deque(maxlen=self.receive_buffer_size)
+        self.received_count = 0
+        self.received_dropped = 0
+        
+        # Connection, send queue, dispatch and statistics live in the engine;
+        # this window only renders them. A rate limit from the config drops
+        # over-budget messages rather than blocking the Tk thread.
+        self.config.setdefault("rate_limit_policy", DROP)
+        self.client = MQTTClientEngine(**self.config, metrics=True, on_message=self.on_message_received)
+        self.client.connection_listeners.append(self._on_connection_change)
+        self.metrics = self.client.metrics
+        self.metrics_active = True
+        
+        # Activity log: records are queued by any thread and drawn in batches
+        self.log_max_lines = 1000
+        self.log_handler = DequeHandler(maxlen=self.log_max_lines)
+        self.log_listener = setup_logging(
+            logging.INFO,
+            log_file=os.path.join(BASE_DIR, "mqtt_publisher_gui.log"),
+            console=False,
+            handlers=[self.log_handler])
+        
+        # Connect while the window is built: importing awscrt, reading the
+        # certificate and the TLS handshake overlap creating Tk and the
+        # widgets. Worker threads only touch Tk once its loop is running.
+        self._gui_ready = threading.Event()
+        self.connecting = False
+        self.auto_connect()
         
+        self.root = tk.Tk()
+        self.root.title("MQTT Publisher - Send Data")
+        self.root.geometry("600x780")
+        self.root.resizable(True, True)
         self.setup_gui()
         
+    @property
+    def is_connected(self):
+        return self.client.is_connected
+    
     def setup_gui(self):
         # Main frame with padding
         main_frame = ttk.Frame(self.root, padding="10")
@@ -122,6 +175,12 @@ class MQTTPublisherGUI:
         ttk.Radiobutton(type_frame, text="Plain Text", variable=self.msg_type, 
                        value="TEXT", command=self.update_message_template).grid(row=0, column=2, padx=5)
         
+        ttk.Label(type_frame, text="Encoding:").grid(row=0, column=3, padx=(15, 5))
+        self.codec_var = tk.StringVar(value="json")
+        codec_combo = ttk.Combobox(type_frame, textvariable=self.codec_var, values=list(CODECS),
+                                   state="readonly", width=14)
+        codec_combo.grid(row=0, column=4)
+        
         # Message text area
         self.message_text = scrolledtext.ScrolledText(msg_frame, height=10, width=50)
         self.message_text.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -151,9 +210,15 @@ class MQTTPublisherGUI:
                                       textvariable=self.interval_var)
         interval_spinbox.grid(row=0, column=1, padx=(0, 10))
         
+        ttk.Label(auto_frame, text="Messages per tick:").grid(row=0, column=2, padx=(0, 10))
+        self.burst_var = tk.StringVar(value="1")
+        burst_spinbox = ttk.Spinbox(auto_frame, from_=1, to=10000, width=8,
+                                    textvariable=self.burst_var)
+        burst_spinbox.grid(row=0, column=3, padx=(0, 10))
+        
         self.auto_publish_btn = ttk.Button(auto_frame, text="🔄 Start Auto Publish", 
                                           command=self.toggle_auto_publish, state="disabled")
-        self.auto_publish_btn.grid(row=0, column=2)
+        self.auto_publish_btn.grid(row=0, column=4)
         
         # Status log frame
         log_frame = ttk.LabelFrame(main_frame, text="Activity Log", padding="10")
@@ -162,7 +227,29 @@ class MQTTPublisherGUI:
         log_frame.rowconfigure(0, weight=1)
         
         self.log_text = scrolledtext.ScrolledText(log_frame, height=8, width=50)
-        self.log_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        self.log_text.grid(row=0, column=0, columnspan=4, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        ttk.Label(log_frame, text="Level:").grid(row=1, column=0, sticky=tk.E, pady=(5, 0))
+        self.log_level_var = tk.StringVar(value="INFO")
+        log_level_combo = ttk.Combobox(log_frame, textvariable=self.log_level_var, width=10, state="readonly",
+                                       values=["DEBUG", "INFO", "WARNING", "ERROR"])
+        log_level_combo.grid(row=1, column=1, sticky=tk.W, padx=5, pady=(5, 0))
+        log_level_combo.bind("<<ComboboxSelected>>", self.update_log_levels)
+        
+        self.message_logging_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(log_frame, text="Log each message", variable=self.message_logging_var,
+                        command=self.update_log_levels).grid(row=1, column=2, sticky=tk.W, pady=(5, 0))
+        
+        # Statistics frame
+        stats_frame = ttk.LabelFrame(main_frame, text="Statistics", padding="10")
+        stats_frame.grid(row=7, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
+        stats_frame.columnconfigure(1, weight=1)
+        
+        self.metrics_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(stats_frame, text="Enable", variable=self.metrics_var,
+                        command=self.toggle_metrics).grid(row=0, column=0, sticky=tk.W, padx=(0, 10))
+        self.stats_var = tk.StringVar(value="No data yet")
+        ttk.Label(stats_frame, textvariable=self.stats_var, font=("Consolas", 9)).grid(row=0, column=1, sticky=tk.W)
         
         # Configure main frame row weights
         main_frame.rowconfigure(4, weight=2)  # Message composition
@@ -170,83 +257,127 @@ class MQTTPublisherGUI:
         
         self.log_message("🚀 MQTT Publisher GUI started")
         
-        # Auto-connect after GUI is ready
-        self.root.after(1000, self.auto_connect)
+        # Start the fixed-rate received messages and log refresh
+        self.root.after(self.display_interval_ms, self._drain_received_display)
+        self.root.after(self.display_interval_ms, self._drain_log_display)
+        self.root.after(1000, self._refresh_stats)
+        
+        # Runs once the Tk loop is up; the connect started in __init__ may already be done
+        self.root.after(0, self._on_gui_ready)
+    
+    def _on_gui_ready(self):
+        self._gui_ready.set()
+        self.update_connection_status()
+    
+    def _on_connection_change(self, connected):
+        """Connection listener (MQTT threads); before the Tk loop runs, _on_gui_ready shows the state"""
+        if self._gui_ready.is_set():
+            self.root.after(0, self.update_connection_status)
         
     def update_message_template(self):
-        """Update message template based on selected type"""
+        """Update message template based on selected type.
+
+        {{placeholders}} are filled in on every publish (see payload_template.py).
+        """
         self.message_text.delete(1.0, tk.END)
         if self.msg_type.get() == "JSON":
-            template = {
-                "timestamp": int(time.time()),
-                "message": "Hello from MQTT Publisher GUI",
-                "client_id": self.config["client_id"],
-                "data": {
-                    "temperature": 25.5,
-                    "humidity": 60.0,
-                    "status": "active"
-                }
-            }
-            self.message_text.insert(1.0, json.dumps(template, indent=2))
+            self.message_text.insert(1.0, JSON_TEMPLATE)
         else:
-            self.message_text.insert(1.0, "Hello from MQTT Publisher GUI")
+            self.message_text.insert(1.0, "Hello from MQTT Publisher GUI #{{seq}}")
     
-    def log_message(self, message):
-        """Add message to activity log"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+    def log_message(self, message, level=logging.INFO):
+        """Add message to activity log (safe from any thread)"""
+        logger.log(level, message)
+    
+    def update_log_levels(self, event=None):
+        """Apply the log level and per-message logging settings"""
+        level = getattr(logging, self.log_level_var.get())
+        logging.getLogger().setLevel(level)
+        set_message_level(level if self.message_logging_var.get() else logging.WARNING)
+    
+    def _drain_log_display(self):
+        """Insert queued log lines in one batch (runs on a Tk timer)"""
+        try:
+            lines = self.log_handler.drain()
+            if lines:
+                self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+                self.log_text.delete(1.0, f"end-{self.log_max_lines + 1} lines")
+                self.log_text.see(tk.END)
+        finally:
+            self.root.after(self.display_interval_ms, self._drain_log_display)
     
     def auto_connect(self):
-        """Auto-connect to AWS IoT on startup"""
+        """Auto-connect to AWS IoT on startup, without waiting for the window"""
+        self.connecting = True
         threading.Thread(target=self._auto_connect_worker, daemon=True).start()
     
     def _auto_connect_worker(self):
-        """Auto-connect worker that connects and subscribes"""
-        if self.connect():
-            # Auto-subscribe to receive messages from subscriber
-            self._subscribe_to_topic("test/my/#")
+        """Auto-connect worker that connects (retrying until it succeeds) and subscribes"""
+        connected = self.connect()
+        self.connecting = False
+        if not connected:
+            # Listeners only hear about connections made; show the failure too
+            self._on_connection_change(False)
+            return
+        # Auto-subscribe to receive messages from subscriber
+        self._gui_ready.wait()
+        self._subscribe_to_topic("test/my/#")
     
     def on_message_received(self, topic, payload, dup, qos, retain, **kwargs):
-        """Handle received MQTT messages from subscriber"""
+        """Handle received MQTT messages from subscriber (awscrt thread).
+
+        Only buffers the raw message; decoding and formatting happen on the
+        Tk thread for the messages that actually get displayed.
+        """
+        if len(self.received_buffer) == self.receive_buffer_size:
+            self.received_dropped += 1
+        self.received_buffer.append((time.time(), topic, payload, kwargs.get("content_type")))
+        self.received_count += 1
+    
+    def _format_received(self, received_at, topic, payload, content_type=None):
+        """Format one received message for display"""
         try:
-            message_data = json.loads(payload.decode('utf-8'))
-            formatted_content = json.dumps(message_data, indent=2)
-        except:
-            formatted_content = payload.decode('utf-8')
-        
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        display_message = f"[{timestamp}] Topic: {topic}\n{formatted_content}\n" + "="*50 + "\n\n"
+            formatted_content = format_payload(payload, content_type)
+        except Exception as e:
+            formatted_content = f"<undecodable payload, {len(payload)} bytes: {e}>"
         
-        # Update GUI in main thread
-        self.root.after(0, self._update_received_display, display_message)
+        timestamp = datetime.fromtimestamp(received_at).strftime("%H:%M:%S")
+        return f"[{timestamp}] Topic: {topic}\n{formatted_content}\n" + "="*50 + "\n\n"
+    
+    def _drain_received_display(self):
+        """Insert buffered messages in one batch (runs on a Tk timer)"""
+        try:
+            batch = []
+            while self.received_buffer:
+                batch.append(self.received_buffer.popleft())
+            if batch:
+                self._update_received_display(batch)
+        finally:
+            self.root.after(self.display_interval_ms, self._drain_received_display)
     
-    def _update_received_display(self, message):
+    def _update_received_display(self, batch):
         """Update received messages display (called from main thread)"""
-        self.received_text.insert(tk.END, message)
+        # Format newest first and stop once the widget would be full
+        chunks = []
+        lines = 0
+        for received_at, topic, payload, content_type in reversed(batch):
+            chunk = self._format_received(received_at, topic, payload, content_type)
+            chunks.append(chunk)
+            lines += chunk.count("\n")
+            if lines >= self.received_max_lines:
+                break
+        skipped = len(batch) - len(chunks)
+        if skipped:
+            chunks.append(f"... {skipped} messages not shown ...\n\n")
+        
+        self.received_text.insert(tk.END, "".join(reversed(chunks)))
+        self.received_text.delete(1.0, f"end-{self.received_max_lines + 1} lines")
         self.received_text.see(tk.END)
     
     def _subscribe_to_topic(self, topic):
         """Internal method to subscribe to topic"""
-        try:
-            self.log_message(f"🔄 Subscribing to topic: {topic}")
-            
-            subscribe_future, packet_id = self.mqtt_connection.subscribe(
-                topic=topic,
-                qos=mqtt.QoS.AT_LEAST_ONCE,
-                callback=self.on_message_received)
-            
-            subscribe_result = subscribe_future.result()
-            
-            if topic not in self.subscribed_topics:
-                self.subscribed_topics.append(topic)
-                self.root.after(0, self._update_subscriptions_list)
-            
-            self.log_message(f"✅ Subscribed to '{topic}' with QoS: {subscribe_result['qos']}")
-            
-        except Exception as e:
-            self.log_message(f"❌ Subscription failed for '{topic}': {e}")
+        if self.client.subscribe(topic):
+            self.root.after(0, self._update_subscriptions_list)
     
     def subscribe_to_topic(self):
         """Subscribe to a new topic"""
@@ -259,7 +390,7 @@ class MQTTPublisherGUI:
             messagebox.showwarning("Invalid Topic", "Please enter a topic name")
             return
         
-        if topic in self.subscribed_topics:
+        if topic in self.client.subscribed_topics:
             messagebox.showinfo("Already Subscribed", f"Already subscribed to '{topic}'")
             return
         
@@ -267,11 +398,12 @@ class MQTTPublisherGUI:
     
     def _update_subscriptions_list(self):
         """Update the subscriptions listbox"""
+        subscribed_topics = self.client.subscribed_topics
         self.subscriptions_listbox.delete(0, tk.END)
-        for topic in self.subscribed_topics:
+        for topic in subscribed_topics:
             self.subscriptions_listbox.insert(tk.END, topic)
         
-        if self.subscribed_topics and self.is_connected:
+        if subscribed_topics and self.is_connected:
             self.unsubscribe_btn.config(state="normal")
         else:
             self.unsubscribe_btn.config(state="disabled")
@@ -288,20 +420,8 @@ class MQTTPublisherGUI:
     
     def _unsubscribe_from_topic(self, topic):
         """Internal method to unsubscribe from topic"""
-        try:
-            self.log_message(f"🔄 Unsubscribing from topic: {topic}")
-            
-            unsubscribe_future, packet_id = self.mqtt_connection.unsubscribe(topic=topic)
-            unsubscribe_future.result()
-            
-            if topic in self.subscribed_topics:
-                self.subscribed_topics.remove(topic)
-            
+        if self.client.unsubscribe(topic):
             self.root.after(0, self._update_subscriptions_list)
-            self.log_message(f"✅ Unsubscribed from '{topic}'")
-            
-        except Exception as e:
-            self.log_message(f"❌ Unsubscribe failed for '{topic}': {e}")
     
     def update_connection_status(self):
         """Update connection status display"""
@@ -310,38 +430,23 @@ class MQTTPublisherGUI:
             self.publish_btn.config(state="normal")
             self.auto_publish_btn.config(state="normal")
             self.subscribe_btn.config(state="normal")
-            if self.subscribed_topics:
+            if self.client.subscribed_topics:
                 self.unsubscribe_btn.config(state="normal")
         else:
-            self.status_var.set("❌ Disconnected")
+            reconnecting = self.client.reconnect is not None and self.client.reconnect.interrupted_at is not None
+            if self.connecting:
+                self.status_var.set("🔄 Connecting...")
+            else:
+                self.status_var.set("🔄 Reconnecting..." if reconnecting else "❌ Disconnected")
             self.publish_btn.config(state="disabled")
             self.auto_publish_btn.config(state="disabled")
             self.subscribe_btn.config(state="disabled")
             self.unsubscribe_btn.config(state="disabled")
     
     def connect(self):
-        """Connect to AWS IoT MQTT"""
-        try:
-            self.log_message("🔄 Connecting to AWS IoT...")
-            
-            self.mqtt_connection = mqtt_connection_builder.mtls_from_path(
-                endpoint=self.config["endpoint"],
-                cert_filepath=self.config["cert_path"],
-                pri_key_filepath=self.config["key_path"],
-                client_id=self.config["client_id"],
-                clean_session=True,
-                keep_alive_secs=30)
-            
-            connect_future = self.mqtt_connection.connect()
-            connect_future.result()
-            
-            self.is_connected = True
-            self.log_message("✅ Successfully connected to AWS IoT!")
-            self.root.after(0, self.update_connection_status)
-            
-        except Exception as e:
-            self.log_message(f"❌ Connection failed: {e}")
-            self.root.after(0, self.update_connection_status)
+        """Connect to AWS IoT MQTT, retrying with backoff until connected"""
+        self.log_message("🔄 Connecting to AWS IoT...")
+        return self.client.connect()
     
     def disconnect(self):
         """Disconnect from AWS IoT MQTT"""
@@ -349,19 +454,12 @@ class MQTTPublisherGUI:
             if self.auto_publish_active:
                 self.toggle_auto_publish()
             
-            if self.mqtt_connection and self.is_connected:
-                self.log_message("🔄 Disconnecting...")
-                disconnect_future = self.mqtt_connection.disconnect()
-                disconnect_future.result()
-                
-            self.is_connected = False
-            self.subscribed_topics.clear()
+            self.client.disconnect()
             self.subscriptions_listbox.delete(0, tk.END)
-            self.log_message("✅ Disconnected from AWS IoT")
             self.update_connection_status()
             
         except Exception as e:
-            self.log_message(f"❌ Disconnect error: {e}")
+            self.log_message(f"❌ Disconnect error: {e}", logging.ERROR)
     
     def publish_single_message(self):
         """Publish a single message"""
@@ -369,79 +467,140 @@ class MQTTPublisherGUI:
             messagebox.showwarning("Not Connected", "Please connect to AWS IoT first")
             return
         
-        threading.Thread(target=self._publish_message, daemon=True).start()
+        compiled = self._compile_message()
+        if compiled:
+            threading.Thread(target=self._publish_message, args=compiled, daemon=True).start()
+    
+    def _compile_message(self):
+        """Read the topic and message widgets (Tk thread) and compile the template.
+
+        Returns (topic, template, codec), or None after logging why not. The
+        template is reused while the text is unchanged, so {{seq}} keeps
+        counting across publishes.
+        """
+        topic = self.topic_var.get().strip()
+        message_content = self.message_text.get(1.0, tk.END).strip()
+        
+        if not topic:
+            self.log_message("❌ Topic cannot be empty", logging.ERROR)
+            return None
+        
+        if not message_content:
+            self.log_message("❌ Message cannot be empty", logging.ERROR)
+            return None
+        
+        is_json = self.msg_type.get() == "JSON"
+        template = self._compiled_template
+        if template is None or template.text != message_content or template.is_json != is_json:
+            # Validates JSON once here instead of on every publish
+            try:
+                template = PayloadTemplate(message_content, client_id=self.config["client_id"], is_json=is_json)
+            except ValueError as e:
+                self.log_message(f"❌ Invalid message: {e}", logging.ERROR)
+                return None
+            self._compiled_template = template
+        
+        codec = self.codec_var.get() if is_json else "json"
+        return topic, template, codec
     
-    def _publish_message(self):
-        """Internal method to publish message"""
+    def _publish_message(self, topic, template, codec, count=1):
+        """Render and publish count messages from a compiled template (any thread)"""
         try:
-            topic = self.topic_var.get().strip()
-            message_content = self.message_text.get(1.0, tk.END).strip()
-            
-            if not topic:
-                self.log_message("❌ Topic cannot be empty")
-                return
-            
-            if not message_content:
-                self.log_message("❌ Message cannot be empty")
-                return
-            
-            # Validate JSON if JSON type is selected
-            if self.msg_type.get() == "JSON":
-                try:
-                    json.loads(message_content)
-                except json.JSONDecodeError as e:
-                    self.log_message(f"❌ Invalid JSON: {e}")
-                    return
-            
-            self.mqtt_connection.publish(
-                topic=topic,
-                payload=message_content,
-                qos=mqtt.QoS.AT_LEAST_ONCE)
+            for _ in range(count):
+                payload = template.render()
+                if codec != "json":
+                    payload = encode_payload(json_loads(payload), codec)
+                self.client.publish_async(topic, payload)
             
-            self.log_message(f"📤 Published to '{topic}': {message_content[:50]}{'...' if len(message_content) > 50 else ''}")
+            if message_logger.isEnabledFor(logging.INFO):
+                text = template.text if codec != "json" else payload.decode("utf-8", "replace")
+                suffix = f" (x{count})" if count > 1 else ""
+                message_logger.info(f"📤 Published to '{topic}'{suffix}: {text[:50]}{'...' if len(text) > 50 else ''}")
             
         except Exception as e:
-            self.log_message(f"❌ Publish failed: {e}")
+            self.log_message(f"❌ Publish failed: {e}", logging.ERROR)
+    
+    def toggle_metrics(self):
+        """Turn statistics recording on or off"""
+        self.metrics_active = self.metrics_var.get()
+        self.client.set_metrics_enabled(self.metrics_active)
+        if not self.metrics_active:
+            self.stats_var.set("Disabled")
+    
+    def _refresh_stats(self):
+        """Update the statistics panel (runs on a Tk timer)"""
+        try:
+            if self.metrics_active:
+                snapshot = self.metrics.snapshot()
+                totals = snapshot["totals"]
+                in_flight = totals["published"] - totals["acked"] - totals["failed"]
+                p50 = max((t["ack_latency"]["p50"] for t in snapshot["topics"].values()), default=0.0)
+                p99 = max((t["ack_latency"]["p99"] for t in snapshot["topics"].values()), default=0.0)
+                dedup = self.client.dedup
+                duplicates = f", duplicates {dedup.duplicate_count}" if dedup is not None else ""
+                self.stats_var.set(
+                    f"Pub {totals['published']}  Ack {totals['acked']}  Fail {totals['failed']}  "
+                    f"In-flight {in_flight}  p50 {p50 * 1000:.1f}ms  p99 {p99 * 1000:.1f}ms\n"
+                    f"Rx {totals['received']} (dropped {self.received_dropped}{duplicates})  "
+                    f"Reconnects {snapshot['reconnects']}  Offline {snapshot['disconnected_seconds']:.1f}s")
+        finally:
+            self.root.after(1000, self._refresh_stats)
     
     def toggle_auto_publish(self):
         """Toggle auto publishing"""
         if self.auto_publish_active:
             self.auto_publish_active = False
+            if self.auto_publish_job:
+                self.auto_publish_job.cancel()
+                stats = self.auto_publish_job.stats()
+                self.auto_publish_job = None
+                self.log_message(f"📊 Achieved {stats['achieved_rate']:.2f} msg/s "
+                                 f"(target {stats['target_rate']:.2f}), {stats['skipped']} skipped")
             self.auto_publish_btn.config(text="🔄 Start Auto Publish")
             self.log_message("⏹️ Auto publish stopped")
         else:
             try:
                 interval = float(self.interval_var.get())
+                burst = int(self.burst_var.get())
                 if interval < 0.1:
                     messagebox.showwarning("Invalid Interval", "Interval must be at least 0.1 seconds")
                     return
+                if burst < 1:
+                    messagebox.showwarning("Invalid Count", "Messages per tick must be at least 1")
+                    return
+                
+                # The message is compiled once here; ticks only render it
+                compiled = self._compile_message()
+                if not compiled:
+                    return
                 
                 self.auto_publish_active = True
                 self.auto_publish_btn.config(text="⏹️ Stop Auto Publish")
-                self.log_message(f"▶️ Auto publish started (every {interval}s)")
+                self.log_message(f"▶️ Auto publish started ({burst} every {interval}s)")
                 
-                self.auto_publish_thread = threading.Thread(
-                    target=self._auto_publish_worker, args=(interval,), daemon=True)
-                self.auto_publish_thread.start()
+                self.auto_publish_job = self.scheduler.add_job(
+                    lambda: self._auto_publish_tick(*compiled, burst), interval,
+                    policy="skip", phase=0.0, name="auto_publish")
                 
             except ValueError:
                 messagebox.showwarning("Invalid Interval", "Please enter a valid number")
     
-    def _auto_publish_worker(self, interval):
-        """Worker thread for auto publishing"""
-        while self.auto_publish_active and self.is_connected:
-            self._publish_message()
-            time.sleep(interval)
+    def _auto_publish_tick(self, topic, template, codec, count):
+        """Scheduled auto publish; ticks are skipped while reconnecting"""
+        if self.is_connected:
+            self._publish_message(topic, template, codec, count)
     
     def on_closing(self):
         """Handle window closing"""
         if self.auto_publish_active:
             self.auto_publish_active = False
+            self.auto_publish_job.cancel()
+        self.scheduler.stop()
         
-        if self.is_connected:
-            self.disconnect()
+        self.client.disconnect()
         
         self.root.destroy()
+        self.log_listener.stop()
     
     def run(self):
         """Start the GUI application"""
@@ -0,0 +1,287 @@
+import json
+import zlib
+from topics import topic_matches
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Binary payloads start with MARKER followed by a one-byte codec id. JSON and
+# plain text payloads are sent as-is, so existing subscribers keep working.
+MARKER = b"\x00"
+
+# Preset dictionary for the compressed codecs: the field names and values
+# that repeat in every sensor message. zlib favours strings near the end.
+SENSOR_DICTIONARY = (
+    b'"status": "inactive" "status": "active" "humidity": "pressure": '
+    b'"message": "Hello from MQTT Publisher GUI", "client_id": "Raspberry_AWS_IoT092025", '
+    b'{"timestamp": 17, "data": {"temperature": '
+)
+
+
+_fast_json = orjson
+
+
+def use_fast_json(enabled=True):
+    """Use orjson for JSON when it is installed and enabled, else the stdlib; returns whether orjson is in use"""
+    global _fast_json
+    _fast_json = orjson if enabled else None
+    return _fast_json is not None
+
+
+def json_loads(data):
+    """Parse JSON from bytes, bytearray or memoryview; orjson reads the buffer without a str copy"""
+    if _fast_json is not None:
+        return _fast_json.loads(data)
+    return json.loads(data if isinstance(data, (bytes, bytearray)) else bytes(data))
+
+
+def json_dumps(message):
+    """Compact JSON as bytes"""
+    if _fast_json is not None:
+        try:
+            return _fast_json.dumps(message)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; the stdlib handles them
+    return json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+
+class JsonCodec:
+    name = "json"
+    codec_id = None
+    content_type = "application/json"
+
+    def encode(self, message):
+        return json_dumps(message)
+
+    def decode(self, data):
+        return json_loads(data)
+
+
+class MsgpackCodec:
+    name = "msgpack"
+    codec_id = 1
+    content_type = "application/msgpack"
+
+    def encode(self, message):
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+class CborCodec:
+    name = "cbor"
+    codec_id = 2
+    content_type = "application/cbor"
+
+    def encode(self, message):
+        return cbor2.dumps(message)
+
+    def decode(self, data):
+        return cbor2.loads(data)
+
+
+class ZlibCodec:
+    """Wraps another codec with zlib compression against a preset dictionary.
+
+    A small window (window_bits) keeps per-message compressor setup cheap;
+    telemetry payloads are far smaller than the window anyway.
+    """
+
+    def __init__(self, inner, codec_id, zdict=SENSOR_DICTIONARY, level=6, window_bits=10):
+        self.inner = inner
+        self.codec_id = codec_id
+        self.zdict = zdict
+        self.level = level
+        self.window_bits = window_bits
+        self.name = f"{inner.name}+zlib"
+        self.content_type = inner.content_type
+
+    def encode(self, message):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -self.window_bits, 4, zdict=self.zdict)
+        return compressor.compress(self.inner.encode(message)) + compressor.flush()
+
+    def decode(self, data):
+        decompressor = zlib.decompressobj(-15, zdict=self.zdict)
+        return self.inner.decode(decompressor.decompress(data) + decompressor.flush())
+
+
+class ZstdCodec:
+    """Wraps another codec with zstd compression against a preset dictionary"""
+
+    def __init__(self, inner, codec_id, dictionary=SENSOR_DICTIONARY, level=3):
+        self.inner = inner
+        self.codec_id = codec_id
+        self.name = f"{inner.name}+zstd"
+        self.content_type = inner.content_type
+        zstd_dict = zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        self._compressor = zstandard.ZstdCompressor(
+            level=level, dict_data=zstd_dict, write_checksum=False,
+            write_content_size=True, write_dict_id=False)
+        self._decompressor = zstandard.ZstdDecompressor(dict_data=zstd_dict)
+
+    def encode(self, message):
+        return self._compressor.compress(self.inner.encode(message))
+
+    def decode(self, data):
+        return self.inner.decode(self._decompressor.decompress(data))
+
+
+CODECS = {}
+CODECS_BY_ID = {}
+
+
+def register_codec(codec):
+    """Make a codec available for encoding by name and decoding by id"""
+    CODECS[codec.name] = codec
+    if codec.codec_id is not None:
+        if codec.codec_id in CODECS_BY_ID:
+            raise ValueError(f"Codec id {codec.codec_id} already registered")
+        CODECS_BY_ID[codec.codec_id] = codec
+
+
+register_codec(JsonCodec())
+register_codec(ZlibCodec(CODECS["json"], codec_id=3))
+if msgpack is not None:
+    register_codec(MsgpackCodec())
+    register_codec(ZlibCodec(CODECS["msgpack"], codec_id=4))
+if cbor2 is not None:
+    register_codec(CborCodec())
+if zstandard is not None:
+    register_codec(ZstdCodec(CODECS["json"], codec_id=5))
+
+
+def encode_payload(message, codec_name="json"):
+    """Encode a message with the named codec, adding the marker for binary codecs"""
+    codec = CODECS[codec_name]
+    if codec.codec_id is None:
+        return codec.encode(message)
+    return MARKER + bytes((codec.codec_id,)) + codec.encode(message)
+
+
+JSON_CONTENT_TYPE = JsonCodec.content_type
+TEXT_CONTENT_TYPE = "text/plain; charset=utf-8"
+
+
+def content_type_for(payload):
+    """MQTT 5 properties for an outgoing payload: (is_utf8, content type).
+
+    Marked payloads are binary with their codec's content type; unmarked
+    ones are UTF-8, JSON when they start with '{' or '[' (what the codecs
+    and message templates produce) and plain text otherwise.
+    """
+    if payload[:1] == MARKER and len(payload) > 1:
+        codec = CODECS_BY_ID.get(payload[1])
+        return False, codec.content_type if codec is not None else "application/octet-stream"
+    if payload[:1] in (b"{", b"[") or payload.lstrip()[:1] in (b"{", b"["):
+        return True, JSON_CONTENT_TYPE
+    return True, TEXT_CONTENT_TYPE
+
+
+def decode_payload(payload, content_type=None):
+    """Decode a received payload, picking the codec from its marker.
+
+    Unmarked payloads are parsed as JSON straight from the buffer and fall
+    back to UTF-8 text. When the sender gave a content type (MQTT 5) there
+    is no guessing: JSON is parsed and text/* is decoded as text.
+    """
+    if payload[:1] == MARKER and len(payload) > 1:
+        codec = CODECS_BY_ID.get(payload[1])
+        if codec is None:
+            raise ValueError(f"Unknown payload codec id {payload[1]}")
+        return codec.decode(memoryview(payload)[2:])
+    if content_type == JSON_CONTENT_TYPE:
+        return json_loads(payload)
+    if content_type and content_type.startswith("text/"):
+        return bytes(payload).decode("utf-8")
+    try:
+        return json_loads(payload)
+    except ValueError:
+        return bytes(payload).decode("utf-8")
+
+
+def payload_text(payload):
+    """Printable form of a payload: text and JSON as sent, binary codecs as compact JSON"""
+    if payload[:1] == MARKER and len(payload) > 1:
+        return json_dumps(decode_payload(payload)).decode("utf-8")
+    return bytes(payload).decode("utf-8", "replace")
+
+
+_UNSET = object()
+
+
+class ReceivedMessage:
+    """A received message whose payload is only parsed when a handler asks.
+
+    payload is the buffer awscrt delivered, never copied. data decodes it
+    once with decode_payload and caches the result for every other handler
+    of the same message; text is the UTF-8 form of the payload.
+    content_type is set for MQTT 5 messages that carried one.
+    """
+
+    __slots__ = ("topic", "payload", "qos", "retain", "content_type", "_data")
+
+    def __init__(self, topic, payload, qos=None, retain=False, content_type=None):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+        self.content_type = content_type
+        self._data = _UNSET
+
+    @property
+    def data(self):
+        if self._data is _UNSET:
+            self._data = decode_payload(self.payload, self.content_type)
+        return self._data
+
+    @property
+    def text(self):
+        return payload_text(self.payload)
+
+    @property
+    def view(self):
+        return memoryview(self.payload)
+
+    def __len__(self):
+        return len(self.payload)
+
+
+class TopicCodecs:
+    """Selects a codec per topic filter; the first matching filter wins"""
+
+    def __init__(self, default="json"):
+        self.default = default
+        self.rules = []
+
+    def set_codec(self, topic_filter, codec_name):
+        if codec_name not in CODECS:
+            raise ValueError(f"Codec '{codec_name}' is not available")
+        self.rules = [rule for rule in self.rules if rule[0] != topic_filter]
+        self.rules.append((topic_filter, codec_name))
+
+    def codec_for(self, topic):
+        for topic_filter, codec_name in self.rules:
+            if topic_matches(topic_filter, topic):
+                return codec_name
+        return self.default
+
+    def encode(self, topic, message):
+        return encode_payload(message, self.codec_for(topic))
@@ -0,0 +1,115 @@
+import itertools
+import json
+import random
+import re
+import time
+
+PLACEHOLDER = re.compile(r"\{\{\s*([a-z_]+)((?::[^:}]*)*)\s*\}\}")
+
+
+class PayloadTemplate:
+    """A message template compiled once and rendered straight to bytes.
+
+    Placeholders are written {{name}} or {{name:arg:arg}}:
+
+        {{timestamp}}  {{timestamp_ms}}   current time, epoch seconds / ms
+        {{seq}}                           1, 2, 3, ... per template
+        {{client_id}}                     fixed when the template is compiled
+                                          (JSON-escaped with is_json=True)
+        {{uniform:low:high:decimals}}     random number
+        {{randint:low:high}}              random integer
+        {{walk:start:step:decimals}}      random walk, like a drifting sensor
+        {{choice:a:b:...}}                one of the given words
+        {{sensor:name}}                   sensors[name]() as JSON
+
+    The literal text is encoded once into a bytes %-format with one
+    conversion per placeholder, so render() is a single bytes formatting
+    call producing the payload at its final size, with no str stage. With
+    is_json=True a trial rendering must parse as JSON; placeholders that
+    produce strings go inside quotes in the template.
+    """
+
+    def __init__(self, text, client_id="", sensors=None, seed=None, is_json=True):
+        self.text = text
+        self.client_id = client_id
+        self.sensors = sensors or {}
+        self.is_json = is_json
+        self.render_count = 0
+
+        if is_json:
+            # Trial rendering from a throwaway compile, so seq and walks start fresh
+            self.rng = random.Random(seed)
+            trial_format, trial_getters = self._compile(text)
+            try:
+                json.loads(trial_format % tuple([getter() for getter in trial_getters]))
+            except ValueError as e:
+                raise ValueError(f"Template does not render to valid JSON: {e}") from None
+        self.rng = random.Random(seed)
+        self._format, self._getters = self._compile(text)
+
+    def _compile(self, text):
+        """Return the bytes %-format and the value getters for text"""
+        formats = []
+        getters = []
+        position = 0
+        for match in PLACEHOLDER.finditer(text):
+            formats.append(_escape(text[position:match.start()]))
+            name, args = match.group(1), match.group(2).split(":")[1:]
+            try:
+                conversion, getter = self._compile_placeholder(name, args)
+            except (ValueError, IndexError, KeyError) as e:
+                raise ValueError(f"Bad placeholder {match.group(0)}: {e}") from None
+            formats.append(conversion)
+            if getter is not None:
+                getters.append(getter)
+            position = match.end()
+        formats.append(_escape(text[position:]))
+        return "".join(formats).encode("utf-8"), getters
+
+    def _compile_placeholder(self, name, args):
+        """Return (%-conversion, getter) for a placeholder; getter None for constants"""
+        rng = self.rng
+        if name == "timestamp":
+            return "%d", lambda: int(time.time())
+        if name == "timestamp_ms":
+            return "%d", lambda: int(time.time() * 1000)
+        if name == "seq":
+            counter = itertools.count(1)
+            return "%d", counter.__next__
+        if name == "client_id":
+            client_id = json.dumps(self.client_id)[1:-1] if self.is_json else self.client_id
+            return _escape(client_id), None
+        if name == "uniform":
+            low, high = float(args[0]), float(args[1])
+            decimals = int(args[2]) if len(args) > 2 else 2
+            return f"%.{decimals}f", lambda: rng.uniform(low, high)
+        if name == "randint":
+            low, high = int(args[0]), int(args[1])
+            return "%d", lambda: rng.randint(low, high)
+        if name == "walk":
+            value = [float(args[0])]
+            step = float(args[1])
+            decimals = int(args[2]) if len(args) > 2 else 2
+
+            def walk():
+                value[0] += rng.uniform(-step, step)
+                return value[0]
+            return f"%.{decimals}f", walk
+        if name == "choice":
+            if not args:
+                raise ValueError("choice needs at least one option")
+            options = [option.encode("utf-8") for option in args]
+            return "%s", lambda: rng.choice(options)
+        if name == "sensor":
+            source = self.sensors[args[0]]
+            return "%s", lambda: json.dumps(source()).encode("utf-8")
+        raise ValueError(f"unknown placeholder '{name}'")
+
+    def render(self):
+        """Render one payload as bytes"""
+        self.render_count += 1
+        return self._format % tuple([getter() for getter in self._getters])
+
+
+def _escape(text):
+    return text.replace("%", "%%")
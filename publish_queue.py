@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from awscrt import mqtt
+
+
+class PublishQueue:
+    """Background sender that batches publishes and bounds the QoS1 in-flight window.
+
+    Callers get a concurrent.futures.Future per message which resolves with the
+    PUBACK result ({'packet_id': ...}) or the publish error. With a
+    PublishMetrics instance, enqueue/send/PUBACK timestamps are recorded;
+    without one no clock is read on the hot path.
+    """
+
+    def __init__(self, mqtt_connection, qos=mqtt.QoS.AT_LEAST_ONCE, batch_size=64,
+                 batch_delay=0.002, max_in_flight=64, max_queued=10000, metrics=None):
+        self.mqtt_connection = mqtt_connection
+        self.qos = qos
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.max_in_flight = max_in_flight
+        self.max_queued = max_queued
+        self.metrics = metrics
+
+        self.sent_count = 0
+        self.acked_count = 0
+        self.failed_count = 0
+        self.in_flight = 0
+
+        self._queue = deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._window = threading.Condition(self._lock)
+        self._idle = threading.Condition(self._lock)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the background sender thread"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._sender_worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, topic, payload, qos=None, retain=False, timeout=None):
+        """Queue a message for publishing and return its Future.
+
+        Blocks while the queue holds max_queued messages; raises TimeoutError
+        if no room frees up within timeout.
+        """
+        future = Future()
+        enqueued_at = time.monotonic() if self.metrics is not None else None
+        with self._lock:
+            if not self._running:
+                raise RuntimeError("Publish queue is not running")
+            if len(self._queue) >= self.max_queued:
+                if not self._not_full.wait_for(lambda: len(self._queue) < self.max_queued, timeout):
+                    raise TimeoutError("Publish queue is full")
+            self._queue.append((topic, payload, self.qos if qos is None else qos, retain, future, enqueued_at))
+            self._pending += 1
+            queued = len(self._queue)
+            if queued == 1 or queued >= self.batch_size:
+                self._not_empty.notify()
+        return future
+
+    def flush(self, timeout=None):
+        """Wait until every queued message has been acknowledged or failed"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def stop(self, timeout=5.0):
+        """Send what is queued, then stop the sender thread"""
+        self.flush(timeout)
+        with self._lock:
+            self._running = False
+            self._not_empty.notify()
+            self._window.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        with self._lock:
+            leftovers = list(self._queue)
+            self._queue.clear()
+            self._pending -= len(leftovers)
+            self._not_full.notify_all()
+            if self._pending == 0:
+                self._idle.notify_all()
+        for _, _, _, _, future, _ in leftovers:
+            future.set_exception(RuntimeError("Publish queue stopped"))
+
+    def _next_batch(self):
+        """Collect up to batch_size messages, waiting at most batch_delay for a full batch"""
+        with self._lock:
+            self._not_empty.wait_for(lambda: self._queue or not self._running)
+            if not self._running:
+                return []
+            if len(self._queue) < self.batch_size:
+                deadline = time.monotonic() + self.batch_delay
+                while len(self._queue) < self.batch_size and self._running:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+            count = min(self.batch_size, len(self._queue))
+            batch = [self._queue.popleft() for _ in range(count)]
+            self._not_full.notify_all()
+            return batch
+
+    def _sender_worker(self):
+        """Drain batches and hand them to the MQTT connection"""
+        while self._running:
+            batch = self._next_batch()
+            for topic, payload, qos, retain, future, enqueued_at in batch:
+                with self._lock:
+                    self._window.wait_for(lambda: self.in_flight < self.max_in_flight or not self._running)
+                    self.in_flight += 1
+                self._send(topic, payload, qos, retain, future, enqueued_at)
+
+    def _send(self, topic, payload, qos, retain, future, enqueued_at):
+        """Publish one message and chain its PUBACK to the caller's future"""
+        metrics = self.metrics
+        if metrics is not None:
+            sent_at = time.monotonic()
+            metrics.record_sent(topic, enqueued_at, sent_at)
+        try:
+            publish_future, packet_id = self.mqtt_connection.publish(
+                topic=topic,
+                payload=payload,
+                qos=qos,
+                retain=retain)
+        except Exception as e:
+            if metrics is not None:
+                metrics.record_failure(topic)
+            self._on_complete(future, None, e)
+            return
+
+        self.sent_count += 1
+
+        def on_done(done_future):
+            error = done_future.exception()
+            if metrics is not None:
+                if error:
+                    metrics.record_failure(topic)
+                else:
+                    metrics.record_ack(topic, enqueued_at, sent_at, time.monotonic())
+            self._on_complete(future, None if error else done_future.result(), error)
+
+        publish_future.add_done_callback(on_done)
+
+    def _on_complete(self, future, result, error):
+        """Release the in-flight slot and resolve the caller's future"""
+        with self._lock:
+            self.in_flight -= 1
+            self._pending -= 1
+            if error:
+                self.failed_count += 1
+            else:
+                self.acked_count += 1
+            self._window.notify()
+            if self._pending == 0:
+                self._idle.notify_all()
+        if error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
@@ -0,0 +1,189 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# AWS IoT Core per-connection limits: publish requests per second and bytes per second
+AWS_IOT_CONNECTION_TPS = 100
+AWS_IOT_CONNECTION_BYTES = 512 * 1024
+
+BLOCK = "block"
+DROP = "drop"
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a publish does not fit the budget (drop policy, or block timeout)"""
+
+
+class TokenBucket:
+    """Refills at rate tokens/sec up to burst; not thread-safe on its own"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        if now <= self.updated:
+            # A bucket made after now was read has nothing to add yet
+            return
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until amount can be taken; a full bucket always admits one oversized message"""
+        needed = min(amount, self.burst) - self.tokens
+        return needed / self.rate if needed > 0 else 0.0
+
+
+class AdaptiveRateLimiter:
+    """Per-connection and per-topic publish budgets that adapt to the broker.
+
+    A publish takes one token from the connection bucket, its size from the
+    bandwidth bucket (if byte_rate is set) and one token from its topic's
+    bucket (if topic_rate is set). The connection rate follows AIMD: each
+    clean acknowledgement adds about increase msgs/sec per second, up to
+    max_rate; a failed publish, or an acknowledgement slower than
+    latency_target (queueing counts, so local in-flight saturation shows up
+    too), multiplies it by decrease, at most once per cooldown, down to
+    min_rate. Set max_rate to the broker's limit and throughput settles
+    just under it.
+
+    When a publish does not fit, policy decides: BLOCK waits (up to
+    timeout), DROP raises RateLimitExceeded at once; acquire_async awaits
+    instead of blocking.
+    """
+
+    def __init__(self, rate=AWS_IOT_CONNECTION_TPS, max_rate=None, min_rate=1.0, burst_seconds=0.1,
+                 topic_rate=None, topic_burst=None, byte_rate=None, latency_target=0.5,
+                 increase=5.0, decrease=0.7, cooldown=1.0, policy=BLOCK, timeout=None, max_topics=256):
+        if policy not in (BLOCK, DROP):
+            raise ValueError(f"Unknown rate limit policy: {policy}")
+        self.max_rate = max_rate or rate
+        self.min_rate = min_rate
+        self.burst_seconds = burst_seconds
+        self.topic_rate = topic_rate
+        self.topic_burst = topic_burst
+        self.latency_target = latency_target
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.policy = policy
+        self.timeout = timeout
+        self.max_topics = max_topics
+
+        # A short burst keeps the broker's own bucket from overflowing at the limit
+        self.connection = TokenBucket(rate, max(1.0, rate * burst_seconds))
+        self.bandwidth = TokenBucket(byte_rate) if byte_rate else None
+        self.topics = {}
+
+        self.admitted_count = 0
+        self.dropped_count = 0
+        self.decrease_count = 0
+        self.waited_seconds = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self.connection.rate
+
+    def _topic_bucket(self, topic):
+        bucket = self.topics.get(topic)
+        if bucket is None:
+            if len(self.topics) >= self.max_topics:
+                # Forget the oldest topic; it starts again with a full bucket
+                del self.topics[next(iter(self.topics))]
+            bucket = self.topics[topic] = TokenBucket(self.topic_rate, self.topic_burst)
+        return bucket
+
+    def try_acquire(self, topic, size=0):
+        """Take the tokens for one publish if they are all there; else return seconds to wait"""
+        with self._lock:
+            now = time.monotonic()
+            buckets = [(self.connection, 1)]
+            if self.bandwidth is not None and size:
+                buckets.append((self.bandwidth, size))
+            if self.topic_rate:
+                buckets.append((self._topic_bucket(topic), 1))
+            wait = 0.0
+            for bucket, amount in buckets:
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_time(amount))
+            if wait:
+                return wait
+            for bucket, amount in buckets:
+                bucket.tokens -= amount
+            self.admitted_count += 1
+            return 0.0
+
+    def acquire(self, topic, size=0, policy=None, timeout=None):
+        """Wait for budget to publish size bytes on topic, as policy says.
+
+        Raises RateLimitExceeded when the message is dropped.
+        """
+        policy = policy or self.policy
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        started = None
+        while True:
+            wait = self.try_acquire(topic, size)
+            if not wait:
+                if started is not None:
+                    self.waited_seconds += time.monotonic() - started
+                return
+            if policy == DROP or (deadline is not None and time.monotonic() + wait > deadline):
+                self.dropped_count += 1
+                raise RateLimitExceeded(f"Publish budget exhausted for {topic} ({self.rate:.1f} msgs/sec)")
+            if started is None:
+                started = time.monotonic()
+            time.sleep(wait)
+
+    async def acquire_async(self, topic, size=0, timeout=None):
+        """Like acquire with the block policy, but awaits instead of sleeping"""
+        import asyncio
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(topic, size)
+            if not wait:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                self.dropped_count += 1
+                raise RateLimitExceeded(f"Publish budget exhausted for {topic} ({self.rate:.1f} msgs/sec)")
+            await asyncio.sleep(wait)
+
+    def record_result(self, latency, error=None):
+        """Feed back one publish outcome: latency from submit to PUBACK, and its error if it failed"""
+        with self._lock:
+            bucket = self.connection
+            now = time.monotonic()
+            if error is not None or latency > self.latency_target:
+                if now - self._last_decrease < self.cooldown:
+                    return
+                self._last_decrease = now
+                self.decrease_count += 1
+                bucket.refill(now)
+                bucket.rate = max(self.min_rate, bucket.rate * self.decrease)
+                bucket.burst = max(1.0, bucket.rate * self.burst_seconds)
+                bucket.tokens = min(bucket.tokens, bucket.burst)
+                logger.warning("📉 Publish rate lowered to %.1f msgs/sec (%s)", bucket.rate,
+                               error if error is not None else f"PUBACK after {latency * 1000:.0f} ms")
+            elif bucket.rate < self.max_rate:
+                bucket.refill(now)
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase / bucket.rate)
+                bucket.burst = max(1.0, bucket.rate * self.burst_seconds)
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "max_rate": self.max_rate,
+            "admitted": self.admitted_count,
+            "dropped": self.dropped_count,
+            "decreases": self.decrease_count,
+            "waited_seconds": self.waited_seconds,
+        }
@@ -0,0 +1,197 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# Connection options that hand reconnecting over to ReconnectManager. awscrt's
+# own retry loop waits reconnect_min_timeout_secs (whole seconds, 5 by default)
+# before its first attempt; at 0 it retries at once, and the manager cancels
+# that loop as soon as the interruption is reported.
+CRT_RECONNECT_OPTIONS = {"reconnect_min_timeout_secs": 0, "reconnect_max_timeout_secs": 1}
+
+
+class Backoff:
+    """Exponential backoff with full jitter.
+
+    Each delay is drawn uniformly between min_delay and the current cap,
+    which starts at min_delay and grows by multiplier up to max_delay, so
+    a fleet that lost the broker at the same moment does not retry in
+    lockstep.
+    """
+
+    def __init__(self, min_delay=0.05, max_delay=30.0, multiplier=2.0):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.attempt = 0
+
+    def next_delay(self):
+        cap = min(self.max_delay, self.min_delay * self.multiplier ** self.attempt)
+        self.attempt += 1
+        return random.uniform(self.min_delay, cap)
+
+    def reset(self):
+        self.attempt = 0
+
+
+class ReconnectManager:
+    """Keeps an awscrt MQTT 3.1.1 connection up with jittered exponential backoff.
+
+    Build the connection with CRT_RECONNECT_OPTIONS and forward its
+    interruption and resume callbacks to connection_interrupted() and
+    connection_resumed(). On an interruption the manager disconnects
+    (cancelling awscrt's retry loop) and reconnects the same Connection
+    immediately, then with backoff from min_delay up to max_delay. Reusing
+    the Connection keeps unacknowledged QoS 1 publishes, which awscrt
+    resends, and its subscriptions: subscribe through the manager and, if
+    the broker did not keep the session (session_present False), the
+    tracked filters are all restored with a single SUBSCRIBE.
+
+    on_connected(session_present) runs after every successful connect,
+    on the thread that made it.
+    """
+
+    def __init__(self, mqtt_connection, on_connected=None, min_delay=0.05, max_delay=30.0,
+                 connect_timeout=10.0):
+        self.mqtt_connection = mqtt_connection
+        self.on_connected = on_connected
+        self.backoff = Backoff(min_delay, max_delay)
+        self.connect_timeout = connect_timeout
+
+        self.subscriptions = {}
+        self.is_connected = False
+        self.interruption_count = 0
+        self.reconnect_count = 0
+        self.attempt_count = 0
+        self.last_error = None
+        self.last_recovery_seconds = None
+        self.interrupted_at = None
+
+        self._lock = threading.Lock()
+        self._recovering = False
+        self._stopped = threading.Event()
+
+    def connect(self, max_attempts=None):
+        """Connect, retrying with backoff; False once max_attempts fail or after stop()"""
+        attempts = 0
+        self.backoff.reset()
+        while not self._stopped.is_set():
+            attempts += 1
+            self.attempt_count += 1
+            try:
+                result = self.mqtt_connection.connect().result(self.connect_timeout)
+            except Exception as e:
+                self.last_error = e
+                # Before Python 3.11 this is not the builtin TimeoutError
+                if isinstance(e, FutureTimeoutError):
+                    self._disconnect_quietly()
+                if max_attempts and attempts >= max_attempts:
+                    return False
+                delay = self.backoff.next_delay()
+                logger.warning("❌ Connection attempt %d failed: %s; retrying in %.2fs", attempts, e, delay)
+                self._stopped.wait(delay)
+                continue
+            self._connected(result.get("session_present", False))
+            return True
+        return False
+
+    def subscribe(self, topic, qos, callback):
+        """Subscribe on the connection and track the filter for resubscribing.
+
+        The filter is tracked once the broker grants it; the returned Future
+        fails if the SUBSCRIBE fails or the broker rejects the filter.
+        """
+        subscribe_future, packet_id = self.mqtt_connection.subscribe(topic=topic, qos=qos, callback=callback)
+        granted = Future()
+
+        def on_done(done):
+            error = done.exception()
+            if error is None and done.result().get("qos") is None:
+                error = RuntimeError(f"Broker rejected the subscription to {topic}")
+            if error is not None:
+                granted.set_exception(error)
+                return
+            self.subscriptions[topic] = qos
+            granted.set_result(done.result())
+
+        subscribe_future.add_done_callback(on_done)
+        return granted, packet_id
+
+    def unsubscribe(self, topic):
+        self.subscriptions.pop(topic, None)
+        return self.mqtt_connection.unsubscribe(topic=topic)
+
+    def start(self):
+        """Connect in a background thread, retrying until connected or stopped"""
+        threading.Thread(target=self.connect, name="mqtt-connect", daemon=True).start()
+
+    def stop(self):
+        """Stop retrying; call before a deliberate disconnect"""
+        self._stopped.set()
+
+    def connection_interrupted(self, error):
+        """Call from the connection's on_connection_interrupted callback"""
+        self.is_connected = False
+        self.interruption_count += 1
+        self.last_error = error
+        if self.interrupted_at is None:
+            self.interrupted_at = time.monotonic()
+        with self._lock:
+            if self._recovering or self._stopped.is_set():
+                return
+            self._recovering = True
+        threading.Thread(target=self._recover, name="mqtt-reconnect", daemon=True).start()
+
+    def connection_resumed(self, return_code, session_present):
+        """Call from on_connection_resumed; awscrt only resumes when the manager is not recovering"""
+        with self._lock:
+            if self._recovering:
+                return
+        self._connected(session_present)
+
+    def _recover(self):
+        # Cancel awscrt's retry loop so the two never race for the connection
+        self._disconnect_quietly()
+        if not self.connect():
+            with self._lock:
+                self._recovering = False
+
+    def _disconnect_quietly(self):
+        try:
+            self.mqtt_connection.disconnect().result(self.connect_timeout)
+        except Exception as e:
+            logger.debug("Disconnect before reconnecting failed: %s", e)
+
+    def _connected(self, session_present):
+        if not session_present and self.subscriptions:
+            # One SUBSCRIBE carrying every tracked filter
+            try:
+                resubscribe_future, _ = self.mqtt_connection.resubscribe_existing_topics()
+                topics = resubscribe_future.result(self.connect_timeout)["topics"]
+                logger.info("✅ Resubscribed to %d topics", len(topics))
+            except Exception as e:
+                logger.error("❌ Resubscribe failed: %r", e)
+        if self.interrupted_at is not None:
+            self.last_recovery_seconds = time.monotonic() - self.interrupted_at
+            self.interrupted_at = None
+            self.reconnect_count += 1
+            logger.info("✅ Reconnected in %.0f ms (session_present: %s)",
+                        self.last_recovery_seconds * 1000, session_present)
+        with self._lock:
+            self._recovering = False
+        self.is_connected = True
+        if self.on_connected:
+            self.on_connected(session_present)
+
+    def stats(self):
+        return {
+            "connected": self.is_connected,
+            "interruptions": self.interruption_count,
+            "reconnects": self.reconnect_count,
+            "connect_attempts": self.attempt_count,
+            "last_recovery_ms": None if self.last_recovery_seconds is None else self.last_recovery_seconds * 1000,
+            "last_error": None if self.last_error is None else str(self.last_error),
+        }
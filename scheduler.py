@@ -0,0 +1,174 @@
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CATCH_UP = "catch_up"
+SKIP = "skip"
+
+
+class ScheduledJob:
+    """A periodic job with monotonic deadlines and achieved-rate statistics"""
+
+    def __init__(self, scheduler, callback, interval, policy, jitter, phase, name, max_catch_up):
+        if policy not in (CATCH_UP, SKIP):
+            raise ValueError(f"Unknown schedule policy: {policy}")
+        self.scheduler = scheduler
+        self.callback = callback
+        self.interval = interval
+        self.policy = policy
+        self.jitter = jitter
+        self.name = name or getattr(callback, "__name__", "job")
+        self.max_catch_up = max_catch_up
+        self.cancelled = False
+
+        self.run_count = 0
+        self.skipped_count = 0
+        self.error_count = 0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+        self.first_run = None
+        self.last_run = None
+
+        self._tick = 0
+        self._base = time.monotonic() + phase
+        self.deadline = self._base
+
+    def _next_deadline(self, now):
+        """Advance to the next tick; deadlines never accumulate error"""
+        self._tick += 1
+        slot = self._base + self._tick * self.interval
+        if now - slot > self.interval * self.max_catch_up or (self.policy == SKIP and slot < now):
+            missed = int((now - slot) // self.interval) + 1
+            self._tick += missed
+            self.skipped_count += missed
+            slot = self._base + self._tick * self.interval
+        jitter = random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+        self.deadline = slot + jitter
+
+    def cancel(self):
+        self.cancelled = True
+        self.scheduler._wake()
+
+    @property
+    def mean_lateness(self):
+        return self.total_lateness / self.run_count if self.run_count else 0.0
+
+    @property
+    def achieved_rate(self):
+        """Runs per second measured between the first and last run"""
+        if self.run_count < 2 or self.last_run == self.first_run:
+            return 0.0
+        return (self.run_count - 1) / (self.last_run - self.first_run)
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "target_rate": 1.0 / self.interval,
+            "achieved_rate": self.achieved_rate,
+            "runs": self.run_count,
+            "skipped": self.skipped_count,
+            "errors": self.error_count,
+            "mean_lateness_ms": self.mean_lateness * 1000,
+            "max_lateness_ms": self.max_lateness * 1000,
+        }
+
+
+class PublishScheduler:
+    """Runs many periodic jobs on one thread using monotonic deadlines.
+
+    Each job fires at base + n * interval, so publish time never adds to the
+    period. The thread sleeps until shortly before the next deadline and
+    spins for the final spin seconds for sub-millisecond accuracy. A job that
+    falls behind either runs its missed ticks back to back (catch_up, up to
+    max_catch_up intervals behind) or skips them (skip). Jobs get a random
+    phase within their interval unless one is given, and optional per-tick
+    jitter, so a fleet of devices does not publish in lockstep.
+
+    Callbacks run on the scheduler thread and should not block; hand
+    publishes to a queue (e.g. publish_async) rather than waiting on them.
+    """
+
+    def __init__(self, spin=0.001):
+        self.spin = spin
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def add_job(self, callback, interval, policy=CATCH_UP, jitter=0.0, phase=None,
+                name=None, max_catch_up=10):
+        """Schedule callback() every interval seconds and return its ScheduledJob"""
+        if interval <= 0:
+            raise ValueError("Interval must be positive")
+        if phase is None:
+            phase = random.uniform(0, interval)
+        job = ScheduledJob(self, callback, interval, policy, jitter, phase, name, max_catch_up)
+        with self._condition:
+            heapq.heappush(self._heap, (job.deadline, next(self._sequence), job))
+            self._condition.notify()
+        return job
+
+    def jobs(self):
+        with self._condition:
+            return [job for _, _, job in self._heap if not job.cancelled]
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="publish-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        self._wake()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _wake(self):
+        with self._condition:
+            self._condition.notify()
+
+    def _run(self):
+        while self._running:
+            with self._condition:
+                while self._heap and self._heap[0][2].cancelled:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline = self._heap[0][0]
+                remaining = deadline - time.monotonic()
+                if remaining > self.spin:
+                    self._condition.wait(remaining - self.spin)
+                    continue
+                _, _, job = heapq.heappop(self._heap)
+
+            while time.monotonic() < deadline:
+                pass
+
+            self._run_job(job, deadline)
+            if not job.cancelled:
+                with self._condition:
+                    heapq.heappush(self._heap, (job.deadline, next(self._sequence), job))
+
+    def _run_job(self, job, deadline):
+        now = time.monotonic()
+        lateness = now - deadline
+        job.total_lateness += lateness
+        job.max_lateness = max(job.max_lateness, lateness)
+        if job.first_run is None:
+            job.first_run = now
+        job.last_run = now
+        job.run_count += 1
+        try:
+            job.callback()
+        except Exception as e:
+            job.error_count += 1
+            logger.error("❌ Scheduled job '%s' failed: %s", job.name, e)
+        job._next_deadline(time.monotonic())
@@ -0,0 +1,260 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+# File header: magic, version, capacity, head, tail, used, count, next_seq
+HEADER = struct.Struct("<4sIQQQQQQ")
+HEADER_SIZE = 64
+MAGIC = b"MQSP"
+VERSION = 1
+
+# Record header: total length, sequence, enqueue time, qos, topic length
+RECORD = struct.Struct("<IQdBH")
+WRAP_MARKER = 0xFFFFFFFF
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+
+class SpoolFullError(Exception):
+    pass
+
+
+class Spool:
+    """Persistent store-and-forward spool on a memory-mapped ring buffer.
+
+    Records are appended sequentially into a fixed-size file. When the byte
+    cap is reached the eviction policy either drops the oldest records
+    (drop_oldest) or rejects the new one (drop_newest). Writes are made
+    durable with a grouped msync every sync_every records or sync_interval
+    seconds instead of once per message, to spare SD cards; a timer syncs
+    the tail of a burst sync_interval seconds after its last write.
+    """
+
+    def __init__(self, path, capacity=16 * 1024 * 1024, eviction=DROP_OLDEST,
+                 sync_every=64, sync_interval=1.0):
+        if eviction not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown eviction policy: {eviction}")
+        self.path = path
+        self.capacity = capacity
+        self.eviction = eviction
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.evicted_count = 0
+        self.rejected_count = 0
+
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._sync_timer = None
+        self._closed = False
+        self._open()
+
+    def _open(self):
+        size = HEADER_SIZE + self.capacity
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing != size:
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        magic, version, capacity, head, tail, used, count, next_seq = HEADER.unpack_from(self._mmap, 0)
+        if existing == size and magic == MAGIC and version == VERSION and capacity == self.capacity:
+            self.head, self.tail, self.used, self.count, self.next_seq = head, tail, used, count, next_seq
+        else:
+            self.head = self.tail = self.used = self.count = 0
+            self.next_seq = 1
+            self._write_header()
+            self._mmap.flush()
+
+    def _write_header(self):
+        HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, self.capacity,
+                         self.head, self.tail, self.used, self.count, self.next_seq)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, topic, payload, qos=1):
+        """Append a message, evicting per policy if the spool is full.
+
+        Returns the record's sequence number; raises SpoolFullError when the
+        message cannot be stored.
+        """
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        topic_bytes = topic.encode("utf-8")
+        size = RECORD.size + len(topic_bytes) + len(payload)
+        if size > self.capacity:
+            raise SpoolFullError(f"Message of {size} bytes exceeds spool capacity")
+
+        with self._lock:
+            offset = self._reserve(size)
+            if offset is None:
+                self.rejected_count += 1
+                raise SpoolFullError("Spool is full")
+
+            seq = self.next_seq
+            base = HEADER_SIZE + offset
+            RECORD.pack_into(self._mmap, base, size, seq, time.time(), int(qos), len(topic_bytes))
+            start = base + RECORD.size
+            self._mmap[start:start + len(topic_bytes)] = topic_bytes
+            start += len(topic_bytes)
+            self._mmap[start:start + len(payload)] = payload
+
+            self.next_seq += 1
+            self.tail = offset + size
+            self.used += size
+            self.count += 1
+            self._write_header()
+            self._maybe_sync()
+            return seq
+
+    def _reserve(self, size):
+        """Find a contiguous region of size bytes at the tail, evicting if allowed"""
+        while True:
+            if self.count == 0:
+                self.head = self.tail = self.used = 0
+            wrapped = self.count > 0 and self.tail <= self.head
+            if not wrapped:
+                if self.capacity - self.tail >= size:
+                    return self.tail
+                if self.head >= size:
+                    self._write_wrap_marker()
+                    return 0
+            elif self.head - self.tail >= size:
+                return self.tail
+
+            if self.eviction != DROP_OLDEST:
+                return None
+            self._remove_head()
+            self.evicted_count += 1
+
+    def _write_wrap_marker(self):
+        """Mark the unused end of the buffer and continue at offset 0"""
+        if self.capacity - self.tail >= 4:
+            struct.pack_into("<I", self._mmap, HEADER_SIZE + self.tail, WRAP_MARKER)
+        self.used += self.capacity - self.tail
+        self.tail = 0
+
+    def _skip_wrap(self, offset):
+        """Return the offset of the record at offset, following a wrap marker"""
+        if self.capacity - offset < RECORD.size:
+            return 0, self.capacity - offset
+        (length,) = struct.unpack_from("<I", self._mmap, HEADER_SIZE + offset)
+        if length == WRAP_MARKER:
+            return 0, self.capacity - offset
+        return offset, 0
+
+    def _remove_head(self):
+        self.head, waste = self._skip_wrap(self.head)
+        self.used -= waste
+        (length,) = struct.unpack_from("<I", self._mmap, HEADER_SIZE + self.head)
+        self.head += length
+        self.used -= length
+        self.count -= 1
+
+    def peek(self, limit=32):
+        """Return up to limit of the oldest records as (seq, topic, payload, qos)"""
+        records = []
+        with self._lock:
+            offset = self.head
+            for _ in range(min(limit, self.count)):
+                offset, _ = self._skip_wrap(offset)
+                base = HEADER_SIZE + offset
+                length, seq, _, qos, topic_len = RECORD.unpack_from(self._mmap, base)
+                start = base + RECORD.size
+                topic = self._mmap[start:start + topic_len].decode("utf-8")
+                payload = self._mmap[start + topic_len:base + length]
+                records.append((seq, topic, payload, qos))
+                offset += length
+        return records
+
+    def commit(self, up_to_seq):
+        """Remove records with sequence numbers up to and including up_to_seq"""
+        with self._lock:
+            while self.count:
+                offset, _ = self._skip_wrap(self.head)
+                (seq,) = struct.unpack_from("<Q", self._mmap, HEADER_SIZE + offset + 4)
+                if seq > up_to_seq:
+                    break
+                self._remove_head()
+            self._write_header()
+            self._maybe_sync()
+
+    def _maybe_sync(self):
+        self._unsynced += 1
+        if self._unsynced >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self._sync()
+        elif self._sync_timer is None:
+            self._sync_timer = threading.Timer(self.sync_interval, self.sync)
+            self._sync_timer.daemon = True
+            self._sync_timer.start()
+
+    def _sync(self):
+        self._mmap.flush()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+
+    def sync(self):
+        """Flush pending writes to disk"""
+        with self._lock:
+            if self._unsynced and not self._closed:
+                self._sync()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._sync()
+            self._closed = True
+            self._mmap.close()
+
+    def drain(self, submit, rate=100.0, batch_size=32, keep_going=lambda: True, ack_timeout=30.0):
+        """Republish spooled messages in order at no more than rate msgs/sec.
+
+        submit(topic, payload, qos) must return a Future. Records are removed
+        only after their publish succeeds; draining stops at the first failure,
+        or at the first publish not acknowledged within ack_timeout seconds
+        (the link dropped mid-batch). Returns the number of messages drained.
+        """
+        interval = 1.0 / rate if rate else 0.0
+        next_send = time.monotonic()
+        drained = 0
+        while keep_going():
+            records = self.peek(batch_size)
+            if not records:
+                break
+
+            futures = []
+            for seq, topic, payload, qos in records:
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_send = max(next_send + interval, time.monotonic() - interval)
+                futures.append((seq, submit(topic, payload, qos)))
+
+            last_ok = None
+            for seq, future in futures:
+                try:
+                    if future.exception(ack_timeout):
+                        break
+                except FutureTimeoutError:
+                    break
+                last_ok = seq
+                drained += 1
+
+            if last_ok is not None:
+                self.commit(last_ok)
+            if last_ok != futures[-1][0]:
+                break
+        self.sync()
+        return drained
@@ -0,0 +1,67 @@
+import json
+import math
+from array import array
+
+import pytest
+
+from aggregation import PACKED, SampleAggregator
+from payload_codecs import CODECS, decode_payload, encode_payload
+
+
+def collect(**options):
+    published = []
+    aggregator = SampleAggregator(lambda topic, message: published.append(message), "test/agg",
+                                  ["temperature", "humidity"], **options)
+    return aggregator, published
+
+
+def test_summary_window():
+    aggregator, published = collect(window=10.0)
+    aggregator.add({"temperature": 20.0, "humidity": 50.0}, timestamp=100.0)
+    aggregator.add({"temperature": 22.0}, timestamp=101.0)
+    aggregator.add({"temperature": 21.0, "humidity": 54.0}, timestamp=102.0)
+    aggregator.flush()
+    (message,) = published
+    assert (message["start"], message["end"], message["count"]) == (100.0, 102.0, 3)
+    assert message["fields"]["temperature"] == {"min": 20.0, "max": 22.0, "mean": 21.0, "last": 21.0}
+    assert message["fields"]["humidity"] == {"min": 50.0, "max": 54.0, "mean": 52.0, "last": 54.0}
+
+
+def test_window_expiry_and_max_samples_flush():
+    aggregator, published = collect(window=1.0, max_samples=3)
+    for index in range(3):
+        aggregator.add({"temperature": index}, timestamp=100.0 + index * 0.1)
+    assert len(published) == 1
+    aggregator.add({"temperature": 5}, timestamp=200.0)
+    aggregator.add({"temperature": 6}, timestamp=201.5)
+    assert [message["count"] for message in published] == [3, 1]
+
+
+def test_packed_json_sends_missing_samples_as_null():
+    aggregator, published = collect(mode=PACKED)
+    aggregator.add({"temperature": 20.0}, timestamp=100.0)
+    aggregator.add({"temperature": 21.0, "humidity": 55.0}, timestamp=100.5)
+    aggregator.flush()
+    (message,) = published
+    assert message["offsets_ms"] == [0.0, 500.0]
+    assert message["fields"] == {"temperature": [20.0, 21.0], "humidity": [None, 55.0]}
+    assert json.loads(json.dumps(message, allow_nan=False))["fields"]["humidity"] == [None, 55.0]
+
+
+def test_binary_needs_a_bytes_codec():
+    with pytest.raises(ValueError):
+        collect(mode=PACKED, binary=True)
+    with pytest.raises(ValueError):
+        collect(mode=PACKED, binary=True, codec="json+zlib")
+
+
+@pytest.mark.skipif("msgpack" not in CODECS, reason="msgpack not installed")
+def test_binary_packed_round_trip_through_msgpack():
+    aggregator, published = collect(mode=PACKED, binary=True, codec="msgpack")
+    aggregator.add({"temperature": 20.0}, timestamp=100.0)
+    aggregator.add({"temperature": 21.0, "humidity": 55.0}, timestamp=100.25)
+    aggregator.flush()
+    message = decode_payload(encode_payload(published[0], "msgpack"))
+    humidity = array("d", message["fields"]["humidity"])
+    assert math.isnan(humidity[0]) and humidity[1] == 55.0
+    assert list(array("d", message["offsets_ms"])) == [0.0, 250.0]
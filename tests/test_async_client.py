@@ -0,0 +1,61 @@
+import asyncio
+
+from awscrt import mqtt
+
+from async_client import AsyncAWSIoTClient
+from local_broker import LocalBroker
+
+
+def local_client(broker):
+    client = AsyncAWSIoTClient("localhost", "async-test", None, None, None)
+    client.mqtt_connection = broker.create_connection("async-test")
+    return client
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.005)
+
+
+def test_publish_and_subscribe():
+    broker = LocalBroker(puback_latency=0.0)
+
+    async def scenario():
+        client = local_client(broker)
+        await client.connect()
+        async with client.subscribe("test/#") as subscription:
+            results = await client.publish_many([("test/a", {"n": 1}), ("test/b", "two")])
+            assert all("packet_id" in result for result in results)
+            first = await subscription.__anext__()
+            second = await subscription.__anext__()
+        assert (first.topic, first.payload, first.qos) == ("test/a", '{"n": 1}', mqtt.QoS.AT_LEAST_ONCE)
+        assert (second.topic, second.payload) == ("test/b", "two")
+        await client.disconnect()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        broker.shutdown()
+
+
+def test_close_with_full_queue_ends_iteration():
+    broker = LocalBroker(puback_latency=0.0)
+
+    async def scenario():
+        client = local_client(broker)
+        await client.connect()
+        subscription = await client.subscribe("test/#", max_queued=2).start()
+        for index in range(5):
+            await client.publish("test/a", str(index))
+        await wait_for(lambda: subscription.dropped_count == 3)
+        await asyncio.wait_for(subscription.close(), 1)
+        received = [message.payload async for message in subscription]
+        assert received == ["4"]
+        assert subscription.dropped_count == 4
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        broker.shutdown()
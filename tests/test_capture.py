@@ -0,0 +1,145 @@
+import pytest
+
+from capture import RECORD, CaptureReader, CaptureWriter, Replayer, engine_publisher
+
+MESSAGES = [("test/a", b'{"n": %d}' % index, index % 2, index == 3, 1000.0 + index) for index in range(10)]
+
+
+def write_capture(path, messages=MESSAGES, close=True, **options):
+    writer = CaptureWriter(str(path), **options)
+    for topic, payload, qos, retain, timestamp in messages:
+        writer.record(topic, payload, qos, retain, timestamp)
+    if close:
+        writer.close()
+    return writer
+
+
+def test_records_read_back_as_written(tmp_path):
+    write_capture(tmp_path / "traffic.cap", index_every=4)
+    reader = CaptureReader(str(tmp_path / "traffic.cap"))
+    try:
+        assert [(topic, bytes(payload), qos, retain, timestamp)
+                for timestamp, topic, qos, retain, payload in reader.records()] == MESSAGES
+        assert reader.count == 10 and len(reader.index) == 3
+        assert reader.duration == 9.0
+    finally:
+        reader.close()
+
+
+def test_unclosed_capture_is_read_up_to_the_last_complete_record(tmp_path):
+    path = tmp_path / "traffic.cap"
+    writer = write_capture(path, close=False)
+    writer._file.flush()
+    with open(path, "ab") as f:
+        # Half of a record, as after a power loss
+        f.write(RECORD.pack(RECORD.size + 20, 2000.0, 1, 0, 6)[:10])
+    reader = CaptureReader(str(path))
+    try:
+        assert reader.count == 10 and reader.index == [(0, 1000.0, reader.index[0][2])]
+        assert [bytes(payload) for _, _, _, _, payload in reader.records()] == [message[1] for message in MESSAGES]
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_topic_filters_when_writing_and_reading(tmp_path):
+    messages = [("test/a", b"1", 1, False, 1.0), ("other/b", b"2", 1, False, 2.0), ("test/c", b"3", 1, False, 3.0)]
+    writer = write_capture(tmp_path / "filtered.cap", messages, topic_filter="test/#")
+    assert writer.count == 2
+    write_capture(tmp_path / "all.cap", messages)
+    reader = CaptureReader(str(tmp_path / "all.cap"))
+    try:
+        assert [topic for _, topic, _, _, _ in reader.records("+/b")] == ["other/b"]
+    finally:
+        reader.close()
+
+
+def test_start_skips_earlier_records(tmp_path):
+    write_capture(tmp_path / "traffic.cap", index_every=2)
+    reader = CaptureReader(str(tmp_path / "traffic.cap"))
+    try:
+        assert [timestamp for timestamp, _, _, _, _ in reader.records(start=4.5)] == [1005.0, 1006.0, 1007.0,
+                                                                                       1008.0, 1009.0]
+    finally:
+        reader.close()
+
+
+def test_files_that_are_not_captures_are_rejected(tmp_path):
+    path = tmp_path / "bogus.cap"
+    path.write_bytes(b"not a capture file at all")
+    with pytest.raises(ValueError):
+        CaptureReader(str(path))
+
+
+def test_replay_as_fast_as_possible_with_a_limit(tmp_path):
+    write_capture(tmp_path / "traffic.cap")
+    reader = CaptureReader(str(tmp_path / "traffic.cap"))
+    sent = []
+    try:
+        stats = Replayer(reader, lambda topic, payload, qos: sent.append((topic, bytes(payload), qos)),
+                         speed=None, limit=6).run()
+    finally:
+        reader.close()
+    assert sent == [(topic, payload, qos) for topic, payload, qos, _, _ in MESSAGES[:6]]
+    assert stats["sent"] == 6 and stats["bytes"] == sum(len(message[1]) for message in MESSAGES[:6])
+
+
+def test_replay_keeps_the_recorded_pace(tmp_path):
+    messages = [("test/a", b"x", 1, False, 100.0 + index * 0.05) for index in range(3)]
+    write_capture(tmp_path / "traffic.cap", messages)
+    reader = CaptureReader(str(tmp_path / "traffic.cap"))
+    try:
+        stats = Replayer(reader, lambda topic, payload, qos: None, speed=1.0).run()
+    finally:
+        reader.close()
+    assert stats["sent"] == 3 and stats["elapsed"] >= 0.1
+
+
+def read_all(path):
+    reader = CaptureReader(str(path))
+    try:
+        return [(topic, bytes(payload), qos, retain, timestamp)
+                for timestamp, topic, qos, retain, payload in reader.records()], reader.count
+    finally:
+        reader.close()
+
+
+@pytest.mark.parametrize("closed", [True, False])
+def test_recording_again_appends_to_the_capture(tmp_path, closed):
+    path = tmp_path / "traffic.cap"
+    first = write_capture(path, MESSAGES[:6], close=closed, index_every=4)
+    if not closed:
+        # Stop writing without an index, as after a power loss
+        first._file.close()
+        first._file = None
+    write_capture(path, MESSAGES[6:], index_every=4)
+    assert read_all(path) == (MESSAGES, 10)
+
+
+def test_overwrite_starts_afresh(tmp_path):
+    path = tmp_path / "traffic.cap"
+    write_capture(path)
+    write_capture(path, MESSAGES[:2], overwrite=True)
+    assert read_all(path) == (MESSAGES[:2], 2)
+
+
+def test_refuses_to_append_to_other_files(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"not a capture file at all")
+    with pytest.raises(ValueError):
+        CaptureWriter(str(path))
+    assert path.read_bytes() == b"not a capture file at all"
+
+
+def test_engine_replay_warns_once_about_qos(caplog):
+    published = []
+
+    class Engine:
+        def publish_async(self, topic, payload):
+            published.append(topic)
+
+    publish = engine_publisher(Engine())
+    for qos in (1, 0, 0):
+        publish("test/a", b"x", qos)
+    assert published == ["test/a"] * 3
+    assert caplog.text.count("QoS 1") == 1
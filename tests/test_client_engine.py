@@ -0,0 +1,144 @@
+import json
+import time
+
+import pytest
+
+import tls_context
+from client_engine import MQTTClientEngine, format_payload, load_config
+from local_broker import LocalBroker
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = LocalBroker(puback_latency=0.0)
+
+    def local_connection(endpoint, client_id, on_connection_interrupted, on_connection_resumed, **kwargs):
+        return broker.create_connection(client_id, on_connection_interrupted=on_connection_interrupted,
+                                        on_connection_resumed=on_connection_resumed)
+
+    monkeypatch.setattr(tls_context, "mtls_from_path", local_connection)
+    yield broker
+    broker.shutdown()
+
+
+def engine(**options):
+    return MQTTClientEngine("localhost", "engine-test", "cert.pem", "key.pem", **options)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_load_config_layers_file_and_overrides(tmp_path, monkeypatch):
+    path = tmp_path / "device.json"
+    path.write_text(json.dumps({"client_id": "from-file", "endpoint": "file.example"}))
+    monkeypatch.setenv("MQTT_PUBLISHER_CONFIG", str(path))
+    config = load_config(endpoint="override.example")
+    assert (config["client_id"], config["endpoint"]) == ("from-file", "override.example")
+    assert "cert_path" in config
+
+
+def test_format_payload():
+    assert format_payload(b'{"a": 1}') == '{\n  "a": 1\n}'
+    assert format_payload(b"plain") == "plain"
+
+
+def test_publish_subscribe_and_local_dispatch(broker):
+    received = []
+    client = engine(on_message=lambda topic, **kwargs: received.append(("default", topic)))
+    client.add_handler("test/dc/+/temp", lambda topic, message, **kwargs: received.append((topic, message.data)))
+    listener_calls = []
+    client.connection_listeners.append(listener_calls.append)
+    try:
+        assert client.connect(max_attempts=1)
+        assert client.subscribe("test/dc/#")
+        assert client.subscribed_topics == ["test/dc/#"]
+        client.publish_async("test/dc/1/temp", {"value": 21.5}).result(timeout=2)
+        client.publish_async("test/dc/1/humidity", "60").result(timeout=2)
+        wait_for(lambda: len(received) == 2)
+        assert received == [("test/dc/1/temp", {"value": 21.5}), ("default", "test/dc/1/humidity")]
+    finally:
+        client.disconnect()
+    assert listener_calls == [True, False]
+
+
+def test_spools_while_disconnected_and_drains_on_connect(broker, tmp_path):
+    client = engine(spool_path=str(tmp_path / "spool.bin"), drain_rate=None)
+    delivered = []
+    subscriber = broker.create_connection("subscriber")
+    subscriber.connect()
+    subscriber.subscribe("test/#", 1, callback=lambda topic, payload, **kwargs: delivered.append(payload))
+    try:
+        assert client.publish_async("test/a", "offline 1").result()["spooled"]
+        assert client.publish_async("test/a", "offline 2").result()["spooled"]
+        assert client.connect(max_attempts=1)
+        wait_for(lambda: len(client.spool) == 0)
+        client.publish_async("test/a", "online").result(timeout=2)
+        wait_for(lambda: len(delivered) == 3)
+        assert [payload if isinstance(payload, str) else bytes(payload).decode() for payload in delivered] == \
+            ["offline 1", "offline 2", "online"]
+    finally:
+        client.disconnect()
+
+
+def test_publish_without_connection_or_spool_fails():
+    client = engine()
+    assert not client.publish("test/a", "x")
+    with pytest.raises(ConnectionError):
+        client.publish_async("test/a", "x")
+
+
+def test_disconnect_spools_publishes_before_stopping_the_queue(broker, tmp_path):
+    client = engine(spool_path=str(tmp_path / "spool.bin"))
+    assert client.connect(max_attempts=1)
+    queue = client.publish_queue
+    stop = queue.stop
+    spooled_during_stop = []
+
+    def stop_and_publish(*args, **kwargs):
+        spooled_during_stop.append(client.publish_async("test/a", "late").result()["spooled"])
+        stop(*args, **kwargs)
+
+    queue.stop = stop_and_publish
+    client.disconnect()
+    assert spooled_during_stop == [True] and len(client.spool) == 1
+    with pytest.raises(RuntimeError):
+        client._submit("test/a", b"x", None)
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_failed_drain_can_run_again_after_reconnect(broker, tmp_path):
+    client = engine(spool_path=str(tmp_path / "spool.bin"), drain_rate=None)
+    client.publish_async("test/a", "offline")
+    submit = client._submit
+
+    def broken_submit(*args):
+        raise ValueError("unexpected")
+
+    client._submit = broken_submit
+    try:
+        assert client.connect(max_attempts=1)
+        wait_for(lambda: not client._draining)
+        assert len(client.spool) == 1
+        client._submit = submit
+        client.disconnect()
+        assert client.connect(max_attempts=1)
+        wait_for(lambda: len(client.spool) == 0)
+    finally:
+        client.disconnect()
+
+
+def test_connect_again_replaces_the_previous_reconnect_manager(broker):
+    client = engine()
+    try:
+        assert client.connect(max_attempts=1)
+        first = client.reconnect
+        assert client.connect(max_attempts=1) and client.reconnect is first
+        client.is_connected = False
+        assert client.connect(max_attempts=1)
+        assert first._stopped.is_set() and client.reconnect is not first
+    finally:
+        client.disconnect()
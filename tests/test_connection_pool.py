@@ -0,0 +1,68 @@
+from awscrt import mqtt
+
+from connection_pool import ConnectionPool
+from local_broker import LocalBroker
+
+
+def local_pool(broker, **options):
+    def factory(client_id, on_connection_interrupted, on_connection_resumed):
+        return broker.create_connection(client_id, on_connection_interrupted=on_connection_interrupted,
+                                        on_connection_resumed=on_connection_resumed)
+    return ConnectionPool("localhost", "pool", None, None, None, connection_factory=factory, **options)
+
+
+def test_topics_stay_on_one_member_and_keep_order():
+    broker = LocalBroker(puback_latency=0.0)
+    pool = local_pool(broker, size=3)
+    try:
+        assert pool.connect(timeout=5) == 3
+        topics = [f"test/sensor-{index}" for index in range(12)]
+        assert {topic: pool.shard_for(topic).index for topic in topics} == \
+            {topic: pool.shard_for(topic).index for topic in topics}
+        received = {}
+        for member in pool.connections:
+            member.mqtt_connection.subscribe(
+                "test/#", mqtt.QoS.AT_LEAST_ONCE,
+                callback=lambda topic, payload, **kwargs: received.setdefault(topic, []).append(payload))
+        for sequence in range(5):
+            for topic in topics:
+                pool.publish(topic, b"%d" % sequence)
+        assert pool.flush(timeout=5)
+        # Every member subscribed, so each message arrives three times, in order
+        assert all(payloads == [b"%d" % s for s in range(5) for _ in range(3)] for payloads in received.values())
+        assert sum(member.stats()["acked"] for member in pool.connections) == 60
+    finally:
+        pool.disconnect()
+        broker.shutdown()
+
+
+def test_explicit_qos_0_reaches_the_broker():
+    broker = LocalBroker(puback_latency=0.0)
+    pool = local_pool(broker, size=2)
+    try:
+        pool.connect(timeout=5)
+        levels = []
+        member = pool.shard_for("test/a")
+        member.mqtt_connection.subscribe("test/a", mqtt.QoS.AT_LEAST_ONCE,
+                                         callback=lambda topic, payload, qos, **kwargs: levels.append(qos))
+        pool.publish("test/a", b"x", qos=mqtt.QoS.AT_MOST_ONCE).result(timeout=5)
+        assert levels == [mqtt.QoS.AT_MOST_ONCE]
+    finally:
+        pool.disconnect()
+        broker.shutdown()
+
+
+def test_failover_moves_topics_off_an_unhealthy_member():
+    broker = LocalBroker(puback_latency=0.0)
+    pool = local_pool(broker, size=2, failover=True)
+    try:
+        pool.connect(timeout=5)
+        topic = "test/a"
+        owner = pool.shard_for(topic)
+        owner.mqtt_connection.interrupt()
+        assert not owner.is_connected
+        assert pool.shard_for(topic) is not owner
+        pool.publish(topic, b"x").result(timeout=5)
+    finally:
+        pool.disconnect()
+        broker.shutdown()
@@ -0,0 +1,72 @@
+import pytest
+
+from dedup import BloomFilter, DuplicateFilter
+
+PAYLOAD = b'{"temperature": 21.5}'
+
+
+def test_bloom_filter_reports_what_it_has_seen():
+    bloom = BloomFilter(1000)
+    digests = [bytes([index]) * 16 for index in range(100)]
+    assert not any(bloom.add(digest) for digest in digests)
+    assert all(digest in bloom for digest in digests)
+    assert bloom.add(digests[0]) and bloom.count == 100
+    assert bytes([200]) * 16 not in bloom
+
+
+def test_flagged_redelivery_is_dropped():
+    dedup = DuplicateFilter()
+    assert not dedup.is_duplicate("test/a", PAYLOAD)
+    assert dedup.is_duplicate("test/a", PAYLOAD, dup=True)
+    assert dedup.stats()["duplicates"] == 1 and dedup.stats()["flagged_dup"] == 1
+
+
+def test_identical_payloads_without_the_dup_flag_are_kept():
+    dedup = DuplicateFilter()
+    assert [dedup.is_duplicate("test/a", PAYLOAD) for _ in range(3)] == [False, False, False]
+    assert dedup.duplicate_count == 0
+    # A redelivery of them is still caught
+    assert dedup.is_duplicate("test/a", PAYLOAD, dup=True)
+
+
+def test_dup_flag_on_an_unseen_message_lets_it_through():
+    dedup = DuplicateFilter()
+    assert not dedup.is_duplicate("test/a", PAYLOAD, dup=True)
+
+
+def test_topic_is_part_of_the_identity():
+    dedup = DuplicateFilter()
+    dedup.is_duplicate("test/a", PAYLOAD)
+    assert not dedup.is_duplicate("test/b", PAYLOAD, dup=True)
+
+
+def test_seen_sequence_numbers_are_dropped_without_the_dup_flag():
+    dedup = DuplicateFilter(sequence_field="_seq")
+    assert not dedup.is_duplicate("test/a", b'{"_seq": 1, "t": 20}')
+    assert dedup.is_duplicate("test/a", b'{"_seq": 1, "t": 21}')
+    assert not dedup.is_duplicate("test/a", b'{"_seq": 2, "t": 21}')
+    # Messages without the field fall back to the payload and the dup flag
+    assert not dedup.is_duplicate("test/a", PAYLOAD)
+    assert not dedup.is_duplicate("test/a", PAYLOAD)
+
+
+@pytest.mark.parametrize("drop_probable", [True, False])
+def test_redeliveries_evicted_from_the_lru_are_probable(drop_probable):
+    dedup = DuplicateFilter(capacity=2, drop_probable=drop_probable)
+    for index in range(5):
+        dedup.is_duplicate("test/a", b"%d" % index)
+    assert dedup.is_duplicate("test/a", b"0", dup=True) is drop_probable
+    assert dedup.probable_count == 1
+    assert dedup.duplicate_count == (1 if drop_probable else 0)
+
+
+def test_identities_expire_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("dedup.time.monotonic", lambda: clock[0])
+    dedup = DuplicateFilter(ttl=10.0)
+    dedup.is_duplicate("test/a", PAYLOAD)
+    clock[0] += 11
+    dedup.is_duplicate("test/a", b"other")
+    clock[0] += 11
+    assert not dedup.is_duplicate("test/a", PAYLOAD, dup=True)
+    assert dedup.stats()["recent"] == 1
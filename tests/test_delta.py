@@ -0,0 +1,93 @@
+import copy
+
+from delta import KEYFRAME_FIELD, REMOVED_FIELD, SEQ_FIELD, DeltaPublisher, DeltaState
+
+
+def make_publisher(**options):
+    sent = []
+    publisher = DeltaPublisher(lambda topic, message: sent.append((topic, message)) or len(sent), **options)
+    return publisher, sent
+
+
+def test_first_message_is_a_keyframe_then_only_changes_go_out():
+    publisher, sent = make_publisher(keyframe_every=0, keyframe_interval=0)
+    publisher.send("test/a", {"timestamp": 1, "data": {"temperature": 20.0, "humidity": 40}})
+    publisher.send("test/a", {"timestamp": 2, "data": {"temperature": 21.0, "humidity": 40}})
+    assert publisher.send("test/a", {"timestamp": 3, "data": {"temperature": 21.0, "humidity": 40}}) is None
+
+    keyframe, delta = sent[0][1], sent[1][1]
+    assert keyframe[KEYFRAME_FIELD] is True and keyframe[SEQ_FIELD] == 1
+    assert delta == {"timestamp": 2, "data": {"temperature": 21.0}, SEQ_FIELD: 2}
+    assert publisher.stats() == {"offered": 3, "sent": 2, "keyframes": 1, "suppressed": 1}
+
+
+def test_deadband_suppresses_small_moves_until_drift_adds_up():
+    publisher, sent = make_publisher(deadbands={"temperature": 0.5}, keyframe_every=0, keyframe_interval=0)
+    for temperature in (20.0, 20.2, 20.4, 20.6):
+        publisher.send("test/a", {"data": {"temperature": temperature}})
+    assert [message["data"]["temperature"] for _, message in sent] == [20.0, 20.6]
+
+
+def test_dotted_deadband_takes_precedence_over_the_leaf_name():
+    publisher, sent = make_publisher(deadbands={"temperature": 10, "outside.temperature": 0},
+                                     keyframe_every=0, keyframe_interval=0)
+    publisher.send("test/a", {"inside": {"temperature": 20}, "outside": {"temperature": 5}})
+    publisher.send("test/a", {"inside": {"temperature": 25}, "outside": {"temperature": 6}})
+    assert sent[1][1] == {"outside": {"temperature": 6}, SEQ_FIELD: 2}
+
+
+def test_removed_fields_are_listed():
+    publisher, sent = make_publisher(keyframe_every=0, keyframe_interval=0)
+    publisher.send("test/a", {"data": {"a": 1, "b": 2}})
+    publisher.send("test/a", {"data": {"a": 1}})
+    assert sent[1][1] == {REMOVED_FIELD: ["data.b"], SEQ_FIELD: 2}
+
+
+def test_keyframes_repeat_every_n_messages_and_on_demand():
+    publisher, sent = make_publisher(keyframe_every=3, keyframe_interval=0)
+    for value in range(7):
+        publisher.send("test/a", {"value": value})
+    assert [bool(message.get(KEYFRAME_FIELD)) for _, message in sent] == [True, False, False, True, False, False, True]
+    assert [message[SEQ_FIELD] for _, message in sent] == list(range(1, 8))
+
+    publisher.force_keyframe("test/a")
+    publisher.send("test/a", {"value": 7})
+    assert sent[-1][1][KEYFRAME_FIELD] is True
+
+
+def test_state_rebuilds_documents_from_deltas():
+    publisher, sent = make_publisher(keyframe_every=0, keyframe_interval=0)
+    documents = [
+        {"timestamp": 1, "data": {"temperature": 20, "door": "open"}},
+        {"timestamp": 2, "data": {"temperature": 21, "door": "open"}},
+        {"timestamp": 3, "data": {"temperature": 21}},
+    ]
+    for document in documents:
+        publisher.send("test/a", document)
+    state = DeltaState()
+    # Each message is copied as if it had crossed the wire
+    rebuilt = [copy.deepcopy(state.apply(topic, copy.deepcopy(message))) for topic, message in sent]
+    assert rebuilt == documents
+
+
+def test_state_drops_duplicates_and_resyncs_after_a_gap():
+    publisher, sent = make_publisher(keyframe_every=4, keyframe_interval=0)
+    for value in range(5):
+        publisher.send("test/a", {"value": value})
+    messages = [message for _, message in sent]
+    state = DeltaState()
+
+    assert state.apply("test/a", messages[0]) == {"value": 0}
+    assert state.apply("test/a", messages[1]) == {"value": 1}
+    assert state.apply("test/a", messages[1]) is None
+    # messages[2] is lost: nothing is applied until the next keyframe
+    assert state.apply("test/a", messages[3]) is None
+    assert state.resync_count == 1
+    assert messages[4][KEYFRAME_FIELD] is True
+    assert state.apply("test/a", messages[4]) == {"value": 4}
+
+
+def test_messages_without_a_sequence_number_pass_through():
+    state = DeltaState()
+    message = {"value": 1}
+    assert state.apply("test/a", message) is message
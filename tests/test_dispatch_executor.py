@@ -0,0 +1,104 @@
+import threading
+import time
+
+from dispatch_executor import DispatchExecutor
+
+
+def square(value):
+    return value * value
+
+
+def test_per_key_order_is_kept():
+    executor = DispatchExecutor(workers=4)
+    executor.start()
+    seen = {}
+    lock = threading.Lock()
+
+    def handle(topic, sequence):
+        with lock:
+            seen.setdefault(topic, []).append(sequence)
+
+    try:
+        for sequence in range(200):
+            for topic in ("a", "b", "c"):
+                assert executor.submit(topic, handle, topic, sequence)
+        executor.flush()
+    finally:
+        executor.stop()
+    assert seen == {topic: list(range(200)) for topic in ("a", "b", "c")}
+    assert executor.handled_count == 600 and executor.error_count == 0
+
+
+def test_handler_errors_are_counted_and_callbacks_get_results():
+    executor = DispatchExecutor(workers=1)
+    executor.start()
+    results = []
+    try:
+        executor.submit("k", square, 7, callback=results.append)
+        executor.submit("k", square, None)
+        executor.flush()
+    finally:
+        executor.stop()
+    assert results == [49] and executor.error_count == 1
+
+
+def test_full_lane_drops_after_block_timeout():
+    executor = DispatchExecutor(workers=1, max_queued=1, block_timeout=0.01)
+    executor.start()
+    release = threading.Event()
+    try:
+        executor.submit("k", release.wait)
+        time.sleep(0.05)
+        assert executor.submit("k", square, 1)
+        assert not executor.submit("k", square, 2)
+        assert executor.dropped_count == 1
+    finally:
+        release.set()
+        executor.stop()
+
+
+def test_submit_after_stop_is_dropped_not_raised():
+    executor = DispatchExecutor(workers=2)
+    assert not executor.submit("k", square, 1)
+    executor.start()
+    executor.stop()
+    assert not executor.submit("k", square, 2)
+    assert executor.dropped_count == 2
+    executor.flush()
+
+
+def test_submits_racing_stop_never_hang_flush():
+    for _ in range(20):
+        executor = DispatchExecutor(workers=2, max_queued=10)
+        executor.start()
+        running = threading.Event()
+
+        def submitter():
+            running.set()
+            for index in range(500):
+                executor.submit(index, square, index)
+
+        thread = threading.Thread(target=submitter)
+        thread.start()
+        running.wait()
+        executor.stop()
+        thread.join(2)
+        assert not thread.is_alive()
+        assert executor.submitted_count == executor.handled_count
+        assert executor.submitted_count + executor.dropped_count == 500
+
+
+def test_wrap_runs_handlers_in_worker_processes():
+    executor = DispatchExecutor(workers=1, processes=True)
+    executor.start()
+    results = []
+    try:
+        executor.wrap(process_handler, on_result=results.append)("test/a", memoryview(b"abc"), False, 1, False)
+        executor.flush()
+    finally:
+        executor.stop()
+    assert results == [("test/a", b"abc")]
+
+
+def process_handler(topic, payload, dup, qos, retain):
+    return topic, payload
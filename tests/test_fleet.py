@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+from awscrt import mqtt
+
+from fleet import FleetSimulator, RampProfile, crt_connection_factory
+from local_broker import LocalBroker, MQTTTestBroker
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_ramp_profiles():
+    assert [RampProfile().offset(index) for index in range(3)] == [0.0, 0.0, 0.0]
+    assert [RampProfile("linear:4").offset(index) for index in range(3)] == [0.0, 0.25, 0.5]
+    assert [RampProfile("step:2:1.5").offset(index) for index in range(5)] == [0.0, 0.0, 1.5, 1.5, 3.0]
+
+
+@pytest.mark.parametrize("spec", ["linear", "linear:0", "step:0:1", "step:2", "instant:1", "burst:5"])
+def test_bad_ramp_profiles_are_rejected(spec):
+    with pytest.raises(ValueError):
+        RampProfile(spec)
+
+
+def test_devices_get_their_own_ids_and_topics():
+    fleet = FleetSimulator(lambda **kwargs: None, devices=12, client_id_prefix="dev", topic_prefix="site")
+    assert fleet.devices[0].client_id == "dev-00" and fleet.devices[11].client_id == "dev-11"
+    assert fleet.devices[3].topic == "site/dev-03/telemetry"
+
+
+def test_fleet_connects_and_publishes_against_the_local_broker():
+    broker = LocalBroker(puback_latency=0.0)
+    fleet = FleetSimulator(broker.create_connection, devices=20, interval=0.05, ramp="linear:400",
+                           max_connecting=5, seed=1)
+    fleet.start()
+    try:
+        assert wait_for(lambda: fleet.stats()["connected"] == 20)
+        assert wait_for(lambda: all(device.acked >= 2 for device in fleet.devices))
+    finally:
+        fleet.stop()
+        broker.shutdown()
+    stats = fleet.stats()
+    assert stats["connect_failed"] == 0 and stats["failed"] == 0
+    assert stats["connected"] == 0 and stats["acked"] >= 40
+    assert {device.client_id for device in fleet.devices} == {connection.client_id for connection in broker.connections}
+
+
+def test_connect_failures_are_counted():
+    def refuse(**kwargs):
+        raise ConnectionRefusedError("no broker")
+    fleet = FleetSimulator(refuse, devices=3)
+    fleet.start()
+    try:
+        assert wait_for(lambda: fleet.connect_failed_count == 3)
+    finally:
+        fleet.stop()
+
+
+def test_crt_connection_factory_against_the_test_broker():
+    broker = MQTTTestBroker()
+    factory = crt_connection_factory("127.0.0.1", broker.start(), event_loop_threads=1)
+    fleet = FleetSimulator(factory, devices=3, interval=0.05, qos=mqtt.QoS.AT_LEAST_ONCE)
+    fleet.start()
+    try:
+        assert wait_for(lambda: all(device.acked >= 1 for device in fleet.devices), timeout=10)
+    finally:
+        fleet.stop()
+        broker.stop()
+    assert fleet.stats()["puback_p50_ms"] > 0
+
+
+class StalledConnection:
+    """A connection whose CONNECT is never answered"""
+
+    def connect(self):
+        return Future()
+
+    def disconnect(self):
+        future = Future()
+        future.set_result({})
+        return future
+
+
+def test_stop_does_not_wait_out_stalled_connects():
+    fleet = FleetSimulator(lambda **kwargs: StalledConnection(), devices=5, max_connecting=1)
+    fleet.start()
+    wait_for(lambda: fleet.devices[0].connection is not None)
+    started = time.monotonic()
+    fleet.stop(timeout=5.0)
+    assert time.monotonic() - started < 1.0
+    assert fleet.devices[1].connection is None
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.payloads = []
+
+    def publish(self, topic, payload, qos):
+        self.payloads.append(payload)
+        future = Future()
+        future.set_result({})
+        return future, 1
+
+
+def simulated_payloads(seed):
+    fleet = FleetSimulator(lambda **kwargs: None, devices=2, seed=seed)
+    readings = []
+    for device in fleet.devices:
+        device.connection = RecordingConnection()
+        device.connected = True
+        for _ in range(3):
+            device.publish()
+        readings.extend(payload.rsplit(b'"temperature":', 1)[1] for payload in device.connection.payloads)
+    return readings
+
+
+def test_seeded_fleets_simulate_the_same_readings():
+    assert simulated_payloads(5) == simulated_payloads(5)
+    assert simulated_payloads(5) != simulated_payloads(6)
+
+
+def test_stats_before_start():
+    stats = FleetSimulator(lambda **kwargs: None, devices=1).stats()
+    assert stats["elapsed"] == 0.0 and stats["publish_rate"] == 0.0
@@ -0,0 +1,53 @@
+from collections import deque
+
+from mqtt_publisher_gui import MQTTPublisherGUI
+
+
+class FakeText:
+    """The part of a Tk Text widget the receive display uses, one entry per line"""
+
+    def __init__(self):
+        self.lines = []
+
+    def insert(self, index, text):
+        self.lines.extend(text.splitlines())
+
+    def delete(self, start, end):
+        keep = int(end.split("-")[1].split()[0]) - 1
+        del self.lines[:-keep]
+
+    def see(self, index):
+        pass
+
+
+def receiving_gui(buffer_size=4, max_lines=20):
+    gui = MQTTPublisherGUI.__new__(MQTTPublisherGUI)
+    gui.receive_buffer_size = buffer_size
+    gui.received_max_lines = max_lines
+    gui.received_buffer = deque(maxlen=buffer_size)
+    gui.received_count = 0
+    gui.received_dropped = 0
+    gui.received_text = FakeText()
+    return gui
+
+
+def test_buffer_keeps_the_newest_messages():
+    gui = receiving_gui(buffer_size=4)
+    for index in range(6):
+        gui.on_message_received(f"test/{index}", b'{"n": %d}' % index, False, 1, False, content_type=None)
+    assert gui.received_count == 6 and gui.received_dropped == 2
+    assert [topic for _, topic, _, _ in gui.received_buffer] == ["test/2", "test/3", "test/4", "test/5"]
+
+
+def test_batch_draws_only_what_fits():
+    gui = receiving_gui(buffer_size=100, max_lines=10)
+    batch = [(1760000000.0, f"test/{index}", b'{"n": %d}' % index, None) for index in range(20)]
+    gui._update_received_display(batch)
+    text = "\n".join(gui.received_text.lines)
+    assert "Topic: test/19" in text and "Topic: test/0\n" not in text
+    assert len(gui.received_text.lines) <= 10
+
+
+def test_undecodable_payload_is_shown_not_raised():
+    gui = receiving_gui()
+    assert "undecodable payload" in gui._format_received(1760000000.0, "test/bin", b"\x00\xfe\xff")
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from mqtt_publisher_gui import MQTTPublisherGUI
+
+
+class FakeVar:
+    def __init__(self, value=""):
+        self.value = value
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class FakeButton:
+    def __init__(self):
+        self.state = "disabled"
+
+    def config(self, state):
+        self.state = state
+
+
+class FakeRoot:
+    """Runs after() callbacks when the test calls run()"""
+
+    def __init__(self):
+        self.pending = []
+
+    def after(self, delay, callback):
+        self.pending.append(callback)
+
+    def run(self):
+        pending, self.pending = self.pending, []
+        for callback in pending:
+            callback()
+
+
+class FakeClient:
+    def __init__(self, connect_result):
+        self.connect_result = connect_result
+        self.is_connected = False
+        self.subscribed_topics = []
+        self.reconnect = None
+        self.released = threading.Event()
+
+    def connect(self):
+        self.released.wait(5)
+        self.is_connected = self.connect_result
+        return self.connect_result
+
+
+def status_gui(connect_result):
+    gui = MQTTPublisherGUI.__new__(MQTTPublisherGUI)
+    gui.client = FakeClient(connect_result)
+    gui.root = FakeRoot()
+    gui.status_var = FakeVar("🔄 Connecting...")
+    gui.publish_btn, gui.auto_publish_btn = FakeButton(), FakeButton()
+    gui.subscribe_btn, gui.unsubscribe_btn = FakeButton(), FakeButton()
+    gui._subscribe_to_topic = lambda topic: None
+    gui._gui_ready = threading.Event()
+    gui.connecting = False
+    return gui
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def connect_in_background(gui):
+    gui.auto_connect()
+    gui.client.released.set()
+    wait_for(lambda: not gui.connecting)
+
+
+def test_failed_connect_before_the_window_is_shown():
+    gui = status_gui(connect_result=False)
+    connect_in_background(gui)
+    gui._on_gui_ready()
+    assert gui.status_var.get() == "❌ Disconnected"
+    assert gui.publish_btn.state == "disabled"
+
+
+def test_failed_connect_after_the_window_is_shown():
+    gui = status_gui(connect_result=False)
+    gui.auto_connect()
+    gui._on_gui_ready()
+    assert gui.status_var.get() == "🔄 Connecting..."
+    gui.client.released.set()
+    wait_for(lambda: not gui.connecting and gui.root.pending)
+    gui.root.run()
+    assert gui.status_var.get() == "❌ Disconnected"
+
+
+def test_connected_before_the_window_is_shown():
+    gui = status_gui(connect_result=True)
+    connect_in_background(gui)
+    gui._on_gui_ready()
+    assert gui.status_var.get() == "✅ Connected"
+    assert gui.publish_btn.state == "normal" and gui.unsubscribe_btn.state == "disabled"
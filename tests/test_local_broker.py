@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+from awscrt import io, mqtt
+
+from local_broker import LocalBroker, MQTTTestBroker
+
+
+@pytest.fixture
+def test_broker():
+    broker = MQTTTestBroker()
+    port = broker.start()
+    yield broker, port
+    broker.stop()
+
+
+def crt_connection(port, client_id, clean_session=True):
+    return mqtt.Connection(
+        client=mqtt.Client(io.ClientBootstrap.get_or_create_static_default(), None),
+        host_name="127.0.0.1", port=port, client_id=client_id,
+        clean_session=clean_session, keep_alive_secs=30)
+
+
+def test_publish_reaches_wildcard_subscriber(test_broker):
+    _, port = test_broker
+    subscriber = crt_connection(port, "subscriber")
+    publisher = crt_connection(port, "publisher")
+    subscriber.connect().result(timeout=5)
+    publisher.connect().result(timeout=5)
+    received = []
+    done = threading.Event()
+
+    def on_message(topic, payload, **kwargs):
+        received.append((topic, payload))
+        if len(received) == 3:
+            done.set()
+
+    future, _ = subscriber.subscribe("test/+/temp", mqtt.QoS.AT_LEAST_ONCE, callback=on_message)
+    assert future.result(timeout=5)["qos"] == mqtt.QoS.AT_LEAST_ONCE
+    for index in range(3):
+        publisher.publish(f"test/{index}/temp", b"%d" % index, mqtt.QoS.AT_LEAST_ONCE)[0].result(timeout=5)
+    publisher.publish("test/0/humidity", b"ignored", mqtt.QoS.AT_LEAST_ONCE)[0].result(timeout=5)
+    assert done.wait(5)
+    assert received == [(f"test/{index}/temp", b"%d" % index) for index in range(3)]
+    subscriber.disconnect().result(timeout=5)
+    publisher.disconnect().result(timeout=5)
+
+
+def test_persistent_session_gets_messages_sent_while_away(test_broker):
+    _, port = test_broker
+    received = []
+    got = threading.Event()
+
+    def on_message(topic, payload, **kwargs):
+        received.append(payload)
+        got.set()
+
+    subscriber = crt_connection(port, "persistent", clean_session=False)
+    subscriber.connect().result(timeout=5)
+    subscriber.subscribe("test/queued", mqtt.QoS.AT_LEAST_ONCE, callback=on_message)[0].result(timeout=5)
+    subscriber.disconnect().result(timeout=5)
+
+    publisher = crt_connection(port, "publisher")
+    publisher.connect().result(timeout=5)
+    publisher.publish("test/queued", b"while away", mqtt.QoS.AT_LEAST_ONCE)[0].result(timeout=5)
+    publisher.disconnect().result(timeout=5)
+
+    subscriber = crt_connection(port, "persistent", clean_session=False)
+    subscriber.on_message(on_message)
+    assert subscriber.connect().result(timeout=5)["session_present"]
+    assert got.wait(5)
+    assert received == [b"while away"]
+    subscriber.disconnect().result(timeout=5)
+
+
+def test_local_broker_throttles_over_the_rate():
+    broker = LocalBroker(puback_latency=0.0, max_rate_per_connection=10, throttle_backlog=0.15)
+    connection = broker.create_connection()
+    connection.connect()
+    futures = [connection.publish("test/a", b"x", mqtt.QoS.AT_LEAST_ONCE)[0] for _ in range(5)]
+    errors = [future.exception(timeout=2) for future in futures]
+    broker.shutdown()
+    assert errors[0] is None
+    assert broker.throttled_count == 4 and sum(error is not None for error in errors) == broker.throttled_count
@@ -0,0 +1,59 @@
+import logging
+
+import pytest
+
+from logging_setup import MESSAGE_LOGGER, DequeHandler, set_message_level, setup_logging
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    set_message_level(logging.NOTSET)
+
+
+def test_deque_handler_keeps_the_newest_lines():
+    handler = DequeHandler(maxlen=2)
+    logger = logging.getLogger("test.deque")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        for index in range(3):
+            logger.warning("line %d", index)
+    finally:
+        logger.removeHandler(handler)
+    lines = handler.drain()
+    assert [line.split("] ")[1] for line in lines] == ["line 1", "line 2"]
+    assert handler.drain() == []
+
+
+def test_records_reach_file_and_ui_through_the_listener(tmp_path, restore_logging):
+    ui = DequeHandler()
+    log_file = tmp_path / "publisher.log"
+    listener = setup_logging(logging.INFO, message_level=logging.WARNING, log_file=str(log_file),
+                             max_bytes=200, backup_count=2, console=False, handlers=[ui])
+    try:
+        logging.getLogger("test.events").info("✅ connected")
+        logging.getLogger(MESSAGE_LOGGER).info("📨 per-message line")
+        for index in range(20):
+            logging.getLogger("test.events").info("filler %02d", index)
+    finally:
+        listener.stop()
+    lines = ui.drain()
+    assert any(line.endswith("✅ connected") for line in lines)
+    assert not any("per-message" in line for line in lines)
+    assert "filler 19" in log_file.read_text(encoding="utf-8")
+    assert (tmp_path / "publisher.log.1").exists() and not (tmp_path / "publisher.log.3").exists()
+
+
+def test_unwritable_log_file_is_skipped(tmp_path, restore_logging):
+    ui = DequeHandler()
+    listener = setup_logging(log_file=str(tmp_path / "missing" / "publisher.log"), console=False, handlers=[ui])
+    listener.stop()
+    assert any("File logging disabled" in line for line in ui.drain())
@@ -0,0 +1,59 @@
+import json
+import urllib.request
+
+import pytest
+
+from metrics import OTHER_TOPIC, LatencyHistogram, PublishMetrics, serve_metrics
+
+
+def test_histogram_percentiles_within_bucket_precision():
+    histogram = LatencyHistogram()
+    for micros in range(1, 10001):
+        histogram.record(micros / 1e6)
+    assert histogram.percentile(50) == pytest.approx(0.005, rel=0.07)
+    assert histogram.percentile(99) == pytest.approx(0.0099, rel=0.07)
+    assert histogram.percentile(100) <= histogram.max == 0.01
+    merged = LatencyHistogram()
+    merged.merge(histogram)
+    assert merged.summary() == histogram.summary()
+
+
+def test_topics_beyond_the_limit_fold_into_other():
+    metrics = PublishMetrics(max_topics=2)
+    for topic in ("a", "b", "c", "d"):
+        metrics.record_sent(topic, None, 0.0)
+    assert sorted(metrics.topics) == [OTHER_TOPIC, "a", "b"]
+    assert metrics.snapshot()["topics"][OTHER_TOPIC]["published"] == 2
+
+
+def test_prometheus_families_are_contiguous():
+    metrics = PublishMetrics()
+    for topic in ("test/a", "test/b"):
+        metrics.record_sent(topic, 0.0, 0.001)
+        metrics.record_ack(topic, 0.0, 0.001, 0.004)
+    metrics.record_failure("test/b")
+    metrics.set_gauge("queue_depth", lambda: 3)
+    text = metrics.to_prometheus()
+
+    families = []
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            families.append(line.split()[2])
+            continue
+        name = line.split("{")[0].split()[0]
+        assert name == families[-1] or name.startswith(families[-1] + "_"), line
+    assert len(families) == len(set(families))
+    assert 'mqtt_publish_failed_total{topic="test/b"} 1' in text
+    assert "mqtt_queue_depth 3" in text
+
+
+def test_metrics_endpoint_serves_both_formats():
+    metrics = PublishMetrics()
+    metrics.record_sent("test/a", None, 0.0)
+    server = serve_metrics(metrics, port=0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        assert "mqtt_publish_total" in urllib.request.urlopen(base + "/metrics").read().decode()
+        assert json.loads(urllib.request.urlopen(base + "/stats").read())["totals"]["published"] == 1
+    finally:
+        server.shutdown()
@@ -0,0 +1,92 @@
+import threading
+
+from awscrt import mqtt, mqtt5
+
+from local_broker import MQTTTestBroker
+from mqtt5_connection import HotTopicAliases, MQTT5Connection
+from payload_codecs import JSON_CONTENT_TYPE, TEXT_CONTENT_TYPE, content_type_for, decode_payload, encode_payload
+
+
+def test_content_type_for_payloads():
+    assert content_type_for(b'{"a": 1}') == (True, JSON_CONTENT_TYPE)
+    assert content_type_for(b'  [1, 2]') == (True, JSON_CONTENT_TYPE)
+    assert content_type_for(b"hello") == (True, TEXT_CONTENT_TYPE)
+    utf8, content_type = content_type_for(encode_payload({"a": 1}, "msgpack"))
+    assert not utf8 and content_type != JSON_CONTENT_TYPE
+
+
+def test_decode_payload_trusts_the_content_type():
+    assert decode_payload(b"123", TEXT_CONTENT_TYPE) == "123"
+    assert decode_payload(b"123") == 123
+    assert decode_payload(b'{"a": 1}', JSON_CONTENT_TYPE) == {"a": 1}
+
+
+def test_first_topics_get_aliases_until_they_run_out():
+    aliases = HotTopicAliases(2, window=100)
+    assert [aliases.alias_for(topic) for topic in ("a", "b", "c", "a")] == [1, 2, None, 1]
+    assert len(aliases) == 2
+
+
+def test_aliases_move_to_the_busiest_topics_each_window():
+    aliases = HotTopicAliases(2, window=10)
+    for topic in ["a", "b"] + ["c"] * 5 + ["d"] * 2:
+        aliases.alias_for(topic)
+    assert aliases.alias_for("d") == 2
+    assert aliases.alias_for("c") == 1
+    assert aliases.alias_for("a") is None
+    assert aliases.reassigned_count == 2
+
+
+def test_resize_drops_aliases_above_the_new_size():
+    aliases = HotTopicAliases(3)
+    for topic in ("a", "b", "c"):
+        aliases.alias_for(topic)
+    aliases.resize(1)
+    assert len(aliases) == 1 and aliases.alias_for("a") == 1 and aliases.alias_for("b") is None
+
+
+def test_round_trip_against_the_test_broker():
+    broker = MQTTTestBroker(topic_alias_maximum=2)
+    port = broker.start()
+    options = mqtt5.ClientOptions(host_name="127.0.0.1", port=port,
+                                  connect_options=mqtt5.ConnectPacket(client_id="mqtt5-test"))
+    connection = MQTT5Connection(options, topic_aliases=8, message_expiry=60)
+    received = []
+    done = threading.Event()
+
+    def on_message(**kwargs):
+        received.append(kwargs)
+        if len(received) == 3:
+            done.set()
+    try:
+        assert connection.connect().result(timeout=10) == {"session_present": False}
+        assert connection.topic_alias_maximum == 2
+        future, _ = connection.subscribe("test/#", mqtt.QoS.AT_LEAST_ONCE, callback=on_message)
+        assert future.result(timeout=10)["qos"] == mqtt.QoS.AT_LEAST_ONCE
+
+        for payload in (b'{"n": 1}', b'{"n": 2}', b"plain"):
+            future, _ = connection.publish("test/a", payload, mqtt.QoS.AT_LEAST_ONCE)
+            assert future.result(timeout=10) == {"packet_id": None}
+        assert done.wait(10)
+        assert [message["payload"] for message in received] == [b'{"n": 1}', b'{"n": 2}', b"plain"]
+        assert [message["content_type"] for message in received] == [JSON_CONTENT_TYPE, JSON_CONTENT_TYPE,
+                                                                    TEXT_CONTENT_TYPE]
+        assert all(message["topic"] == "test/a" for message in received)
+        assert connection.stats()["aliased_topics"] == 1
+    finally:
+        connection.disconnect().result(timeout=10)
+        broker.stop()
+    assert not connection.is_connected
+
+
+def test_engine_warns_that_mqtt5_dedup_needs_a_sequence_field(caplog):
+    from client_engine import MQTTClientEngine
+    from dedup import DuplicateFilter
+
+    MQTTClientEngine("localhost", "mqtt5-test", "cert.pem", "key.pem", mqtt5=True, dedup=True)
+    assert "sequence_field" in caplog.text
+    caplog.clear()
+    MQTTClientEngine("localhost", "mqtt5-test", "cert.pem", "key.pem", mqtt5=True,
+                     dedup=DuplicateFilter(sequence_field="_seq"))
+    MQTTClientEngine("localhost", "mqtt5-test", "cert.pem", "key.pem", dedup=True)
+    assert "sequence_field" not in caplog.text
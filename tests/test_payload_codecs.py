@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from payload_codecs import (CODECS, MARKER, ReceivedMessage, TopicCodecs, decode_payload, encode_payload,
+                            json_dumps, json_loads, payload_text, use_fast_json)
+
+MESSAGE = {
+    "timestamp": 1760000000,
+    "client_id": "Raspberry_AWS_IoT092025",
+    "data": {"temperature": 25.5, "humidity": 60.0, "status": "active"},
+}
+
+
+@pytest.mark.parametrize("codec_name", sorted(CODECS))
+def test_round_trip(codec_name):
+    payload = encode_payload(MESSAGE, codec_name)
+    assert decode_payload(payload) == MESSAGE
+    assert payload.startswith(MARKER) == (CODECS[codec_name].codec_id is not None)
+
+
+def test_json_and_text_are_sent_unmarked():
+    assert decode_payload(encode_payload(MESSAGE)) == MESSAGE
+    assert decode_payload(b"plain text") == "plain text"
+    assert payload_text(encode_payload(MESSAGE, "json+zlib")) == payload_text(encode_payload(MESSAGE))
+
+
+def test_unknown_codec_id_is_rejected():
+    with pytest.raises(ValueError):
+        decode_payload(MARKER + b"\xfe payload")
+
+
+def test_topic_codecs_first_matching_filter_wins():
+    codecs = TopicCodecs()
+    codecs.set_codec("test/dc/#", "json+zlib")
+    codecs.set_codec("test/dc/raw", "json")
+    assert codecs.codec_for("test/dc/raw") == "json+zlib"
+    assert codecs.codec_for("test/other") == "json"
+    codecs.set_codec("test/dc/#", "json")
+    assert codecs.codec_for("test/dc/raw") == "json"
+    with pytest.raises(ValueError):
+        codecs.set_codec("test/#", "no-such-codec")
+
+
+def test_received_message_parses_once_and_only_when_asked(monkeypatch):
+    import payload_codecs
+    calls = []
+    real_decode = payload_codecs.decode_payload
+    monkeypatch.setattr(payload_codecs, "decode_payload", lambda *args: calls.append(args) or real_decode(*args))
+    message = ReceivedMessage("test/a", bytearray(b'{"n": 1}'))
+    assert calls == [] and len(message) == 8 and bytes(message.view) == b'{"n": 1}'
+    assert message.data == {"n": 1} and message.data == {"n": 1}
+    assert len(calls) == 1
+    assert message.text == '{"n": 1}'
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_json_backends_agree(fast):
+    previous = use_fast_json(fast)
+    try:
+        for data in (b'{"a": [1, 2.5, null, "x"]}', bytearray(b"[true]"), memoryview(b'{"n": -12, "s": "\\u00e9"}')):
+            assert json_loads(data) == json.loads(bytes(data))
+        assert json.loads(json_dumps({"big": 2 ** 70, "t": "é"})) == {"big": 2 ** 70, "t": "é"}
+    finally:
+        use_fast_json(previous)
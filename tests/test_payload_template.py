@@ -0,0 +1,69 @@
+import json
+import time
+
+import pytest
+
+from payload_template import PayloadTemplate
+
+
+def test_placeholders_render_to_json_bytes():
+    template = PayloadTemplate('{"id": "{{client_id}}", "seq": {{seq}}, "ts": {{timestamp}}, '
+                               '"t": {{uniform:10:20:1}}, "n": {{randint:1:3}}, "s": "{{choice:on:off}}"}',
+                               client_id="sensor-1", seed=7)
+    before = int(time.time())
+    payload = template.render()
+    assert isinstance(payload, bytes)
+    message = json.loads(payload)
+    assert message["id"] == "sensor-1" and message["seq"] == 1
+    assert before <= message["ts"] <= int(time.time())
+    assert 10 <= message["t"] <= 20 and round(message["t"], 1) == message["t"]
+    assert message["n"] in (1, 2, 3) and message["s"] in ("on", "off")
+    assert template.render_count == 1
+
+
+def test_seq_and_walk_start_fresh_after_the_trial_render():
+    template = PayloadTemplate('{"seq": {{seq}}, "v": {{walk:50:1:3}}}', seed=1)
+    messages = [json.loads(template.render()) for _ in range(20)]
+    assert [message["seq"] for message in messages] == list(range(1, 21))
+    assert abs(messages[0]["v"] - 50) <= 1
+    assert all(abs(b["v"] - a["v"]) <= 1.001 for a, b in zip(messages, messages[1:]))
+
+
+def test_same_seed_renders_the_same_values():
+    text = '{"v": {{walk:0:5}}, "n": {{randint:0:1000}}}'
+    first, second = PayloadTemplate(text, seed=3), PayloadTemplate(text, seed=3)
+    assert [first.render() for _ in range(5)] == [second.render() for _ in range(5)]
+
+
+def test_sensor_values_are_embedded_as_json():
+    readings = iter([{"c": 21.5}, {"c": 22.0}, {"c": 22.5}])
+    template = PayloadTemplate('{"reading": {{sensor:temp}}}', sensors={"temp": lambda: next(readings)})
+    assert json.loads(template.render()) == {"reading": {"c": 22.0}}
+
+
+def test_percent_signs_in_literal_text_survive():
+    template = PayloadTemplate('{"unit": "%", "pct": {{randint:5:5}}}')
+    assert template.render() == b'{"unit": "%", "pct": 5}'
+
+
+def test_plain_text_templates_skip_the_json_check():
+    template = PayloadTemplate("seq={{seq}}", is_json=False)
+    assert template.render() == b"seq=1"
+
+
+@pytest.mark.parametrize("text", [
+    '{"v": {{nope}}}',
+    '{"v": {{uniform:1}}}',
+    '{"v": {{sensor:missing}}}',
+    '{"v": {{choice}}}',
+    '{"v": {{client_id}}}',
+])
+def test_bad_templates_are_rejected(text):
+    with pytest.raises(ValueError):
+        PayloadTemplate(text, client_id="not-json")
+
+
+def test_client_id_is_escaped_inside_json_strings():
+    template = PayloadTemplate('{"id": "{{client_id}}"}', client_id='a"b\\c%d')
+    assert json.loads(template.render()) == {"id": 'a"b\\c%d'}
+    assert PayloadTemplate("id={{client_id}}", client_id='a"b', is_json=False).render() == b'id=a"b'
@@ -0,0 +1,90 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from awscrt import mqtt
+
+from local_broker import LocalBroker
+from publish_queue import PublishQueue
+
+
+def make_queue(**options):
+    broker = LocalBroker(puback_latency=0.0)
+    connection = broker.create_connection("queue-test")
+    connection.connect()
+    received = []
+    connection.subscribe("test/#", mqtt.QoS.AT_LEAST_ONCE,
+                         callback=lambda topic, payload, qos, **kwargs: received.append((topic, payload, qos)))
+    queue = PublishQueue(connection, **options)
+    queue.start()
+    return broker, queue, received
+
+
+def test_publishes_are_acknowledged_in_order():
+    broker, queue, received = make_queue(batch_size=8, max_in_flight=4)
+    try:
+        futures = [queue.submit("test/a", b"%d" % index) for index in range(50)]
+        assert queue.flush(timeout=5)
+        assert all("packet_id" in future.result(timeout=1) for future in futures)
+        assert [payload for _, payload, _ in received] == [b"%d" % index for index in range(50)]
+        assert queue.acked_count == 50 and queue.failed_count == 0 and queue.in_flight == 0
+    finally:
+        queue.stop()
+        broker.shutdown()
+
+
+def test_explicit_qos_0_is_not_replaced_by_the_default():
+    broker, queue, received = make_queue()
+    try:
+        queue.submit("test/a", b"default").result(timeout=5)
+        queue.submit("test/a", b"at-most-once", qos=mqtt.QoS.AT_MOST_ONCE).result(timeout=5)
+        assert [qos for _, _, qos in received] == [mqtt.QoS.AT_LEAST_ONCE, mqtt.QoS.AT_MOST_ONCE]
+    finally:
+        queue.stop()
+        broker.shutdown()
+
+
+def test_stop_fails_submit_afterwards():
+    broker, queue, _ = make_queue()
+    queue.stop()
+    broker.shutdown()
+    try:
+        queue.submit("test/a", b"late")
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("submit after stop should raise")
+
+
+class GatedConnection:
+    """Holds the first publish until released, then acknowledges everything at once"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+
+    def publish(self, topic, payload, qos, retain=False):
+        self.gate.wait(5)
+        future = Future()
+        future.set_result({"packet_id": 1})
+        return future, 1
+
+
+def test_stop_wakes_flush_when_only_leftovers_were_pending():
+    connection = GatedConnection()
+    queue = PublishQueue(connection, batch_size=1)
+    queue.start()
+    for index in range(4):
+        queue.submit("test/a", b"%d" % index)
+    stopper = threading.Thread(target=queue.stop, kwargs={"timeout": 1.0})
+    stopper.start()
+    while queue._running:
+        time.sleep(0.01)
+    flushed = []
+    flusher = threading.Thread(target=lambda: flushed.append((queue.flush(timeout=3.0), time.monotonic())))
+    flusher.start()
+    connection.gate.set()
+    stopper.join(5)
+    stopped_at = time.monotonic()
+    flusher.join(5)
+    assert flushed[0][0] and flushed[0][1] - stopped_at < 0.5
+    assert queue.acked_count == 1
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from rate_limiter import DROP, AdaptiveRateLimiter, RateLimitExceeded, TokenBucket
+
+
+def test_token_bucket_refills_up_to_burst():
+    bucket = TokenBucket(10, burst=5)
+    bucket.tokens = 0.0
+    bucket.refill(bucket.updated + 0.2)
+    assert bucket.tokens == pytest.approx(2.0)
+    assert bucket.wait_time(3) == pytest.approx(0.1)
+    bucket.refill(bucket.updated + 10)
+    assert bucket.tokens == 5
+    # A full bucket admits a message larger than the burst
+    assert bucket.wait_time(50) == 0.0
+
+
+def test_burst_is_admitted_then_further_publishes_wait():
+    limiter = AdaptiveRateLimiter(rate=10, burst_seconds=0.5)
+    waits = [limiter.try_acquire("test/a") for _ in range(6)]
+    assert waits[:5] == [0.0] * 5
+    assert 0 < waits[5] <= 0.1
+    assert limiter.admitted_count == 5
+
+
+def test_drop_policy_raises_and_counts():
+    limiter = AdaptiveRateLimiter(rate=1, policy=DROP)
+    limiter.acquire("test/a")
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("test/a")
+    assert limiter.stats()["dropped"] == 1 and limiter.stats()["admitted"] == 1
+
+
+def test_block_policy_gives_up_at_the_timeout():
+    limiter = AdaptiveRateLimiter(rate=1)
+    limiter.acquire("test/a")
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("test/a", timeout=0.05)
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(limiter.acquire_async("test/a", timeout=0.05))
+    assert limiter.dropped_count == 2
+
+
+def test_topic_budget_is_separate_from_the_connection():
+    limiter = AdaptiveRateLimiter(rate=100, topic_rate=1, topic_burst=1, policy=DROP)
+    limiter.acquire("test/a")
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("test/a")
+    limiter.acquire("test/b")
+    assert limiter.admitted_count == 2
+
+
+def test_oldest_topic_bucket_is_forgotten():
+    limiter = AdaptiveRateLimiter(rate=100, topic_rate=1, max_topics=2)
+    for topic in ("test/a", "test/b", "test/c"):
+        limiter.try_acquire(topic)
+    assert list(limiter.topics) == ["test/b", "test/c"]
+
+
+def test_byte_budget_limits_large_payloads():
+    limiter = AdaptiveRateLimiter(rate=100, byte_rate=1000, policy=DROP)
+    limiter.acquire("test/a", size=800)
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire("test/a", size=800)
+    limiter.acquire("test/a", size=100)
+
+
+def test_errors_and_slow_acks_lower_the_rate_once_per_cooldown():
+    limiter = AdaptiveRateLimiter(rate=100, min_rate=40, latency_target=0.5, decrease=0.5, cooldown=60)
+    limiter.record_result(0.01, error=RuntimeError("throttled"))
+    assert limiter.rate == 50
+    limiter.record_result(2.0)
+    assert limiter.rate == 50 and limiter.decrease_count == 1
+
+    limiter._last_decrease -= 60
+    limiter.record_result(2.0)
+    assert limiter.rate == 40 and limiter.decrease_count == 2
+
+
+def test_clean_acks_raise_the_rate_up_to_max_rate():
+    limiter = AdaptiveRateLimiter(rate=10, max_rate=11, increase=5.0)
+    limiter.record_result(0.01)
+    assert limiter.rate == pytest.approx(10.5)
+    for _ in range(10):
+        limiter.record_result(0.01)
+    assert limiter.rate == 11
+
+
+def test_first_publish_on_a_new_topic_is_admitted():
+    limiter = AdaptiveRateLimiter(rate=100, topic_rate=1, topic_burst=1)
+    assert limiter.try_acquire("test/new") == 0.0
@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+from awscrt import mqtt
+
+from local_broker import LocalBroker
+from reconnect import Backoff, ReconnectManager
+
+
+def resolved(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class RejectingConnection:
+    """Grants every filter except those under 'forbidden/'"""
+
+    def __init__(self):
+        self.disconnects = 0
+        self.connect_future = None
+
+    def connect(self):
+        return self.connect_future or resolved({"session_present": False})
+
+    def disconnect(self):
+        self.disconnects += 1
+        return resolved({})
+
+    def subscribe(self, topic, qos, callback):
+        granted = None if topic.startswith("forbidden/") else qos
+        return resolved({"packet_id": 1, "topic": topic, "qos": granted}), 1
+
+
+def test_backoff_grows_with_jitter_and_resets():
+    backoff = Backoff(min_delay=0.1, max_delay=1.0)
+    delays = [backoff.next_delay() for _ in range(10)]
+    assert all(0.1 <= delay <= 1.0 for delay in delays)
+    backoff.reset()
+    assert backoff.next_delay() == pytest.approx(0.1)
+
+
+def test_only_granted_filters_are_tracked():
+    manager = ReconnectManager(RejectingConnection())
+    future, _ = manager.subscribe("test/#", mqtt.QoS.AT_LEAST_ONCE, callback=None)
+    assert future.result(timeout=1)["qos"] == mqtt.QoS.AT_LEAST_ONCE
+    rejected, _ = manager.subscribe("forbidden/#", mqtt.QoS.AT_LEAST_ONCE, callback=None)
+    with pytest.raises(RuntimeError):
+        rejected.result(timeout=1)
+    assert list(manager.subscriptions) == ["test/#"]
+
+
+def test_connect_timeout_disconnects_before_retrying():
+    connection = RejectingConnection()
+    connection.connect_future = Future()
+    manager = ReconnectManager(connection, connect_timeout=0.01)
+    assert not manager.connect(max_attempts=2)
+    assert connection.disconnects == 2
+    assert manager.attempt_count == 2
+
+
+def test_interruption_reconnects_and_resubscribes():
+    broker = LocalBroker(puback_latency=0.0)
+    connected = threading.Event()
+    manager = None
+
+    def interrupted(connection, error, **kwargs):
+        manager.connection_interrupted(error)
+
+    def resumed(connection, return_code, session_present, **kwargs):
+        manager.connection_resumed(return_code, session_present)
+
+    connection = broker.create_connection("reconnect-test", on_connection_interrupted=interrupted,
+                                          on_connection_resumed=resumed)
+    manager = ReconnectManager(connection, on_connected=lambda session_present: connected.set(), min_delay=0.01)
+    try:
+        assert manager.connect(max_attempts=1)
+        manager.subscribe("test/#", mqtt.QoS.AT_LEAST_ONCE, callback=None)[0].result(timeout=1)
+        connected.clear()
+        connection.interrupt()
+        assert connected.wait(2)
+        deadline = time.monotonic() + 2
+        while manager.reconnect_count == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert manager.is_connected and manager.reconnect_count == 1
+        assert "test/#" in connection.subscriptions
+    finally:
+        manager.stop()
+        broker.shutdown()
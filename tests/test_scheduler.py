@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from scheduler import CATCH_UP, SKIP, PublishScheduler, ScheduledJob
+
+
+def job(policy, interval=1.0, max_catch_up=10):
+    return ScheduledJob(PublishScheduler(), lambda: None, interval, policy, 0.0, 0.0, "job", max_catch_up)
+
+
+def test_deadlines_do_not_drift():
+    scheduled = job(CATCH_UP)
+    base = scheduled.deadline
+    for tick in range(1, 6):
+        # Running late within an interval does not move later deadlines
+        scheduled._next_deadline(base + tick - 0.5)
+        assert scheduled.deadline == pytest.approx(base + tick)
+    assert scheduled.skipped_count == 0
+
+
+def test_catch_up_runs_missed_ticks_up_to_a_limit():
+    scheduled = job(CATCH_UP, max_catch_up=3)
+    base = scheduled.deadline
+    scheduled._next_deadline(base + 2.5)
+    assert scheduled.deadline == pytest.approx(base + 1)
+    scheduled._next_deadline(base + 10.5)
+    assert scheduled.deadline > base + 10.5 - 3
+    assert scheduled.skipped_count > 0
+
+
+def test_skip_drops_missed_ticks():
+    scheduled = job(SKIP)
+    base = scheduled.deadline
+    scheduled._next_deadline(base + 3.5)
+    assert scheduled.deadline == pytest.approx(base + 4)
+    assert scheduled.skipped_count == 3
+
+
+def test_unknown_policy_and_interval_are_rejected():
+    with pytest.raises(ValueError):
+        job("sometimes")
+    with pytest.raises(ValueError):
+        PublishScheduler().add_job(lambda: None, 0)
+
+
+def test_jobs_run_on_the_scheduler_thread_and_cancel():
+    scheduler = PublishScheduler(spin=0.0)
+    scheduler.start()
+    fired = threading.Event()
+    runs = []
+
+    def tick():
+        runs.append(time.monotonic())
+        if len(runs) == 3:
+            fired.set()
+
+    try:
+        scheduled = scheduler.add_job(tick, 0.01, phase=0.0)
+        failing = scheduler.add_job(lambda: 1 / 0, 0.01, phase=0.0, name="failing")
+        assert fired.wait(2)
+        scheduled.cancel()
+        failing.cancel()
+        count = len(runs)
+        time.sleep(0.05)
+        assert len(runs) <= count + 1
+        assert failing.error_count >= 1
+        assert scheduler.jobs() == []
+    finally:
+        scheduler.stop()
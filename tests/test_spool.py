@@ -0,0 +1,102 @@
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from spool import DROP_NEWEST, RECORD, Spool, SpoolFullError
+
+
+def done(error=None):
+    future = Future()
+    if error:
+        future.set_exception(error)
+    else:
+        future.set_result({})
+    return future
+
+
+def test_append_peek_commit(tmp_path):
+    spool = Spool(str(tmp_path / "spool.bin"), capacity=4096)
+    seqs = [spool.append("test/a", f"message {index}") for index in range(5)]
+    assert len(spool) == 5
+    assert [(seq, topic, payload) for seq, topic, payload, _ in spool.peek(3)] == \
+        [(seqs[index], "test/a", b"message %d" % index) for index in range(3)]
+    spool.commit(seqs[1])
+    assert [seq for seq, _, _, _ in spool.peek()] == seqs[2:]
+    spool.close()
+
+
+def test_ring_wraps_and_evicts_oldest(tmp_path):
+    record = RECORD.size + len("test/a") + 10
+    spool = Spool(str(tmp_path / "spool.bin"), capacity=record * 4 + record // 2)
+    for index in range(10):
+        spool.append("test/a", b"%010d" % index)
+    records = spool.peek(10)
+    assert [payload for _, _, payload, _ in records] == [b"%010d" % index for index in range(6, 10)]
+    assert spool.evicted_count == 6
+    spool.commit(records[1][0])
+    spool.append("test/a", b"%010d" % 10)
+    assert [payload for _, _, payload, _ in spool.peek(10)] == [b"%010d" % index for index in (8, 9, 10)]
+    spool.close()
+
+
+def test_drop_newest_rejects_when_full(tmp_path):
+    record = RECORD.size + len("test/a") + 10
+    spool = Spool(str(tmp_path / "spool.bin"), capacity=record * 2, eviction=DROP_NEWEST)
+    spool.append("test/a", b"0" * 10)
+    spool.append("test/a", b"1" * 10)
+    with pytest.raises(SpoolFullError):
+        spool.append("test/a", b"2" * 10)
+    assert spool.rejected_count == 1 and len(spool) == 2
+    spool.close()
+
+
+def test_survives_reopen(tmp_path):
+    path = str(tmp_path / "spool.bin")
+    spool = Spool(path, capacity=4096)
+    first = spool.append("test/a", b"kept", qos=0)
+    spool.append("test/b", b"also kept")
+    spool.close()
+    spool = Spool(path, capacity=4096)
+    assert [(seq, topic, payload, qos) for seq, topic, payload, qos in spool.peek()] == \
+        [(first, "test/a", b"kept", 0), (first + 1, "test/b", b"also kept", 1)]
+    assert spool.append("test/c", b"next") == first + 2
+    spool.close()
+
+
+def test_drain_stops_at_first_failure(tmp_path):
+    spool = Spool(str(tmp_path / "spool.bin"), capacity=4096)
+    for index in range(5):
+        spool.append("test/a", b"%d" % index)
+    sent = []
+
+    def submit(topic, payload, qos):
+        sent.append(payload)
+        return done(RuntimeError("link down") if payload == b"3" else None)
+
+    assert spool.drain(submit, rate=None) == 3
+    assert [payload for _, _, payload, _ in spool.peek()] == [b"3", b"4"]
+    assert spool.drain(lambda topic, payload, qos: done(), rate=None) == 2
+    assert len(spool) == 0
+    spool.close()
+
+
+def test_unacknowledged_drain_gives_up_and_keeps_the_records(tmp_path):
+    spool = Spool(str(tmp_path / "spool.bin"), capacity=4096)
+    for index in range(3):
+        spool.append("test/a", b"%d" % index)
+    pending = Future()
+    assert spool.drain(lambda topic, payload, qos: done() if payload == b"0" else pending,
+                       rate=None, ack_timeout=0.05) == 1
+    assert [payload for _, _, payload, _ in spool.peek()] == [b"1", b"2"]
+    spool.close()
+
+
+def test_tail_of_a_burst_is_synced_by_the_timer(tmp_path):
+    spool = Spool(str(tmp_path / "spool.bin"), capacity=4096, sync_every=100, sync_interval=0.05)
+    spool.append("test/a", b"last")
+    assert spool._unsynced == 1
+    time.sleep(0.2)
+    assert spool._unsynced == 0
+    spool.close()
+    spool.close()
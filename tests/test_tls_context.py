@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+import tls_context
+from local_broker import generate_test_certs
+
+
+@pytest.fixture
+def certs(tmp_path):
+    tls_context.clear()
+    yield generate_test_certs(str(tmp_path))
+    tls_context.clear()
+
+
+def test_same_files_share_one_context(certs):
+    first = tls_context.client_tls_context(certs["client_cert"], certs["client_key"], certs["ca"])
+    assert tls_context.client_tls_context(certs["client_cert"], certs["client_key"], certs["ca"]) is first
+    assert tls_context.client_tls_context(certs["client_cert"], certs["client_key"]) is not first
+
+
+def test_rotated_certificate_gets_a_new_context(certs):
+    first = tls_context.client_tls_context(certs["client_cert"], certs["client_key"], certs["ca"])
+    stat = os.stat(certs["client_cert"])
+    os.utime(certs["client_cert"], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert tls_context.client_tls_context(certs["client_cert"], certs["client_key"], certs["ca"]) is not first
+
+
+def test_clients_are_shared_and_clear_forgets_everything(certs):
+    client = tls_context.mqtt_client(certs["client_cert"], certs["client_key"], certs["ca"])
+    assert tls_context.mqtt_client(certs["client_cert"], certs["client_key"], certs["ca"]) is client
+    context = tls_context.client_tls_context(certs["client_cert"], certs["client_key"], certs["ca"])
+    tls_context.clear()
+    assert tls_context.client_tls_context(certs["client_cert"], certs["client_key"], certs["ca"]) is not context
+    assert tls_context.mqtt_client(certs["client_cert"], certs["client_key"], certs["ca"]) is not client
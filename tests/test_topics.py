@@ -0,0 +1,75 @@
+import itertools
+
+from topics import TopicDispatcher, TopicTrie, topic_matches
+
+FILTERS = ["a/b/c", "a/+/c", "a/#", "#", "+/+", "a/b", "+/b/#", "x/+/+", "a/b/c/#"]
+TOPICS = ["a", "a/b", "a/b/c", "a/x/c", "a/b/c/d", "x/y/z", "x/b", "q", "a//c"]
+
+
+def test_topic_matches():
+    assert topic_matches("a/+/c", "a/b/c")
+    assert topic_matches("a/#", "a")
+    assert not topic_matches("a/+", "a/b/c")
+    assert not topic_matches("a/b", "a/b/c")
+
+
+def test_trie_agrees_with_topic_matches():
+    trie = TopicTrie()
+    for topic_filter in FILTERS:
+        trie.add(topic_filter, topic_filter)
+    for topic in TOPICS:
+        assert sorted(trie.match(topic)) == sorted(f for f in FILTERS if topic_matches(f, topic)), topic
+
+
+def test_wildcards_at_the_first_level_skip_system_topics():
+    trie = TopicTrie()
+    for topic_filter in ("#", "+/shadow", "$aws/#"):
+        trie.add(topic_filter, topic_filter)
+    assert trie.match("$aws/shadow") == ["$aws/#"]
+
+
+def test_remove_prunes_and_invalidates_the_cache():
+    trie = TopicTrie(cache_size=2)
+    first, second = object(), object()
+    trie.add("a/+/c", first)
+    trie.add("a/+/c", second)
+    assert trie.match("a/b/c") == [first, second]
+    assert trie.remove("a/+/c", first)
+    assert trie.match("a/b/c") == [second]
+    assert trie.remove("a/+/c")
+    assert trie.match("a/b/c") == [] and len(trie) == 0 and trie.root.children == {}
+    assert not trie.remove("never/added")
+    for _, topic in zip(range(5), itertools.cycle(TOPICS)):
+        trie.match(topic)
+    assert len(trie._cache) <= 2
+
+
+def test_dispatcher_routes_and_falls_back_to_default():
+    calls = []
+    dispatcher = TopicDispatcher(default=lambda topic, **kwargs: calls.append(("default", topic)))
+    dispatcher.add_handler("sensors/+/temp", lambda topic, payload, **kwargs: calls.append(("temp", topic, payload)))
+    dispatcher.dispatch("sensors/1/temp", b"21", False, 1, False)
+    dispatcher.dispatch("sensors/1/humidity", b"60", False, 1, False)
+    assert calls == [("temp", "sensors/1/temp", b"21"), ("default", "sensors/1/humidity")]
+    assert dispatcher.unmatched_count == 1
+
+
+def test_handler_added_during_a_match_is_not_hidden_by_the_cache():
+    trie = TopicTrie()
+    trie.add("test/a", "first")
+    assert trie.match("test/a") == ["first"]
+
+    class AddWhileWalking(dict):
+        added = False
+
+        def get(self, key, default=None):
+            # Lands after the walk has looked for '#' at the root
+            if key == "test" and not self.added:
+                self.added = True
+                trie.add("#", "late")
+            return dict.get(self, key, default)
+
+    trie.root.children = AddWhileWalking(trie.root.children)
+    trie.add("test/b", "other")
+    assert trie.match("test/a") == ["first"]
+    assert sorted(trie.match("test/a")) == ["first", "late"]
@@ -0,0 +1,75 @@
+import os
+import threading
+
+# Parsed mTLS contexts and the awscrt clients wrapping them, keyed by the
+# certificate, key and CA paths and their modification times, so a rotated
+# certificate is picked up on the next connect
+_contexts = {}
+_clients = {}
+_lock = threading.Lock()
+
+
+def _cache_key(cert_path, key_path, root_ca_path, alpn_list):
+    mtimes = tuple(os.stat(path).st_mtime_ns if path else None for path in (cert_path, key_path, root_ca_path))
+    return cert_path, key_path, root_ca_path, tuple(alpn_list or ()), mtimes
+
+
+def client_tls_context(cert_path, key_path, root_ca_path=None, alpn_list=None):
+    """Return the awscrt ClientTlsContext for a certificate and key, parsing the PEM files only once.
+
+    Reconnects, pooled connections and MQTT 5 clients using the same files
+    share the context, which also lets awscrt resume TLS sessions.
+    """
+    from awscrt import io
+    key = _cache_key(cert_path, key_path, root_ca_path, alpn_list)
+    with _lock:
+        context = _contexts.get(key)
+        if context is None:
+            tls_options = io.TlsContextOptions.create_client_with_mtls_from_path(cert_path, key_path)
+            if root_ca_path:
+                tls_options.override_default_trust_store_from_path(None, root_ca_path)
+            if alpn_list:
+                tls_options.alpn_list = list(alpn_list)
+            context = _contexts[key] = io.ClientTlsContext(tls_options)
+        return context
+
+
+def mqtt_client(cert_path, key_path, root_ca_path=None, alpn_list=None):
+    """Return a shared awscrt.mqtt.Client (default bootstrap, cached TLS context) for these files"""
+    from awscrt import io, mqtt
+    key = _cache_key(cert_path, key_path, root_ca_path, alpn_list)
+    context = client_tls_context(cert_path, key_path, root_ca_path, alpn_list)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = mqtt.Client(io.ClientBootstrap.get_or_create_static_default(), context)
+        return client
+
+
+def mtls_from_path(endpoint, cert_filepath, pri_key_filepath, ca_filepath=None, client_id=None,
+                   clean_session=False, keep_alive_secs=30, port=None, **kwargs):
+    """Build an MQTT 3.1.1 connection like mqtt_connection_builder.mtls_from_path, on a cached TLS context.
+
+    As there, port defaults to 443 with ALPN 'x-amzn-mqtt-ca' where the
+    platform supports ALPN, 8883 otherwise. Remaining keyword arguments
+    (callbacks, reconnect timeouts) go to awscrt.mqtt.Connection.
+    """
+    from awscrt import io, mqtt
+    if port is None:
+        port = 443 if io.is_alpn_available() else 8883
+    alpn_list = ["x-amzn-mqtt-ca"] if port == 443 and io.is_alpn_available() else None
+    return mqtt.Connection(
+        client=mqtt_client(cert_filepath, pri_key_filepath, ca_filepath, alpn_list),
+        host_name=endpoint,
+        port=port,
+        client_id=client_id,
+        clean_session=clean_session,
+        keep_alive_secs=keep_alive_secs,
+        **kwargs)
+
+
+def clear():
+    """Forget cached contexts; connections already built keep theirs"""
+    with _lock:
+        _contexts.clear()
+        _clients.clear()
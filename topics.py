@@ -0,0 +1,144 @@
+import threading
+
+
+def topic_matches(topic_filter, topic):
+    """Return True if an MQTT topic filter ('+' / '#' wildcards) matches a topic"""
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level != "+" and level != topic_levels[index]:
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class _TrieNode:
+    __slots__ = ("children", "handlers")
+
+    def __init__(self):
+        self.children = {}
+        self.handlers = []
+
+
+class TopicTrie:
+    """MQTT topic-filter trie; match cost grows with topic depth, not filter count.
+
+    Results for recently matched topics are cached until the set of filters
+    changes. A match that raced an add or remove is returned but not cached.
+    """
+
+    def __init__(self, cache_size=4096):
+        self.root = _TrieNode()
+        self.cache_size = cache_size
+        self._cache = {}
+        self._count = 0
+        self._generation = 0
+        self._cache_lock = threading.Lock()
+
+    def _invalidate(self):
+        with self._cache_lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def __len__(self):
+        return self._count
+
+    def add(self, topic_filter, handler):
+        node = self.root
+        for level in topic_filter.split("/"):
+            node = node.children.setdefault(level, _TrieNode())
+        node.handlers.append(handler)
+        self._count += 1
+        self._invalidate()
+
+    def remove(self, topic_filter, handler=None):
+        """Remove handler (or every handler) registered for topic_filter"""
+        path = [self.root]
+        for level in topic_filter.split("/"):
+            node = path[-1].children.get(level)
+            if node is None:
+                return False
+            path.append(node)
+
+        node = path[-1]
+        before = len(node.handlers)
+        node.handlers = [h for h in node.handlers if handler is not None and h != handler]
+        self._count -= before - len(node.handlers)
+        self._invalidate()
+
+        # Prune empty branches
+        levels = topic_filter.split("/")
+        for depth in range(len(levels), 0, -1):
+            child = path[depth]
+            if child.handlers or child.children:
+                break
+            del path[depth - 1].children[levels[depth - 1]]
+        return before != len(node.handlers)
+
+    def match(self, topic):
+        """Return the handlers of every filter matching topic"""
+        cached = self._cache.get(topic)
+        if cached is not None:
+            return cached
+
+        generation = self._generation
+        handlers = []
+        levels = topic.split("/")
+        # Wildcards at the first level do not match topics starting with '$'
+        system_topic = topic.startswith("$")
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            wildcards_allowed = depth > 0 or not system_topic
+            multi = node.children.get("#")
+            if multi is not None and wildcards_allowed:
+                handlers.extend(multi.handlers)
+            if depth == len(levels):
+                handlers.extend(node.handlers)
+                continue
+            child = node.children.get(levels[depth])
+            if child is not None:
+                stack.append((child, depth + 1))
+            single = node.children.get("+")
+            if single is not None and wildcards_allowed:
+                stack.append((single, depth + 1))
+
+        with self._cache_lock:
+            if generation == self._generation:
+                if len(self._cache) >= self.cache_size:
+                    self._cache.clear()
+                self._cache[topic] = handlers
+        return handlers
+
+
+class TopicDispatcher:
+    """Routes messages from one broad broker subscription to local handlers.
+
+    Handlers are called with the awscrt message callback arguments
+    (topic, payload, dup, qos, retain, **kwargs). Messages that match no
+    handler go to default, if set.
+    """
+
+    def __init__(self, default=None):
+        self.trie = TopicTrie()
+        self.default = default
+        self.unmatched_count = 0
+
+    def add_handler(self, topic_filter, handler):
+        self.trie.add(topic_filter, handler)
+
+    def remove_handler(self, topic_filter, handler=None):
+        return self.trie.remove(topic_filter, handler)
+
+    def dispatch(self, topic, payload, dup, qos, retain, **kwargs):
+        handlers = self.trie.match(topic)
+        if not handlers:
+            self.unmatched_count += 1
+            if self.default is not None:
+                self.default(topic=topic, payload=payload, dup=dup, qos=qos, retain=retain, **kwargs)
+            return
+        for handler in handlers:
+            handler(topic=topic, payload=payload, dup=dup, qos=qos, retain=retain, **kwargs)